@@ -0,0 +1 @@
+"""Benchmarks executáveis com ``python -m src.benchmarks.<nome>``."""
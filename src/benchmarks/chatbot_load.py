@@ -0,0 +1,337 @@
+"""Driver de carga com várias sessões concorrentes do chatbot (``main_4``).
+
+Reproduz conversas de um arquivo JSONL (uma conversa por linha) contra um
+único grafo compilado, cada uma em seu próprio ``thread_id``. Para achar
+o ponto de saturação do backend (vLLM + checkpointer), a carga é aplicada
+em estágios de concorrência crescente; em cada estágio:
+
+- no máximo ``C`` conversas rodam ao mesmo tempo (workers sobre uma fila
+  limitada, de modo que a leitura do script também sofre backpressure);
+- os workers entram aos poucos, ao longo de ``--ramp-up`` segundos;
+- falhas de um turno fazem o worker recuar (backoff exponencial) antes
+  do próximo turno, aliviando o backend sobrecarregado.
+
+Formato do script (``turns`` obrigatório; os demais campos são opcionais)::
+
+    {"thread_id": "cliente-1", "turns": ["Oi", "Que dia é hoje?"], "think_time": 0.5}
+
+Uso::
+
+    python -m src.benchmarks.chatbot_load --script conversas.jsonl \\
+        --concurrency 1 2 4 8 16 --ramp-up 5 --json resultado.json
+
+Sem ``--script``, ``--sessions`` conversas sintéticas são geradas. Com
+``--stub`` o backend é o servidor local de ``stub_server``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph.state import CompiledStateGraph
+
+from src.benchmarks.e2e import PROMPTS, percentile
+from src.benchmarks.stub_server import (StubServer, add_stub_arguments,
+                                        stub_config_from_args)
+from src.envvar import reset_settings
+from src.helpers import (BackgroundSummarizer, CheckpointerConfig,
+                         SummarizationPolicy, create_chat_model,
+                         instrument_checkpointer, instrumented_config,
+                         open_checkpointer)
+from src.helpers.instrumentation import CHECKPOINT_SECONDS, LLM_SECONDS
+from src.httpclient import get_http_client_pool
+from src.main_4_chatbot import (build_chatbot_graph, now_tool,
+                                summary_mode_from_env)
+from src.metrics import MetricsRegistry
+
+# Ganho mínimo de vazão entre estágios abaixo do qual o backend é
+# considerado saturado.
+SATURATION_GAIN = 0.10
+MAX_BACKOFF = 30.0
+# Banco próprio do driver (ignorado pelo git).
+DEFAULT_CHECKPOINTER_PATH = Path("db/chatbot_load.db")
+
+
+@dataclass(frozen=True, kw_only=True)
+class Conversation:  # pylint: disable=too-few-public-methods
+    """
+    Conversa a ser reproduzida.
+
+    Atributos:
+        thread_id (str): Identificador base da thread (recebe a execução
+            e o estágio como sufixo).
+        turns (tuple[str, ...]): Mensagens do usuário, em ordem.
+        think_time (float): Pausa, em segundos, entre turnos.
+    """
+    thread_id: str
+    turns: tuple[str, ...]
+    think_time: float = 0.0
+
+
+def read_script(path: Path) -> Iterator[Conversation]:
+    """Lê as conversas do arquivo JSONL sob demanda."""
+    with path.open(encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            turns = data.get("turns")
+            if not turns or not all(isinstance(t, str) for t in turns):
+                msg = f"{path}:{number}: 'turns' must be a non-empty list of strings."
+                raise ValueError(msg)
+            yield Conversation(
+                thread_id=str(data.get("thread_id") or f"session-{number}"),
+                turns=tuple(turns),
+                think_time=float(data.get("think_time", 0.0)),
+            )
+
+
+def synthetic_script(sessions: int, turns: int) -> Iterator[Conversation]:
+    """Gera ``sessions`` conversas com ``turns`` turnos cada."""
+    for index in range(sessions):
+        yield Conversation(
+            thread_id=f"session-{index}",
+            turns=tuple(
+                PROMPTS[(index + turn) % len(PROMPTS)] for turn in range(turns)),
+        )
+
+
+@dataclass
+class _StageStats:
+    latencies: list[float] = field(default_factory=list)
+    conversations: int = 0
+    errors: int = 0
+    max_queue_wait: float = 0.0
+
+
+async def _replay(
+    graph: CompiledStateGraph,
+    conversation: Conversation,
+    *,
+    stage: str,
+    registry: MetricsRegistry,
+    turn_timeout: float | None,
+    stats: _StageStats,
+) -> None:
+    config = instrumented_config(
+        RunnableConfig(configurable={
+            "thread_id": f"{conversation.thread_id}@{stage}"}),
+        registry=registry,
+    )
+    backoff = 0.0
+    for index, content in enumerate(conversation.turns):
+        if index and conversation.think_time:
+            await asyncio.sleep(conversation.think_time)
+        if backoff:
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                graph.ainvoke({"messages": [HumanMessage(content=content)]}, config),
+                timeout=turn_timeout,
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            stats.errors += 1
+            backoff = min(MAX_BACKOFF, max(backoff * 2, 0.5))
+            continue
+
+        stats.latencies.append(time.perf_counter() - started)
+        backoff = 0.0
+    stats.conversations += 1
+
+
+async def _feed(
+    queue: asyncio.Queue[tuple[Conversation, float] | None],
+    conversations: Iterator[Conversation],
+    workers: int,
+) -> None:
+    for conversation in conversations:
+        # ``put`` bloqueia quando a fila está cheia: o script só é lido no
+        # ritmo em que os workers consomem.
+        await queue.put((conversation, time.perf_counter()))
+    for _ in range(workers):
+        await queue.put(None)
+
+
+async def run_stage(
+    graph: CompiledStateGraph,
+    conversations: Iterator[Conversation],
+    *,
+    concurrency: int,
+    ramp_up: float,
+    turn_timeout: float | None,
+    registry: MetricsRegistry,
+    run_id: str = "",
+) -> dict[str, Any]:
+    """Executa um estágio com ``concurrency`` workers e retorna as métricas.
+
+    As threads recebem o sufixo ``@<run_id>c<concurrency>``, de modo que
+    estágios e execuções distintas não compartilhem estado no checkpointer.
+    """
+    stats = _StageStats()
+    queue: asyncio.Queue[tuple[Conversation, float] | None] = asyncio.Queue(
+        maxsize=concurrency)
+
+    async def worker(index: int) -> None:
+        await asyncio.sleep(ramp_up * index / concurrency)
+        while (item := await queue.get()) is not None:
+            conversation, queued_at = item
+            stats.max_queue_wait = max(
+                stats.max_queue_wait, time.perf_counter() - queued_at)
+            await _replay(
+                graph, conversation,
+                stage=f"{run_id}c{concurrency}",
+                registry=registry,
+                turn_timeout=turn_timeout,
+                stats=stats,
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        _feed(queue, conversations, concurrency),
+        *(worker(i) for i in range(concurrency)),
+    )
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(stats.latencies)
+    completed = len(latencies)
+    llm_calls, _ = registry.histogram(LLM_SECONDS).total()
+    _, checkpoint_seconds = registry.histogram(CHECKPOINT_SECONDS).total()
+    return {
+        "concurrency": concurrency,
+        "conversations": stats.conversations,
+        "turns": completed,
+        "errors": stats.errors,
+        "seconds": round(elapsed, 4),
+        "turns_per_sec": round(completed / elapsed, 2) if elapsed else 0.0,
+        "latency_p50": round(percentile(latencies, 0.50), 4),
+        "latency_p95": round(percentile(latencies, 0.95), 4),
+        "latency_p99": round(percentile(latencies, 0.99), 4),
+        "llm_calls_per_turn": round(llm_calls / completed, 3) if completed else 0.0,
+        "checkpoint_wait_ms_per_turn": (
+            round(checkpoint_seconds * 1000 / completed, 3) if completed else 0.0),
+        "max_queue_wait": round(stats.max_queue_wait, 4),
+    }
+
+
+def find_saturation(stages: list[dict[str, Any]]) -> int | None:
+    """Retorna a concorrência a partir da qual a vazão deixou de crescer."""
+    for previous, current in zip(stages, stages[1:]):
+        if current["turns_per_sec"] < previous["turns_per_sec"] * (1 + SATURATION_GAIN):
+            return previous["concurrency"]
+    return None
+
+
+def _conversations(args: argparse.Namespace) -> Iterator[Conversation]:
+    if args.script:
+        return read_script(args.script)
+    return synthetic_script(args.sessions, args.turns)
+
+
+@asynccontextmanager
+async def _open_graph(
+    checkpointer: CheckpointerConfig, registry: MetricsRegistry
+) -> AsyncIterator[CompiledStateGraph]:
+    async with open_checkpointer(checkpointer) as saver:
+        tools = [now_tool]
+        yield build_chatbot_graph(
+            create_chat_model().bind_tools(tools),
+            tools,
+            checkpointer=instrument_checkpointer(saver, registry),
+            summarization_policy=SummarizationPolicy.from_env(),
+            summary_mode=summary_mode_from_env(),
+            background_summarizer=BackgroundSummarizer(),
+        )
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Executa todos os estágios e retorna o relatório."""
+    # Nunca o CHECKPOINTER_PATH do ambiente: as threads sintéticas não
+    # devem ir para o banco de exemplo do repositório.
+    checkpointer = replace(
+        CheckpointerConfig.from_env(default_kind="sqlite"),
+        path=str(args.checkpointer_path))
+    run_id = secrets.token_hex(3)
+    stages = []
+    async with get_http_client_pool():
+        for concurrency in args.concurrency:
+            registry = MetricsRegistry()
+            async with _open_graph(checkpointer, registry) as graph:
+                stage = await run_stage(
+                    graph,
+                    _conversations(args),
+                    concurrency=concurrency,
+                    ramp_up=args.ramp_up,
+                    turn_timeout=args.turn_timeout,
+                    registry=registry,
+                    run_id=run_id,
+                )
+            stages.append(stage)
+            print(
+                f"c={concurrency:>4}: {stage['turns_per_sec']:>8.1f} turnos/s"
+                f"  p50={stage['latency_p50'] * 1000:.0f}ms"
+                f"  p95={stage['latency_p95'] * 1000:.0f}ms"
+                f"  erros={stage['errors']}"
+                f"  fila={stage['max_queue_wait']:.2f}s"
+            )
+
+    saturation = find_saturation(stages)
+    if saturation is not None:
+        print(f"Saturação a partir de concorrência {saturation}.")
+    return {
+        "run_id": run_id,
+        "checkpointer": checkpointer.kind,
+        "stages": stages,
+        "saturation_concurrency": saturation,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Interpreta os argumentos, executa os estágios e grava o JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--script", type=Path, help="Conversas em JSONL.")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument(
+        "--ramp-up", type=float, default=0.0,
+        help="Segundos até todos os workers de um estágio estarem ativos.")
+    parser.add_argument("--turn-timeout", type=float, default=None)
+    parser.add_argument(
+        "--checkpointer-path", type=Path, default=DEFAULT_CHECKPOINTER_PATH,
+        help=f"Banco SQLite do checkpointer (padrão: {DEFAULT_CHECKPOINTER_PATH}).")
+    parser.add_argument(
+        "--stub", action="store_true",
+        help="Usa o servidor stub local em vez do backend do ambiente.")
+    parser.add_argument("--json", type=Path, help="Grava os resultados em JSON.")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.stub:
+        with StubServer(stub_config_from_args(args)) as server:
+            os.environ.update(server.env())
+            reset_settings()
+            report = asyncio.run(run(args))
+    else:
+        report = asyncio.run(run(args))
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Micro-benchmark da serialização de checkpoints com muitas mensagens.
+
+Simula uma conversa do ReAct (pergunta, chamada de ferramenta com
+resultado volumoso, resposta) e serializa o checkpoint gerado a cada
+mensagem acrescentada, comparando o serializador padrão do LangGraph
+(``JsonPlusSerializer``) com ``CompactSerializer`` com as mensagens
+inline e deduplicadas (como grava o ``CompactAsyncSqliteSaver``).
+Reporta bytes gravados e microssegundos de escrita e leitura por
+checkpoint.
+
+Uso::
+
+    python -m src.benchmarks.checkpoint_serde --turns 20 --tool-payload 4000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+import warnings
+from pathlib import Path
+from typing import Any
+
+from langchain_core.messages import (AIMessage, AnyMessage, HumanMessage,
+                                     ToolMessage)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.helpers.checkpoint_serde import CompactSerializer
+
+SERIALIZERS = ("jsonplus", "compact", "compact-dedup")
+
+
+def build_conversation(turns: int, tool_payload: int, seed: int = 0) -> list[AnyMessage]:
+    """Gera ``turns`` turnos: pergunta, chamada de ferramenta, resultado e resposta."""
+    rng = random.Random(seed)
+    messages: list[AnyMessage] = []
+    for turn in range(turns):
+        call_id = f"call_{turn:04d}"
+        records = []
+        while len(json.dumps(records)) < tool_payload:
+            records.append({
+                "id": rng.randrange(10**6),
+                "name": rng.choice(("alpha", "beta", "gamma", "delta")),
+                "value": round(rng.random() * 1000, 3),
+            })
+        messages.extend([
+            HumanMessage(content=f"Pergunta {turn}: quais são os registros?",
+                         id=f"human-{turn}"),
+            AIMessage(
+                content="",
+                id=f"ai-call-{turn}",
+                tool_calls=[{"name": "buscar", "args": {"turno": turn},
+                             "id": call_id}],
+                response_metadata={"model_name": "stub-model",
+                                   "finish_reason": "tool_calls"},
+                usage_metadata={"input_tokens": 120 + turn * 40,
+                                "output_tokens": 18,
+                                "total_tokens": 138 + turn * 40},
+            ),
+            ToolMessage(content=json.dumps(records), tool_call_id=call_id,
+                        name="buscar", id=f"tool-{turn}"),
+            AIMessage(
+                content=f"Encontrei {len(records)} registros no turno {turn}.",
+                id=f"ai-{turn}",
+                response_metadata={"model_name": "stub-model",
+                                   "finish_reason": "stop"},
+            ),
+        ])
+    return messages
+
+
+def checkpoints(messages: list[AnyMessage]) -> list[dict[str, Any]]:
+    """Um checkpoint (no formato do LangGraph) por mensagem acrescentada."""
+    return [
+        {
+            "v": 4,
+            "id": f"checkpoint-{step:05d}",
+            "ts": "2025-01-01T00:00:00+00:00",
+            "channel_values": {"messages": messages[:step], "summary": ""},
+            "channel_versions": {"messages": f"{step:032d}", "summary": "1"},
+            "versions_seen": {"chat": {"messages": f"{step - 1:032d}"}},
+        }
+        for step in range(1, len(messages) + 1)
+    ]
+
+
+def _make_serializer(name: str) -> Any:
+    if name == "jsonplus":
+        return JsonPlusSerializer()
+    return CompactSerializer()
+
+
+def _serialize_all(
+    name: str, states: list[dict[str, Any]]
+) -> tuple[list[Any], list[float]]:
+    """Serializa os checkpoints em ordem, como o checkpointer de uma thread.
+
+    Um serializador novo por passada: o cache de mensagens do
+    ``CompactSerializer`` só aproveita as mensagens dos checkpoints
+    anteriores, como em uma conversa real.
+    """
+    serde = _make_serializer(name)
+    dumps = (serde.dumps_typed_deduplicated if name == "compact-dedup"
+             else serde.dumps_typed)
+    outputs: list[Any] = []
+    elapsed: list[float] = []
+    for state in states:
+        started = time.perf_counter_ns()
+        outputs.append(dumps(state))
+        elapsed.append((time.perf_counter_ns() - started) / 1000)
+    return outputs, elapsed
+
+
+def run_serializer(
+    name: str, states: list[dict[str, Any]], repeat: int
+) -> dict[str, Any]:
+    """Serializa todos os checkpoints e retorna bytes e tempos médios.
+
+    Cada medida é a menor entre ``repeat`` passadas.
+    """
+    passes = [_serialize_all(name, states) for _ in range(repeat)]
+    outputs = passes[0][0]
+    dump_us = sum(min(times) for times in zip(*(p[1] for p in passes)))
+
+    serde = _make_serializer(name)
+    stored: dict[str, tuple[str, bytes]] = {}
+    total_bytes = 0
+    load_us = 0.0
+    for output in outputs:
+        if name == "compact-dedup":
+            data, messages = output
+            # Só as mensagens ainda não gravadas na thread ocupam espaço.
+            new = {k: v for k, v in messages.items() if k not in stored}
+            stored.update(new)
+            total_bytes += len(data[1]) + sum(len(v[1]) for v in new.values())
+
+            def load(d: Any = data) -> Any:
+                return serde.resolve_refs(serde.loads_typed(d), stored)
+        else:
+            data = output
+            total_bytes += len(data[1])
+
+            def load(d: Any = data) -> Any:
+                return serde.loads_typed(d)
+
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter_ns()
+            load()
+            best = min(best, time.perf_counter_ns() - started)
+        load_us += best / 1000
+
+    count = len(states)
+    return {
+        "serializer": name,
+        "checkpoints": count,
+        "total_bytes": total_bytes,
+        "bytes_per_checkpoint": round(total_bytes / count),
+        "dump_us_per_checkpoint": round(dump_us / count, 1),
+        "load_us_per_checkpoint": round(load_us / count, 1),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Interpreta os argumentos, executa o benchmark e imprime o resultado."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument(
+        "--tool-payload", type=int, default=4000,
+        help="Tamanho aproximado, em bytes, de cada resultado de ferramenta.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--serializers", nargs="+", choices=SERIALIZERS, default=list(SERIALIZERS))
+    parser.add_argument("--json", type=Path, help="Grava os resultados em JSON.")
+    args = parser.parse_args(argv)
+
+    # ``loads`` do langchain-core avisa sobre o padrão de ``allowed_objects``.
+    warnings.simplefilter("ignore", PendingDeprecationWarning)
+    states = checkpoints(build_conversation(args.turns, args.tool_payload))
+
+    results = []
+    for name in args.serializers:
+        result = run_serializer(name, states, max(1, args.repeat))
+        results.append(result)
+        print(
+            f"{name:>14}: {result['bytes_per_checkpoint']:>9} bytes/checkpoint"
+            f"  escrita={result['dump_us_per_checkpoint']:>8.1f}µs"
+            f"  leitura={result['load_us_per_checkpoint']:>8.1f}µs"
+            f"  total={result['total_bytes'] / 1024:.0f}KiB"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
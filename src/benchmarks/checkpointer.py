@@ -0,0 +1,136 @@
+"""Benchmark de checkpoints/segundo com muitos ``thread_id`` concorrentes.
+
+Executa um grafo sem LLM (dois nós que acrescentam mensagens) em várias
+threads simultâneas contra cada modo de checkpointer e reporta quantos
+checkpoints por segundo foram persistidos.
+
+Uso::
+
+    python -m src.benchmarks.checkpointer --threads 200 --turns 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+
+import aiosqlite
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import START, MessagesState, StateGraph
+
+from src.helpers.checkpointer import CheckpointerConfig, open_checkpointer
+
+MODES = ("memory", "sqlite-default", "sqlite-tuned", "sqlite-batched")
+
+
+def _build_graph(checkpointer: BaseCheckpointSaver, payload_size: int):
+    async def chat(state: MessagesState) -> MessagesState:
+        return MessagesState(messages=[AIMessage(content="x" * payload_size)])
+
+    async def tools(state: MessagesState) -> MessagesState:
+        return MessagesState(messages=[AIMessage(content="ok")])
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("chat", chat)
+    graph.add_node("tools", tools)
+    graph.add_edge(START, "chat")
+    graph.add_edge("chat", "tools")
+    return graph.compile(checkpointer=checkpointer)
+
+
+@asynccontextmanager
+async def _open_mode(mode: str, db_path: Path) -> AsyncIterator[BaseCheckpointSaver]:
+    if mode == "sqlite-default":
+        async with aiosqlite.connect(str(db_path)) as conn:
+            saver = AsyncSqliteSaver(conn)
+            await saver.setup()
+            yield saver
+        return
+
+    config = CheckpointerConfig(
+        kind="memory" if mode == "memory" else "sqlite",
+        path=str(db_path),
+        batch_writes=mode == "sqlite-batched",
+    )
+    async with open_checkpointer(config) as saver:
+        yield saver
+
+
+async def run_mode(
+    mode: str,
+    *,
+    threads: int,
+    turns: int,
+    payload_size: int,
+    workdir: Path,
+) -> dict[str, float | int | str]:
+    """Executa o benchmark para um modo e retorna as métricas."""
+    db_path = workdir / f"{mode}.db"
+    async with _open_mode(mode, db_path) as saver:
+        graph = _build_graph(saver, payload_size)
+
+        async def conversation(thread: int) -> None:
+            config = RunnableConfig(configurable={"thread_id": f"bench-{thread}"})
+            for turn in range(turns):
+                message = HumanMessage(content=f"turn {turn}")
+                await graph.ainvoke(MessagesState(messages=[message]), config)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(conversation(i) for i in range(threads)))
+        elapsed = time.perf_counter() - started
+
+        checkpoints = 0
+        async for _ in saver.alist(None):
+            checkpoints += 1
+
+    return {
+        "mode": mode,
+        "threads": threads,
+        "turns": turns,
+        "checkpoints": checkpoints,
+        "seconds": round(elapsed, 4),
+        "checkpoints_per_sec": round(checkpoints / elapsed, 1),
+    }
+
+
+async def main(argv: list[str] | None = None) -> None:
+    """Executa o benchmark para os modos escolhidos e imprime o resultado."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--payload-size", type=int, default=2000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--json", type=Path, help="Grava os resultados em JSON.")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in args.modes:
+            result = await run_mode(
+                mode,
+                threads=args.threads,
+                turns=args.turns,
+                payload_size=args.payload_size,
+                workdir=Path(workdir),
+            )
+            results.append(result)
+            print(
+                f"{mode:>15}: {result['checkpoints']:>6} checkpoints em "
+                f"{result['seconds']:.2f}s -> {result['checkpoints_per_sec']:.0f}/s"
+            )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
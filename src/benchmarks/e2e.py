@@ -0,0 +1,275 @@
+"""Benchmark ponta a ponta dos pontos de entrada ``main_1`` a ``main_4``.
+
+Executa cada cenário (``basis``, ``tools``, ``agent`` e ``chatbot``) com
+várias sessões concorrentes contra o servidor stub local (ou contra o
+endpoint configurado no ambiente, com ``--no-stub``) e reporta vazão,
+latência por turno (p50/p95/p99), chamadas ao LLM por turno e o tempo
+gasto no checkpointer. Os resultados podem ser gravados em JSON para
+comparação ao longo do tempo.
+
+Uso::
+
+    python -m src.benchmarks.e2e --sessions 50 --concurrency 10 --turns 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+from src.benchmarks.stub_server import (StubServer, add_stub_arguments,
+                                        stub_config_from_args)
+from src.envvar import reset_settings
+from src.helpers import (BackgroundSummarizer, CheckpointerConfig,
+                         SummarizationPolicy, create_chat_model,
+                         instrument_checkpointer, instrumented_config,
+                         open_checkpointer)
+from src.helpers.instrumentation import (CHECKPOINT_SECONDS, LLM_SECONDS,
+                                         NODE_SECONDS)
+from src.httpclient import get_http_client_pool
+from src.metrics import MetricsRegistry
+
+SCENARIOS = ("basis", "tools", "agent", "chatbot")
+
+PROMPTS = (
+    "Quem é o presidente?",
+    "Eu sou Cleverson",
+    "Quero saber quem é o presidente do Brasil",
+    "Quantos anos ele tem?",
+    "Que dia é hoje?",
+    "Qual o sobrenome dele?",
+    "Qual o nome real dele?",
+)
+
+TurnRunner = Callable[[str, int], Awaitable[None]]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Percentil com interpolação linear de ``values`` já ordenados."""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _agora_tool():
+    # Importação tardia: os módulos ``main_*`` só são carregados quando
+    # o cenário correspondente é executado.
+    from src.main_2_tools import agora  # pylint: disable=import-outside-toplevel
+
+    return agora
+
+
+def _build_runner(
+    scenario: str,
+    registry: MetricsRegistry,
+    saver: BaseCheckpointSaver | None,
+) -> TurnRunner:
+    callbacks = instrumented_config(registry=registry)
+
+    if scenario == "basis":
+        chat = create_chat_model()
+
+        async def basis_turn(session: str, turn: int) -> None:
+            message = HumanMessage(content=PROMPTS[turn % len(PROMPTS)])
+            await chat.ainvoke([message], config=callbacks)
+
+        return basis_turn
+
+    if scenario == "tools":
+        tools_chat = create_chat_model().bind_tools([_agora_tool()])
+
+        async def tools_turn(session: str, turn: int) -> None:
+            message = HumanMessage(content=PROMPTS[turn % len(PROMPTS)])
+            await tools_chat.ainvoke([message], config=callbacks)
+
+        return tools_turn
+
+    if scenario == "agent":
+        # pylint: disable=import-outside-toplevel
+        from src.main_3_agent import build_agent_graph, tool_agora
+
+        tools = [tool_agora]
+        graph = build_agent_graph(
+            create_chat_model().bind_tools(tools), tools, checkpointer=saver)
+    else:
+        # pylint: disable=import-outside-toplevel
+        from src.main_4_chatbot import (build_chatbot_graph, now_tool,
+                                        summary_mode_from_env)
+
+        tools = [now_tool]
+        graph = build_chatbot_graph(
+            create_chat_model().bind_tools(tools),
+            tools,
+            checkpointer=saver,
+            summarization_policy=SummarizationPolicy.from_env(),
+            summary_mode=summary_mode_from_env(),
+            background_summarizer=BackgroundSummarizer(),
+        )
+
+    async def graph_turn(session: str, turn: int) -> None:
+        config = instrumented_config(
+            RunnableConfig(configurable={"thread_id": session}),
+            registry=registry)
+        message = HumanMessage(content=PROMPTS[turn % len(PROMPTS)])
+        await graph.ainvoke({"messages": [message]}, config=config)
+
+    return graph_turn
+
+
+async def run_scenario(
+    scenario: str,
+    *,
+    sessions: int,
+    concurrency: int,
+    turns: int,
+    checkpointer: CheckpointerConfig,
+) -> dict[str, Any]:
+    """Executa um cenário e retorna as métricas."""
+    registry = MetricsRegistry()
+    latencies: list[float] = []
+    errors = 0
+
+    async with open_checkpointer(checkpointer) as saver:
+        uses_saver = scenario in ("agent", "chatbot")
+        if uses_saver:
+            instrument_checkpointer(saver, registry)
+        run_turn = _build_runner(
+            scenario, registry, saver if uses_saver else None)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def session(index: int) -> None:
+            nonlocal errors
+            async with semaphore:
+                for turn in range(turns):
+                    started = time.perf_counter()
+                    try:
+                        await run_turn(f"{scenario}-{index}", turn)
+                    except Exception:  # pylint: disable=broad-exception-caught
+                        errors += 1
+                        continue
+                    latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(session(i) for i in range(sessions)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    completed = len(latencies)
+    turn_seconds = sum(latencies)
+    llm_calls, _ = registry.histogram(LLM_SECONDS).total()
+    checkpoint_calls, checkpoint_seconds = registry.histogram(
+        CHECKPOINT_SECONDS).total()
+    nodes = registry.histogram(NODE_SECONDS)
+    return {
+        "scenario": scenario,
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "turns": completed,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "turns_per_sec": round(completed / elapsed, 2) if elapsed else 0.0,
+        "latency_p50": round(percentile(latencies, 0.50), 4),
+        "latency_p95": round(percentile(latencies, 0.95), 4),
+        "latency_p99": round(percentile(latencies, 0.99), 4),
+        "llm_calls_per_turn": round(llm_calls / completed, 3) if completed else 0.0,
+        "checkpoint_calls": checkpoint_calls,
+        "checkpoint_wait_ms_per_turn": (
+            round(checkpoint_seconds * 1000 / completed, 3) if completed else 0.0),
+        "checkpoint_share": (
+            round(checkpoint_seconds / turn_seconds, 4) if turn_seconds else 0.0),
+        "node_p50": {
+            series["labels"]["node"]: round(
+                nodes.quantile(0.5, node=series["labels"]["node"]), 4)
+            for series in nodes.snapshot()
+        },
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Executa os cenários escolhidos e retorna o relatório completo."""
+    results = []
+    async with get_http_client_pool():
+        with tempfile.TemporaryDirectory() as workdir:
+            for scenario in args.scenarios:
+                checkpointer = CheckpointerConfig(
+                    kind=args.checkpointer,
+                    path=str(Path(workdir) / f"{scenario}.db"),
+                )
+                result = await run_scenario(
+                    scenario,
+                    sessions=args.sessions,
+                    concurrency=args.concurrency,
+                    turns=args.turns,
+                    checkpointer=checkpointer,
+                )
+                results.append(result)
+                print(
+                    f"{scenario:>8}: {result['turns_per_sec']:>8.1f} turnos/s"
+                    f"  p50={result['latency_p50'] * 1000:.0f}ms"
+                    f"  p95={result['latency_p95'] * 1000:.0f}ms"
+                    f"  p99={result['latency_p99'] * 1000:.0f}ms"
+                    f"  llm/turno={result['llm_calls_per_turn']:.2f}"
+                    f"  checkpoint={result['checkpoint_wait_ms_per_turn']:.1f}ms/turno"
+                    f"  erros={result['errors']}"
+                )
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "checkpointer": args.checkpointer,
+        "stub": None if args.no_stub else {
+            "latency": args.latency,
+            "tokens_per_second": args.tokens_per_second,
+            "completion_tokens": args.completion_tokens,
+            "tool_call_ratio": args.tool_call_ratio,
+        },
+        "results": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Interpreta os argumentos, executa o benchmark e grava o JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument(
+        "--checkpointer", choices=("memory", "sqlite"), default="sqlite")
+    parser.add_argument(
+        "--no-stub", action="store_true",
+        help="Usa o endpoint e o OAuth2 configurados no ambiente.")
+    parser.add_argument("--json", type=Path, help="Grava os resultados em JSON.")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.no_stub:
+        report = asyncio.run(run(args))
+    else:
+        with StubServer(stub_config_from_args(args)) as server:
+            os.environ.update(server.env())
+            reset_settings()
+            report = asyncio.run(run(args))
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark do tempo de importação dos pontos de entrada.
+
+Executa ``python -X importtime -c "import <módulo>"`` em um processo novo
+para cada alvo (a CLI ``src.main``, os quatro cenários e o lote), soma o
+tempo cumulativo dos módulos de topo e lista os módulos mais caros. Com
+``--budget`` o comando termina com código 1 quando algum alvo estoura o
+orçamento, servindo de verificação de regressão da partida.
+
+Uso::
+
+    python -m src.benchmarks.import_time --runs 5 --budget cli=150
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+
+TARGETS = {
+    "cli": "src.main",
+    "basis": "src.main_1_basis",
+    "tools": "src.main_2_tools",
+    "agent": "src.main_3_agent",
+    "chatbot": "src.main_4_chatbot",
+    "batch": "src.main_5_batch",
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure_import(module: str) -> dict[str, Any]:
+    """Importa ``module`` em um processo novo e retorna os tempos, em ms.
+
+    Returns:
+        ``total_ms`` (soma dos módulos de topo, isto é, o custo do import
+        incluindo dependências ainda não carregadas pelo interpretador) e
+        ``modules`` (tempo cumulativo dos módulos de topo e dos que eles
+        importam diretamente).
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+        cwd=Path(__file__).resolve().parents[2],
+    )
+    total_us = 0
+    modules: dict[str, float] = {}
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if match is None:
+            continue
+        _, cumulative, indent, name = match.groups()
+        depth = (len(indent) - 1) // 2
+        if depth == 0:
+            total_us += int(cumulative)
+        if depth <= 1:
+            modules[name] = int(cumulative) / 1000
+    return {"total_ms": total_us / 1000, "modules": modules}
+
+
+def measure_target(module: str, runs: int, top: int) -> dict[str, Any]:
+    """Mede ``runs`` vezes e guarda a menor (a menos afetada por ruído)."""
+    best = min((measure_import(module) for _ in range(runs)),
+               key=lambda m: m["total_ms"])
+    slowest = sorted(best["modules"].items(), key=lambda item: -item[1])
+    return {
+        "module": module,
+        "total_ms": best["total_ms"],
+        "top_modules": [
+            {"module": name, "cumulative_ms": ms}
+            for name, ms in slowest if name != module
+        ][:top],
+    }
+
+
+def parse_budget(value: str) -> tuple[str, float]:
+    """Interpreta ``alvo=ms`` (por exemplo ``cli=150``)."""
+    name, _, budget = value.partition("=")
+    if name not in TARGETS or not budget:
+        msg = f"expected TARGET=MS with TARGET in {', '.join(TARGETS)}"
+        raise argparse.ArgumentTypeError(msg)
+    try:
+        return name, float(budget)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"invalid budget '{budget}'") from exc
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Interpreta os argumentos, mede os alvos e confere os orçamentos."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument(
+        "--budget", type=parse_budget, action="append", default=[],
+        metavar="TARGET=MS", help="Tempo máximo de importação de um alvo.")
+    parser.add_argument("--json", type=Path, help="Grava os resultados em JSON.")
+    args = parser.parse_args(argv)
+
+    budgets = dict(args.budget)
+    results = {}
+    over_budget = []
+    for name in args.targets:
+        result = measure_target(TARGETS[name], max(1, args.runs), args.top)
+        result["budget_ms"] = budgets.get(name)
+        results[name] = result
+        status = ""
+        if name in budgets:
+            ok = result["total_ms"] <= budgets[name]
+            status = f"  (orçamento {budgets[name]:.0f}ms: {'ok' if ok else 'ESTOURADO'})"
+            if not ok:
+                over_budget.append(name)
+        print(f"{name:>8}: {result['total_ms']:>8.1f}ms{status}")
+        for item in result["top_modules"]:
+            print(f"{'':>10}{item['cumulative_ms']:>8.1f}ms  {item['module']}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""Benchmark do roteamento entre réplicas do vLLM (``EndpointRouter``).
+
+Sobe várias réplicas do servidor stub, cada uma com capacidade fixa
+(``--max-concurrency`` completions por vez, como os slots de um lote na
+GPU), e dispara a mesma carga com 1, 2, 4... réplicas em ``VLLM_BASE_URL``.
+Com o roteamento por menor número de requisições em andamento a vazão
+deve crescer quase linearmente com o número de réplicas. Para cada
+estágio são reportados a vazão, a latência (p50/p95), a distribuição das
+requisições entre as réplicas e a fração das sessões atendidas sempre
+pela mesma réplica (afinidade por ``thread_id``).
+
+Com ``--dead`` uma réplica inalcançável é acrescentada à lista, para
+observar a ejeção: depois das primeiras falhas ela deixa de receber
+requisições e as tentativas são repetidas nas demais.
+
+Uso::
+
+    python -m src.benchmarks.router --replicas 1 2 4 --requests 400 \\
+        --concurrency 32 --max-concurrency 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+
+from src.benchmarks.e2e import PROMPTS, percentile
+from src.benchmarks.stub_server import (StubServer, add_stub_arguments,
+                                        stub_config_from_args)
+from src.envvar import reset_settings
+from src.helpers import create_chat_model
+from src.httpclient import (current_routing_key, get_http_client_pool,
+                            routing_key)
+
+
+def _unused_url() -> str:
+    """URL de uma porta local sem servidor (réplica fora do ar)."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1"
+
+
+async def run_stage(
+    base_urls: list[str],
+    *,
+    requests: int,
+    concurrency: int,
+    sessions: int,
+) -> dict[str, Any]:
+    """Executa ``requests`` chamadas ao modelo com as réplicas dadas."""
+    os.environ["VLLM_BASE_URL"] = ",".join(base_urls)
+    reset_settings()
+
+    latencies: list[float] = []
+    errors = 0
+    # Réplicas que atenderam cada sessão, pela URL final da requisição.
+    served_by: dict[str, set[str]] = defaultdict(set)
+
+    async def record(response: httpx.Response) -> None:
+        key = current_routing_key()
+        if key is not None:
+            served_by[key].add(str(response.request.url.netloc, "ascii"))
+
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for index in range(requests):
+        queue.put_nowait(index)
+
+    async def worker(chat: BaseChatModel) -> None:
+        nonlocal errors
+        while not queue.empty():
+            index = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                with routing_key(f"session-{index % sessions}"):
+                    await chat.ainvoke(PROMPTS[index % len(PROMPTS)])
+            except Exception:  # pylint: disable=broad-exception-caught
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    async with get_http_client_pool() as pool:
+        chat = create_chat_model()
+        chat.http_async_client.event_hooks["response"].append(record)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(chat) for _ in range(concurrency)))
+        seconds = time.perf_counter() - started
+        router = pool.vllm_router
+        served = (
+            {e["base_url"]: e["served"] for e in router.snapshot()}
+            if router is not None else {base_urls[0]: requests - errors})
+
+    latencies.sort()
+    sticky = sum(1 for replicas in served_by.values() if len(replicas) == 1)
+    return {
+        "replicas": len(base_urls),
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "requests_per_sec": round(len(latencies) / seconds, 2) if seconds else 0.0,
+        "latency_p50": round(percentile(latencies, 0.50), 4) if latencies else 0.0,
+        "latency_p95": round(percentile(latencies, 0.95), 4) if latencies else 0.0,
+        "sticky_sessions": round(sticky / len(served_by), 3) if served_by else 0.0,
+        "served": served,
+    }
+
+
+async def run(args: argparse.Namespace, base_urls: list[str]) -> dict[str, Any]:
+    """Executa um estágio por quantidade de réplicas e retorna o relatório."""
+    results = []
+    for replicas in args.replicas:
+        urls = base_urls[:replicas] + ([_unused_url()] if args.dead else [])
+        result = await run_stage(
+            urls,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            sessions=args.sessions,
+        )
+        baseline = results[0]["requests_per_sec"] if results else result["requests_per_sec"]
+        result["speedup"] = (
+            round(result["requests_per_sec"] / baseline, 2) if baseline else 0.0)
+        results.append(result)
+        print(
+            f"{replicas:>3} réplica(s): {result['requests_per_sec']:>8.1f} req/s"
+            f"  x{result['speedup']:.2f}"
+            f"  p50={result['latency_p50'] * 1000:.0f}ms"
+            f"  p95={result['latency_p95'] * 1000:.0f}ms"
+            f"  afinidade={result['sticky_sessions']:.0%}"
+            f"  erros={result['errors']}"
+            f"  por réplica={list(result['served'].values())}"
+        )
+    return {
+        "concurrency": args.concurrency,
+        "sessions": args.sessions,
+        "max_concurrency": args.max_concurrency,
+        "dead_replica": args.dead,
+        "results": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Sobe as réplicas stub, executa os estágios e grava o JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--replicas", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--sessions", type=int, default=16,
+        help="Sessões (chaves de afinidade) distintas na carga.")
+    parser.add_argument(
+        "--dead", action="store_true",
+        help="Acrescenta uma réplica inalcançável à lista.")
+    parser.add_argument("--json", type=Path, help="Grava os resultados em JSON.")
+    add_stub_arguments(parser)
+    parser.set_defaults(max_concurrency=4)
+    args = parser.parse_args(argv)
+
+    config = stub_config_from_args(args)
+    with ExitStack() as stack:
+        issuer = stack.enter_context(StubServer(config))
+        servers = [issuer] + [
+            stack.enter_context(StubServer(config, auth_from=issuer))
+            for _ in range(max(args.replicas) - 1)]
+        os.environ.update(issuer.env())
+        # Respostas repetidas viriam do cache, sem passar pelas réplicas.
+        os.environ["LLM_CACHE"] = "off"
+        report = asyncio.run(run(args, [f"{s.base_url}/v1" for s in servers]))
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
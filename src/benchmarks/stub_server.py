@@ -0,0 +1,486 @@
+"""Servidor local compatível com a API da OpenAI e com o endpoint OAuth2.
+
+Substitui o vLLM e o provedor OAuth2 em benchmarks e testes manuais:
+
+- ``POST /token``: emite tokens ``client_credentials`` (com ``expires_in``);
+- ``POST /v1/chat/completions``: responde com latência e taxa de tokens
+  configuráveis, gera chamadas de ferramenta quando o pedido oferece
+  ``tools`` e suporta ``stream`` (SSE);
+- ``GET /v1/models``: lista o modelo (usado nas verificações de saúde do
+  roteador de réplicas);
+- ``GET /stats``: contadores de chamadas, usados para medir chamadas ao
+  LLM por turno.
+
+Várias instâncias simulam réplicas do vLLM: com ``max_concurrency`` cada
+uma processa um número fixo de completions por vez (as demais esperam),
+como os slots de um lote na GPU, e ``auth_from`` faz uma réplica aceitar
+os tokens emitidos por outra.
+
+Uso::
+
+    python -m src.benchmarks.stub_server --port 8000 --latency 0.2
+
+Com o servidor no ar, exporte as variáveis impressas na partida (ou use
+``StubServer.env()``) para que ``OAuth2ClientConfig.from_env`` e
+``create_chat_model`` apontem para ele.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import secrets
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs
+
+from src.helpers.token_budget import heuristic_token_count
+
+STUB_MODEL_ID = "stub-model"
+STUB_CLIENT_ID = "stub-client"
+STUB_CLIENT_SECRET = "stub-secret"
+
+
+@dataclass(frozen=True, kw_only=True)
+class StubServerConfig:  # pylint: disable=too-few-public-methods
+    """
+    Comportamento simulado do servidor.
+
+    Atributos:
+        latency (float): Segundos até o primeiro token (prefill).
+        tokens_per_second (float): Taxa de geração dos tokens da resposta.
+        completion_tokens (int): Tokens gerados por resposta de texto.
+        tool_call_ratio (float): Fração (0 a 1) das mensagens de usuário
+            respondidas com uma chamada de ferramenta quando o pedido
+            oferece ``tools``; a escolha é determinística pelo conteúdo.
+        token_ttl (int): ``expires_in`` dos tokens OAuth2 emitidos.
+        require_auth (bool): Rejeita com 401 tokens não emitidos ou expirados.
+        max_inflight (int | None): Completions simultâneas aceitas; acima
+            disso responde 429 com ``Retry-After`` (simula sobrecarga).
+        max_concurrency (int | None): Completions processadas ao mesmo
+            tempo; as excedentes esperam a vez (capacidade da réplica).
+    """
+    latency: float = 0.05
+    tokens_per_second: float = 500.0
+    completion_tokens: int = 24
+    tool_call_ratio: float = 1.0
+    token_ttl: int = 3600
+    require_auth: bool = True
+    max_inflight: int | None = None
+    max_concurrency: int | None = None
+
+
+class _StubState:
+    """Tokens emitidos e contadores, compartilhados entre as threads."""
+
+    def __init__(self, tokens: dict[str, float] | None = None) -> None:
+        self.lock = threading.Lock()
+        self.tokens: dict[str, float] = {} if tokens is None else tokens
+        self.inflight = 0
+        self.counters = {
+            "token_requests": 0,
+            "chat_completions": 0,
+            "tool_call_responses": 0,
+            "streamed": 0,
+            "unauthorized": 0,
+            "throttled": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
+
+    def count(self, **increments: int) -> None:
+        with self.lock:
+            for name, value in increments.items():
+                self.counters[name] += value
+
+    def snapshot(self) -> dict[str, int]:
+        with self.lock:
+            return dict(self.counters)
+
+
+def _message_text(message: dict[str, Any]) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(
+            str(part.get("text", "")) for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def _sample_arguments(parameters: dict[str, Any]) -> dict[str, Any]:
+    samples = {"integer": 2, "number": 2.0, "boolean": True, "string": "stub"}
+    properties = parameters.get("properties", {})
+    return {
+        name: samples.get(schema.get("type", "string"), "stub")
+        for name, schema in properties.items()
+        if name in parameters.get("required", properties)
+    }
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_StubHTTPServer"
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        pass
+
+    def _send_json(
+        self,
+        status: int,
+        payload: dict[str, Any],
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.server.state.snapshot())
+        elif self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": STUB_MODEL_ID, "object": "model", "owned_by": "stub"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        body = self._read_body()
+        if self.path.rstrip("/") == "/token":
+            self._issue_token(body)
+        elif self.path.rstrip("/").endswith("/chat/completions"):
+            self._chat_completion(body)
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def _issue_token(self, body: bytes) -> None:
+        form = parse_qs(body.decode("utf-8"))
+        if form.get("grant_type", ["client_credentials"])[0] != "client_credentials":
+            self._send_json(400, {"error": "unsupported_grant_type"})
+            return
+
+        token = secrets.token_urlsafe(24)
+        ttl = self.server.config.token_ttl
+        state = self.server.state
+        with state.lock:
+            state.tokens[token] = time.time() + ttl
+        state.count(token_requests=1)
+        self._send_json(200, {
+            "access_token": token,
+            "token_type": "Bearer",
+            "expires_in": ttl,
+        })
+
+    def _authorized(self) -> bool:
+        if not self.server.config.require_auth:
+            return True
+        header = self.headers.get("Authorization", "")
+        token = header.removeprefix("Bearer ").strip()
+        state = self.server.state
+        with state.lock:
+            expires_at = state.tokens.get(token)
+        return expires_at is not None and expires_at > time.time()
+
+    def _wants_tool_call(self, request: dict[str, Any]) -> bool:
+        messages = request.get("messages") or []
+        if not request.get("tools") or not messages:
+            return False
+        last = messages[-1]
+        if last.get("role") != "user":
+            return False
+        digest = hashlib.sha1(_message_text(last).encode("utf-8")).digest()
+        return digest[0] / 256 < self.server.config.tool_call_ratio
+
+    def _chat_completion(self, body: bytes) -> None:
+        state = self.server.state
+        if not self._authorized():
+            state.count(unauthorized=1)
+            self._send_json(401, {"error": {
+                "message": "invalid or expired token", "type": "invalid_request_error"}})
+            return
+
+        config = self.server.config
+        with state.lock:
+            throttled = (
+                config.max_inflight is not None
+                and state.inflight >= config.max_inflight)
+            if not throttled:
+                state.inflight += 1
+        if throttled:
+            state.count(throttled=1)
+            self._send_json(429, {"error": {
+                "message": "too many requests", "type": "rate_limit_error"}},
+                headers={"Retry-After": "0.1"})
+            return
+        try:
+            slots = self.server.slots
+            if slots is None:
+                self._complete(json.loads(body or b"{}"))
+            else:
+                with slots:
+                    self._complete(json.loads(body or b"{}"))
+        finally:
+            with state.lock:
+                state.inflight -= 1
+
+    def _complete(self, request: dict[str, Any]) -> None:
+        state = self.server.state
+        config = self.server.config
+        prompt_tokens = sum(
+            4 + heuristic_token_count(_message_text(m))
+            for m in request.get("messages", []))
+
+        tool_calls = None
+        if self._wants_tool_call(request):
+            function = request["tools"][0]["function"]
+            tool_calls = [{
+                "id": f"call_{secrets.token_hex(6)}",
+                "type": "function",
+                "function": {
+                    "name": function["name"],
+                    "arguments": json.dumps(
+                        _sample_arguments(function.get("parameters", {}))),
+                },
+            }]
+            words = []
+        else:
+            words = [f"tok{i}" for i in range(config.completion_tokens)]
+
+        completion_tokens = max(len(words), 1)
+        state.count(
+            chat_completions=1,
+            tool_call_responses=1 if tool_calls else 0,
+            streamed=1 if request.get("stream") else 0,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        meta = {
+            "id": f"chatcmpl-{secrets.token_hex(8)}",
+            "created": int(time.time()),
+            "model": request.get("model", STUB_MODEL_ID),
+        }
+
+        time.sleep(config.latency)
+        if request.get("stream"):
+            include_usage = bool(
+                (request.get("stream_options") or {}).get("include_usage"))
+            self._stream(meta, words, tool_calls, usage if include_usage else None)
+            return
+
+        time.sleep(len(words) / config.tokens_per_second)
+        message: dict[str, Any] = {"role": "assistant", "content": " ".join(words)}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        self._send_json(200, {
+            **meta,
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _stream(
+        self,
+        meta: dict[str, Any],
+        words: list[str],
+        tool_calls: list[dict[str, Any]] | None,
+        usage: dict[str, int] | None,
+    ) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(chunk: dict[str, Any]) -> None:
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def event(delta: dict[str, Any], finish_reason: str | None = None) -> None:
+            send({
+                **meta,
+                "object": "chat.completion.chunk",
+                "choices": [{
+                    "index": 0, "delta": delta, "finish_reason": finish_reason}],
+            })
+
+        event({"role": "assistant", "content": ""})
+        if tool_calls:
+            event({"tool_calls": [{"index": 0, **call} for call in tool_calls]})
+        interval = 1.0 / self.server.config.tokens_per_second
+        for index, word in enumerate(words):
+            event({"content": word if index == 0 else f" {word}"})
+            time.sleep(interval)
+        event({}, "tool_calls" if tool_calls else "stop")
+        if usage is not None:
+            send({**meta, "object": "chat.completion.chunk",
+                  "choices": [], "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        config: StubServerConfig,
+        tokens: dict[str, float] | None = None,
+    ) -> None:
+        super().__init__(address, _StubHandler)
+        self.config = config
+        self.state = _StubState(tokens)
+        self.slots = (
+            threading.BoundedSemaphore(config.max_concurrency)
+            if config.max_concurrency else None)
+
+
+class StubServer:
+    """Servidor stub em uma thread de fundo.
+
+    Pode ser usado como gerenciador de contexto::
+
+        with StubServer(StubServerConfig(latency=0.1)) as server:
+            os.environ.update(server.env())
+            reset_settings()  # src.envvar
+            ...
+
+    Args:
+        config: Comportamento simulado.
+        host: Endereço de escuta.
+        port: Porta (0 escolhe uma livre).
+        auth_from: Servidor cujos tokens emitidos também são aceitos
+            (réplicas atrás do mesmo provedor OAuth2).
+    """
+
+    def __init__(
+        self,
+        config: StubServerConfig | None = None,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        auth_from: "StubServer | None" = None,
+    ) -> None:
+        tokens = None if auth_from is None else auth_from._httpd.state.tokens
+        self._httpd = _StubHTTPServer(
+            (host, port), config or StubServerConfig(), tokens)
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        """URL base do servidor (sem ``/v1``)."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict[str, str]:
+        """Variáveis de ambiente que apontam os helpers para o servidor."""
+        return {
+            "VLLM_MODEL_ID": STUB_MODEL_ID,
+            "VLLM_BASE_URL": f"{self.base_url}/v1",
+            "OAUTH2_TOKEN_URL": f"{self.base_url}/token",
+            "OAUTH2_CLIENT_ID": STUB_CLIENT_ID,
+            "OAUTH2_CLIENT_SECRET": STUB_CLIENT_SECRET,
+        }
+
+    def stats(self) -> dict[str, int]:
+        """Retorna os contadores de chamadas."""
+        return self._httpd.state.snapshot()
+
+    def start(self) -> "StubServer":
+        """Inicia o servidor em uma thread daemon."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._httpd.serve_forever, name="stub-server", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Encerra o servidor."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adiciona ao parser as opções de ``StubServerConfig``."""
+    defaults = StubServerConfig()
+    parser.add_argument("--latency", type=float, default=defaults.latency)
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument(
+        "--completion-tokens", type=int, default=defaults.completion_tokens)
+    parser.add_argument(
+        "--tool-call-ratio", type=float, default=defaults.tool_call_ratio)
+    parser.add_argument(
+        "--max-inflight", type=int, default=defaults.max_inflight,
+        help="Completions simultâneas antes de responder 429.")
+    parser.add_argument(
+        "--max-concurrency", type=int, default=defaults.max_concurrency,
+        help="Completions processadas ao mesmo tempo (as demais esperam).")
+
+
+def stub_config_from_args(args: argparse.Namespace) -> StubServerConfig:
+    """Cria ``StubServerConfig`` a partir das opções de ``add_stub_arguments``."""
+    return StubServerConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        tool_call_ratio=args.tool_call_ratio,
+        max_inflight=args.max_inflight,
+        max_concurrency=args.max_concurrency,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Executa o servidor em primeiro plano."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    config = stub_config_from_args(args)
+    server = StubServer(config, host=args.host, port=args.port)
+    print(json.dumps(asdict(config)))
+    for name, value in server.env().items():
+        print(f"{name}={value}")
+    try:
+        server.start()
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,23 @@
 """Barrel exports for environment variable helpers."""
 
-from .core import get_env
+from .core import ensure_env_loaded, get_env
+from .settings import (
+    CheckpointerSettings,
+    GraphRenderSettings,
+    HttpSettings,
+    MemorySettings,
+    MetricsSettings,
+    OAuthSettings,
+    ResponseCacheSettings,
+    RetentionSettings,
+    Settings,
+    SettingsError,
+    SummarySettings,
+    ToolSettings,
+    VllmSettings,
+    configured,
+    finite,
+    get_settings,
+    load_settings,
+    reset_settings,
+)
@@ -8,7 +8,7 @@ from dotenv import find_dotenv, load_dotenv
 _ENV_LOADED = False
 
 
-def _ensure_env_loaded(*, usecwd: bool = True) -> None:
+def ensure_env_loaded(*, usecwd: bool = True) -> None:
     """Load a ``.env`` file once so environment lookups succeed."""
     global _ENV_LOADED  # cache flag guarding repeated loads
     if _ENV_LOADED:
@@ -23,7 +23,7 @@ def _ensure_env_loaded(*, usecwd: bool = True) -> None:
 
 def get_env(name: str) -> str:
     """Return a required environment variable value or raise an error."""
-    _ensure_env_loaded()
+    ensure_env_loaded()
 
     value = os.getenv(name, "").strip()
     if not value:
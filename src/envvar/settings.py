@@ -0,0 +1,453 @@
+"""Typed, immutable process settings loaded once from the environment.
+
+``get_settings`` reads the environment (and the ``.env`` file) a single
+time, validates every variable and returns a frozen ``Settings`` object.
+Invalid or missing values are reported together in one ``SettingsError``
+at startup instead of silently falling back to defaults deep inside a
+request. Afterwards, configuration lookups are plain attribute reads.
+
+The vLLM endpoint and the OAuth2 credentials are only required by the
+code that talks to the model: a missing ``VLLM_*``/``OAUTH2_*`` variable
+is reported by ``VllmSettings.require``/``OAuthSettings.require`` (called
+by ``OAuth2ClientConfig.from_env``, ``get_base_chat_kargs``...), so the
+other sections (tools, retention, rendering, metrics...) load without
+them. Malformed values are still reported by ``get_settings``.
+
+Optional knobs left unset are ``None``: the component that consumes them
+(``HttpPoolConfig``, ``RetryPolicy``, ``CheckpointerConfig``...) applies
+its own default, so defaults live in a single place. Limits that accept
+``off`` are stored as ``math.inf`` (no limit).
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping
+
+from .core import ensure_env_loaded
+
+_TRUE = ("1", "true", "yes", "on")
+_FALSE = ("0", "false", "no", "off")
+_OFF = ("off", "none")
+
+
+class SettingsError(ValueError):
+    """Raised when one or more environment variables are missing or invalid."""
+
+    def __init__(self, errors: Iterable[str]) -> None:
+        self.errors = tuple(errors)
+        super().__init__(
+            "Invalid configuration:\n" + "\n".join(f"- {e}" for e in self.errors))
+
+
+@dataclass(frozen=True, kw_only=True)
+class VllmSettings:  # pylint: disable=too-few-public-methods
+    """vLLM endpoints (``VLLM_MODEL_ID``, ``VLLM_BASE_URL``, ``VLLM_ROUTER_*``).
+
+    ``VLLM_BASE_URL`` accepts a comma-separated list of replicas;
+    ``base_url`` is the first one and ``base_urls`` holds all of them.
+    ``missing`` lists the required variables left unset (see ``require``).
+    """
+    model_id: str
+    base_url: str
+    base_urls: tuple[str, ...] = ()
+    router_affinity: bool | None = None
+    router_eject_after: int | None = None
+    router_eject_seconds: float | None = None
+    router_health_interval: float | None = None
+    missing: tuple[str, ...] = ()
+
+    def require(self) -> "VllmSettings":
+        """Return these settings, or raise if a required variable is unset.
+
+        Raises:
+            SettingsError: Listing the missing ``VLLM_*`` variables.
+        """
+        return _require(self, self.missing)
+
+
+@dataclass(frozen=True, kw_only=True)
+class OAuthSettings:  # pylint: disable=too-few-public-methods
+    """OAuth2 client credentials and token cache (``OAUTH2_*``).
+
+    ``missing`` lists the required variables left unset (see ``require``).
+    """
+    token_url: str
+    client_id: str
+    client_secret: str
+    base_url: str | None = None
+    auth_timeout: int | None = None
+    verify: bool | None = None
+    token_cache: str | None = None
+    token_cache_path: str | None = None
+    token_cache_key: str | None = None
+    missing: tuple[str, ...] = ()
+
+    def require(self) -> "OAuthSettings":
+        """Return these settings, or raise if a credential is unset.
+
+        Raises:
+            SettingsError: Listing the missing ``OAUTH2_*`` variables.
+        """
+        return _require(self, self.missing)
+
+
+@dataclass(frozen=True, kw_only=True)
+class CheckpointerSettings:  # pylint: disable=too-few-public-methods
+    """Checkpointer backend (``CHECKPOINTER*``)."""
+    kind: str | None = None
+    path: str | None = None
+    synchronous: str | None = None
+    batch_writes: bool | None = None
+    serializer: str | None = None
+    compress_threshold: int | None = None
+
+
+@dataclass(frozen=True, kw_only=True)
+class ResponseCacheSettings:  # pylint: disable=too-few-public-methods
+    """LLM response cache (``LLM_CACHE*``)."""
+    backend: str | None = None
+    path: str | None = None
+    max_entries: int | None = None
+    ttl: float | None = None
+
+
+@dataclass(frozen=True, kw_only=True)
+class HttpSettings:  # pylint: disable=too-few-public-methods
+    """Connection pool, timeouts, retries and client-side rate limits.
+
+    Read from ``HTTP_*`` and ``LLM_RATE_LIMIT_RPM``/``LLM_RATE_LIMIT_TPM``.
+    """
+    max_connections: int | None = None
+    max_keepalive_connections: int | None = None
+    keepalive_expiry: float | None = None
+    http2: bool | None = None
+    verify: bool | None = None
+    connect_timeout: float | None = None
+    read_timeout: float | None = None
+    retry_max_attempts: int | None = None
+    retry_deadline: float | None = None
+    rate_limit_rpm: float | None = None
+    rate_limit_tpm: float | None = None
+
+
+@dataclass(frozen=True, kw_only=True)
+class ToolSettings:  # pylint: disable=too-few-public-methods
+    """Tool execution limits (``TOOL_TIMEOUT_SECONDS``, ``TOOL_MAX_CONCURRENCY``)."""
+    timeout: float | None = None
+    max_concurrency: int | None = None
+
+
+@dataclass(frozen=True, kw_only=True)
+class MemorySettings:  # pylint: disable=too-few-public-methods
+    """Chatbot long-term vector memory (``LONG_TERM_MEMORY*``)."""
+    backend: str | None = None
+    path: str | None = None
+    top_k: int | None = None
+    min_score: float | None = None
+    dimensions: int | None = None
+    chunk_chars: int | None = None
+    nprobe: int | None = None
+
+
+@dataclass(frozen=True, kw_only=True)
+class SummarySettings:  # pylint: disable=too-few-public-methods
+    """Token-budget summarization (``SUMMARY_*``)."""
+    high_watermark: int | None = None
+    low_watermark: int | None = None
+    tokenizer: str | None = None
+    mode: str | None = None
+
+
+@dataclass(frozen=True, kw_only=True)
+class RetentionSettings:  # pylint: disable=too-few-public-methods
+    """Checkpoint retention (``CHECKPOINT_KEEP_LAST``, ``CHECKPOINT_TTL_SECONDS``...).
+
+    ``keep_last`` and ``ttl`` accept ``off`` to disable that criterion.
+    """
+    keep_last: float | None = None
+    ttl: float | None = None
+    interval: float | None = None
+
+
+@dataclass(frozen=True, kw_only=True)
+class GraphRenderSettings:  # pylint: disable=too-few-public-methods
+    """Graph diagrams (``GRAPH_RENDER``, ``GRAPH_RENDER_METHOD``, ``GRAPH_RENDER_WORKERS``)."""
+    enabled: bool | None = None
+    method: str | None = None
+    workers: int | None = None
+
+
+@dataclass(frozen=True, kw_only=True)
+class MetricsSettings:  # pylint: disable=too-few-public-methods
+    """In-process metrics (``METRICS``, ``METRICS_EXPORT``)."""
+    enabled: bool | None = None
+    export_path: str | None = None
+
+
+@dataclass(frozen=True, kw_only=True)
+class Settings:  # pylint: disable=too-few-public-methods
+    """Validated configuration of the process."""
+    vllm: VllmSettings
+    oauth: OAuthSettings
+    checkpointer: CheckpointerSettings
+    llm_cache: ResponseCacheSettings
+    http: HttpSettings
+    tools: ToolSettings
+    memory: MemorySettings
+    summary: SummarySettings
+    retention: RetentionSettings
+    graph_render: GraphRenderSettings
+    metrics: MetricsSettings
+
+    def require_llm(self) -> None:
+        """Raise unless the vLLM endpoint and the OAuth2 credentials are set.
+
+        Raises:
+            SettingsError: Listing every missing ``VLLM_*``/``OAUTH2_*`` variable.
+        """
+        _require(self, self.vllm.missing + self.oauth.missing)
+
+
+def _require(section: Any, missing: tuple[str, ...]) -> Any:
+    if missing:
+        raise SettingsError(f"{name} is required." for name in missing)
+    return section
+
+
+def configured(**values: Any) -> dict[str, Any]:
+    """Return the keyword arguments whose value was configured (not ``None``)."""
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def finite(value: float | None) -> float | None:
+    """Map an ``off`` limit (``math.inf``) to ``None``."""
+    return None if value is not None and math.isinf(value) else value
+
+
+class _EnvReader:
+    """Parses variables from ``environ``, collecting every error."""
+
+    def __init__(self, environ: Mapping[str, str]) -> None:
+        self.environ = environ
+        self.errors: list[str] = []
+
+    def missing(self, *names: str) -> tuple[str, ...]:
+        """Return the variables of ``names`` left unset (checked on use)."""
+        return tuple(name for name in names if not self.environ.get(name, "").strip())
+
+    def text(self, name: str, *, required: bool = False) -> str | None:
+        value = self.environ.get(name, "").strip()
+        if value:
+            return value
+        if required:
+            self.errors.append(f"{name} is required.")
+        return None
+
+    def url(self, name: str, *, required: bool = False) -> str | None:
+        value = self.text(name, required=required)
+        if value is not None and not value.startswith(("http://", "https://")):
+            self.errors.append(f"{name} must be an http(s) URL, got '{value}'.")
+            return None
+        return value
+
+    def urls(self, name: str, *, required: bool = False) -> tuple[str, ...]:
+        """Parse a comma-separated list of http(s) URLs (trailing ``/`` removed)."""
+        value = self.text(name, required=required)
+        if value is None:
+            return ()
+        urls = tuple(url.strip().rstrip("/") for url in value.split(",") if url.strip())
+        invalid = [url for url in urls if not url.startswith(("http://", "https://"))]
+        if invalid or not urls:
+            self.errors.append(
+                f"{name} must be a comma-separated list of http(s) URLs, got '{value}'.")
+            return ()
+        if len(set(urls)) != len(urls):
+            self.errors.append(f"{name} lists the same URL more than once.")
+            return ()
+        return urls
+
+    def choice(self, name: str, choices: Iterable[str]) -> str | None:
+        """Return the matching option (case-insensitive) in its canonical case."""
+        value = self.text(name)
+        if value is None:
+            return None
+        options = tuple(choices)
+        for option in options:
+            if value.lower() == option.lower():
+                return option
+        self.errors.append(
+            f"{name} must be one of {', '.join(options)}, got '{value}'.")
+        return None
+
+    def flag(self, name: str) -> bool | None:
+        value = self.text(name)
+        if value is None:
+            return None
+        if value.lower() in _TRUE:
+            return True
+        if value.lower() in _FALSE:
+            return False
+        self.errors.append(f"{name} must be a boolean (on/off), got '{value}'.")
+        return None
+
+    def integer(self, name: str, *, allow_off: bool = False) -> int | float | None:
+        value = self.text(name)
+        if value is None:
+            return None
+        if allow_off and value.lower() in _OFF:
+            return math.inf
+        try:
+            number = int(value)
+        except ValueError:
+            number = 0
+        if number < 1:
+            expected = "a positive integer" + (" or 'off'" if allow_off else "")
+            self.errors.append(f"{name} must be {expected}, got '{value}'.")
+            return None
+        return number
+
+    def number(self, name: str, *, allow_off: bool = False) -> float | None:
+        value = self.text(name)
+        if value is None:
+            return None
+        if allow_off and value.lower() in _OFF:
+            return math.inf
+        try:
+            number = float(value)
+        except ValueError:
+            number = math.nan
+        if not number > 0 or math.isinf(number):
+            expected = "a positive number" + (" or 'off'" if allow_off else "")
+            self.errors.append(f"{name} must be {expected}, got '{value}'.")
+            return None
+        return number
+
+
+def load_settings(environ: Mapping[str, str] | None = None) -> Settings:
+    """Read and validate the settings from ``environ`` (``os.environ`` by default).
+
+    Raises:
+        SettingsError: Listing every missing or invalid variable.
+    """
+    if environ is None:
+        ensure_env_loaded()
+        environ = os.environ
+    env = _EnvReader(environ)
+    vllm_urls = env.urls("VLLM_BASE_URL")
+
+    settings = Settings(
+        vllm=VllmSettings(
+            model_id=env.text("VLLM_MODEL_ID") or "",
+            base_url=vllm_urls[0] if vllm_urls else "",
+            base_urls=vllm_urls,
+            router_affinity=env.flag("VLLM_ROUTER_AFFINITY"),
+            router_eject_after=env.integer("VLLM_ROUTER_EJECT_AFTER"),
+            router_eject_seconds=env.number("VLLM_ROUTER_EJECT_SECONDS"),
+            router_health_interval=env.number(
+                "VLLM_ROUTER_HEALTH_INTERVAL", allow_off=True),
+            missing=env.missing("VLLM_BASE_URL", "VLLM_MODEL_ID"),
+        ),
+        oauth=OAuthSettings(
+            token_url=env.url("OAUTH2_TOKEN_URL") or "",
+            client_id=env.text("OAUTH2_CLIENT_ID") or "",
+            client_secret=env.text("OAUTH2_CLIENT_SECRET") or "",
+            base_url=env.url("SERVICE_BASE_URL"),
+            auth_timeout=env.integer("OAUTH2_AUTH_TIMEOUT"),
+            verify=env.flag("OAUTH2_VERIFY"),
+            token_cache=env.choice("OAUTH2_TOKEN_CACHE", ("memory", "file", "sqlite")),
+            token_cache_path=env.text("OAUTH2_TOKEN_CACHE_PATH"),
+            token_cache_key=env.text("OAUTH2_TOKEN_CACHE_KEY"),
+            missing=env.missing(
+                "OAUTH2_TOKEN_URL", "OAUTH2_CLIENT_ID", "OAUTH2_CLIENT_SECRET"),
+        ),
+        checkpointer=CheckpointerSettings(
+            kind=env.choice("CHECKPOINTER", ("memory", "sqlite")),
+            path=env.text("CHECKPOINTER_PATH"),
+            synchronous=env.choice(
+                "CHECKPOINTER_SQLITE_SYNCHRONOUS", ("OFF", "NORMAL", "FULL", "EXTRA")),
+            batch_writes=env.flag("CHECKPOINTER_BATCH_WRITES"),
+            serializer=env.choice("CHECKPOINTER_SERDE", ("compact", "jsonplus")),
+            compress_threshold=env.integer("CHECKPOINTER_COMPRESS_THRESHOLD"),
+        ),
+        llm_cache=ResponseCacheSettings(
+            backend=env.choice("LLM_CACHE", ("off", "memory", "sqlite")),
+            path=env.text("LLM_CACHE_PATH"),
+            max_entries=env.integer("LLM_CACHE_MAX_ENTRIES"),
+            ttl=finite(env.number("LLM_CACHE_TTL_SECONDS", allow_off=True)),
+        ),
+        http=HttpSettings(
+            max_connections=env.integer("HTTP_MAX_CONNECTIONS"),
+            max_keepalive_connections=env.integer("HTTP_MAX_KEEPALIVE_CONNECTIONS"),
+            keepalive_expiry=env.number("HTTP_KEEPALIVE_EXPIRY"),
+            http2=env.flag("HTTP_HTTP2"),
+            verify=env.flag("HTTP_VERIFY"),
+            connect_timeout=env.number("HTTP_CONNECT_TIMEOUT"),
+            read_timeout=env.number("HTTP_READ_TIMEOUT"),
+            retry_max_attempts=env.integer("HTTP_RETRY_MAX_ATTEMPTS"),
+            retry_deadline=env.number("HTTP_RETRY_DEADLINE_SECONDS", allow_off=True),
+            rate_limit_rpm=finite(env.number("LLM_RATE_LIMIT_RPM", allow_off=True)),
+            rate_limit_tpm=finite(env.number("LLM_RATE_LIMIT_TPM", allow_off=True)),
+        ),
+        tools=ToolSettings(
+            timeout=env.number("TOOL_TIMEOUT_SECONDS", allow_off=True),
+            max_concurrency=env.integer("TOOL_MAX_CONCURRENCY"),
+        ),
+        memory=MemorySettings(
+            backend=env.choice("LONG_TERM_MEMORY", ("off", "memory", "disk")),
+            path=env.text("LONG_TERM_MEMORY_PATH"),
+            top_k=env.integer("LONG_TERM_MEMORY_TOP_K"),
+            min_score=env.number("LONG_TERM_MEMORY_MIN_SCORE"),
+            dimensions=env.integer("LONG_TERM_MEMORY_DIMENSIONS"),
+            chunk_chars=env.integer("LONG_TERM_MEMORY_CHUNK_CHARS"),
+            nprobe=env.integer("LONG_TERM_MEMORY_NPROBE"),
+        ),
+        summary=SummarySettings(
+            high_watermark=env.integer("SUMMARY_HIGH_WATERMARK_TOKENS"),
+            low_watermark=env.integer("SUMMARY_LOW_WATERMARK_TOKENS"),
+            tokenizer=env.choice("SUMMARY_TOKENIZER", ("heuristic", "tiktoken")),
+            mode=env.choice("SUMMARY_MODE", ("inline", "background")),
+        ),
+        retention=RetentionSettings(
+            keep_last=env.integer("CHECKPOINT_KEEP_LAST", allow_off=True),
+            ttl=env.number("CHECKPOINT_TTL_SECONDS", allow_off=True),
+            interval=env.number("CHECKPOINT_RETENTION_INTERVAL"),
+        ),
+        graph_render=GraphRenderSettings(
+            enabled=env.flag("GRAPH_RENDER"),
+            method=env.choice(
+                "GRAPH_RENDER_METHOD",
+                ("svg", "svg_png", "pyppeteer", "mermaid", "ascii")),
+            workers=env.integer("GRAPH_RENDER_WORKERS"),
+        ),
+        metrics=MetricsSettings(
+            enabled=env.flag("METRICS"),
+            export_path=env.text("METRICS_EXPORT"),
+        ),
+    )
+    if env.errors:
+        raise SettingsError(env.errors)
+    return settings
+
+
+_SETTINGS: Settings | None = None
+
+
+def get_settings() -> Settings:
+    """Return the process settings, loading and validating them on first use."""
+    global _SETTINGS  # loaded once per process
+    if _SETTINGS is None:
+        _SETTINGS = load_settings()
+    return _SETTINGS
+
+
+def reset_settings() -> None:
+    """Discard the loaded settings so the next ``get_settings`` re-reads them.
+
+    Only needed when the environment changes at runtime (e.g. benchmarks
+    pointing the process at a local stub server).
+    """
+    global _SETTINGS  # loaded once per process
+    _SETTINGS = None
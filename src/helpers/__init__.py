@@ -1,4 +1,87 @@
-"""Helper utilities for LangGraph experiments."""
+"""Helper utilities for LangGraph experiments.
 
-from .chat_kargs import get_chat_kargs
-from .graph_rendering import render_graph
+Submodules are imported on first attribute access (PEP 562), so importing
+one helper does not pull in the dependencies of all the others (OpenAI
+client, LangGraph, SQLite checkpointer, graph rendering...).
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .background_summarizer import BackgroundSummarizer, SummaryResult
+    from .batch_inference import (BatchRequest, BatchStats, read_requests,
+                                  run_batch)
+    from .chat_kargs import get_chat_kargs
+    from .chat_model import OAuth2BearerAuth, create_chat_model
+    from .checkpoint_retention import (CheckpointRetention, RetentionPolicy,
+                                       StorageStats, ThreadStorageStats)
+    from .checkpoint_serde import CompactSerializer
+    from .checkpointer import (BatchedAsyncSqliteSaver, CheckpointerConfig,
+                               CompactAsyncSqliteSaver, open_checkpointer)
+    from .graph_rendering import (drain_background_renders, render_graph,
+                                  render_graphs, schedule_render_graph)
+    from .instrumentation import (GraphInstrumentation,
+                                  instrument_checkpointer, instrumented_config)
+    from .long_term_memory import (EmbeddingsEmbedder, HashingEmbedder,
+                                   LongTermMemory, LongTermMemoryConfig,
+                                   MemoryHit, create_long_term_memory)
+    from .prompt_assembly import assemble_prompt
+    from .response_cache import (LLMResponseCache, ResponseCacheConfig,
+                                 get_response_cache)
+    from .streaming import StreamResult, stream_graph_turn
+    from .token_budget import (SummarizationPolicy, estimate_tokens,
+                               get_tokenizer)
+    from .tool_execution import (ToolExecutionPolicy, ToolMemo,
+                                 create_tool_node, get_tool_memo, memoize_tool)
+    from .vector_index import VectorIndex
+
+_EXPORTS: dict[str, tuple[str, ...]] = {
+    "background_summarizer": ("BackgroundSummarizer", "SummaryResult"),
+    "batch_inference": ("BatchRequest", "BatchStats", "read_requests", "run_batch"),
+    "chat_kargs": ("get_chat_kargs",),
+    "chat_model": ("OAuth2BearerAuth", "create_chat_model"),
+    "checkpoint_retention": (
+        "CheckpointRetention", "RetentionPolicy", "StorageStats",
+        "ThreadStorageStats"),
+    "checkpoint_serde": ("CompactSerializer",),
+    "checkpointer": (
+        "BatchedAsyncSqliteSaver", "CheckpointerConfig",
+        "CompactAsyncSqliteSaver", "open_checkpointer"),
+    "graph_rendering": (
+        "drain_background_renders", "render_graph", "render_graphs",
+        "schedule_render_graph"),
+    "instrumentation": (
+        "GraphInstrumentation", "instrument_checkpointer", "instrumented_config"),
+    "long_term_memory": (
+        "EmbeddingsEmbedder", "HashingEmbedder", "LongTermMemory",
+        "LongTermMemoryConfig", "MemoryHit", "create_long_term_memory"),
+    "prompt_assembly": ("assemble_prompt",),
+    "response_cache": (
+        "LLMResponseCache", "ResponseCacheConfig", "get_response_cache"),
+    "streaming": ("StreamResult", "stream_graph_turn"),
+    "token_budget": ("SummarizationPolicy", "estimate_tokens", "get_tokenizer"),
+    "tool_execution": (
+        "ToolExecutionPolicy", "ToolMemo", "create_tool_node", "get_tool_memo",
+        "memoize_tool"),
+    "vector_index": ("VectorIndex",),
+}
+_MODULE_OF = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULE_OF)
+
+
+def __getattr__(name: str) -> Any:
+    module = _MODULE_OF.get(name)
+    if module is None:
+        msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(msg)
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,82 @@
+"""Sumarização de conversa fora do caminho crítico.
+
+No modo em segundo plano o chatbot responde imediatamente com o resumo
+existente e as mensagens recentes, enquanto a sumarização das mensagens
+antigas roda como uma ``Task`` por ``thread_id``. O resultado (novo resumo
+e ids das mensagens resumidas) é aplicado ao estado no turno seguinte.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, kw_only=True)
+class SummaryResult:  # pylint: disable=too-few-public-methods
+    """
+    Resultado de uma sumarização em segundo plano.
+
+    Atributos:
+        summary (str): Resumo estendido com as mensagens resumidas.
+        removed_ids (tuple[str, ...]): Ids das mensagens cobertas pelo resumo,
+            a serem removidas do estado.
+        watermark (str | None): Id da última mensagem incorporada ao resumo;
+            ``None`` se nenhuma mensagem nova foi resumida.
+    """
+    summary: str
+    removed_ids: tuple[str, ...]
+    watermark: str | None = None
+
+
+class BackgroundSummarizer:
+    """Mantém no máximo uma sumarização em andamento por ``thread_id``."""
+
+    def __init__(self) -> None:
+        self._tasks: dict[str, asyncio.Task[SummaryResult]] = {}
+
+    def pending(self, thread_id: str) -> bool:
+        """Indica se há uma sumarização (concluída ou não) para a thread."""
+        return thread_id in self._tasks
+
+    def submit(
+        self,
+        thread_id: str,
+        summarize: Callable[[], Awaitable[SummaryResult]],
+    ) -> bool:
+        """Inicia a sumarização da thread, se nenhuma estiver pendente."""
+        if thread_id in self._tasks:
+            return False
+
+        self._tasks[thread_id] = asyncio.create_task(summarize())
+        return True
+
+    def pop_result(self, thread_id: str) -> SummaryResult | None:
+        """Retorna e descarta o resultado da thread, se já estiver pronto.
+
+        Falhas são registradas em log e descartadas, permitindo uma nova
+        tentativa em um turno seguinte.
+        """
+        task = self._tasks.get(thread_id)
+        if task is None or not task.done():
+            return None
+
+        del self._tasks[thread_id]
+        if task.cancelled():
+            return None
+        if task.exception() is not None:
+            logger.warning(
+                "Falha na sumarização em segundo plano da thread %s: %s",
+                thread_id, task.exception(),
+            )
+            return None
+        return task.result()
+
+    async def drain(self, timeout: float | None = None) -> None:
+        """Aguarda (até ``timeout``) as sumarizações em andamento."""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks.values()), timeout=timeout)
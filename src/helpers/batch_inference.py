@@ -0,0 +1,257 @@
+"""Inferência em lote de prompts lidos de um JSONL.
+
+Cada linha da entrada é uma requisição independente, com um ``id`` único
+e um ``prompt`` (texto) ou ``messages`` (lista no formato aceito por
+``convert_to_messages``)::
+
+    {"id": "q-1", "prompt": "Que dia é hoje?"}
+    {"id": "q-2", "messages": [{"role": "system", "content": "..."},
+                               {"role": "user", "content": "..."}]}
+
+A entrada é lida sob demanda por uma fila limitada, consumida por
+``concurrency`` workers que compartilham o mesmo modelo (e, portanto, o
+pool de conexões, o limitador de taxa e os retries do processo). Cada
+resultado é acrescentado à saída assim que termina, fora de ordem e
+identificado pelo ``id``::
+
+    {"id": "q-2", "content": "...", "input_tokens": 31, "output_tokens": 12,
+     "latency": 0.412}
+    {"id": "q-1", "error": "HTTPStatusError: ..."}
+
+A execução é retomável: ao reiniciar com a mesma saída, os ids já
+concluídos com sucesso são pulados e os que falharam são repetidos. Uma
+linha truncada por uma queda no meio da escrita é descartada.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, TextIO
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (AnyMessage, HumanMessage,
+                                     convert_to_messages)
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_PROGRESS_INTERVAL = 10.0
+
+
+@dataclass(frozen=True, kw_only=True)
+class BatchRequest:  # pylint: disable=too-few-public-methods
+    """
+    Requisição do lote.
+
+    Atributos:
+        id (str): Identificador único, repetido no resultado.
+        messages (tuple[AnyMessage, ...]): Conversa enviada ao modelo.
+    """
+    id: str
+    messages: tuple[AnyMessage, ...]
+
+
+@dataclass(kw_only=True)
+class BatchStats:
+    """Contadores do lote; as taxas consideram apenas esta execução."""
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    finished: float | None = None
+
+    @property
+    def completed(self) -> int:
+        """Requisições concluídas (com sucesso ou não) nesta execução."""
+        return self.succeeded + self.failed
+
+    @property
+    def seconds(self) -> float:
+        """Duração da execução até o fim (ou até agora)."""
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def requests_per_sec(self) -> float:
+        """Requisições concluídas por segundo."""
+        seconds = self.seconds
+        return self.completed / seconds if seconds else 0.0
+
+    @property
+    def tokens_per_sec(self) -> float:
+        """Tokens gerados (``output_tokens``) por segundo."""
+        seconds = self.seconds
+        return self.output_tokens / seconds if seconds else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Resumo serializável em JSON."""
+        seconds = self.seconds
+        return {
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "seconds": round(seconds, 3),
+            "requests_per_sec": round(self.requests_per_sec, 2),
+            "tokens_per_sec": round(self.tokens_per_sec, 1),
+            "total_tokens_per_sec": round(
+                (self.input_tokens + self.output_tokens) / seconds, 1)
+            if seconds else 0.0,
+        }
+
+
+def read_requests(path: Path) -> Iterator[BatchRequest]:
+    """Lê as requisições do arquivo JSONL sob demanda."""
+    with path.open(encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            request_id = data.get("id")
+            if request_id is None or request_id == "":
+                msg = f"{path}:{number}: 'id' is required."
+                raise ValueError(msg)
+            if "messages" in data:
+                messages = tuple(convert_to_messages(data["messages"]))
+            elif isinstance(data.get("prompt"), str):
+                messages = (HumanMessage(content=data["prompt"]),)
+            else:
+                msg = f"{path}:{number}: expected 'prompt' (string) or 'messages'."
+                raise ValueError(msg)
+            yield BatchRequest(id=str(request_id), messages=messages)
+
+
+def completed_ids(path: Path) -> set[str]:
+    """Ids concluídos com sucesso em uma saída anterior.
+
+    Uma última linha sem ``\\n`` (escrita interrompida) é removida do
+    arquivo, para que os próximos resultados não sejam emendados nela.
+    """
+    if not path.exists():
+        return set()
+    data = path.read_bytes()
+    complete = data.rfind(b"\n") + 1
+    if complete < len(data):
+        with path.open("r+b") as file:
+            file.truncate(complete)
+
+    done: set[str] = set()
+    for line in data[:complete].splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if "error" not in record:
+            done.add(str(record["id"]))
+    return done
+
+
+async def _infer(chat: BaseChatModel, request: BatchRequest) -> dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        message = await chat.ainvoke(list(request.messages))
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        return {"id": request.id, "error": f"{type(exc).__name__}: {exc}"}
+
+    usage = getattr(message, "usage_metadata", None) or {}
+    return {
+        "id": request.id,
+        "content": message.content,
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "latency": round(time.perf_counter() - started, 4),
+    }
+
+
+def _record(output: TextIO, result: dict[str, Any], stats: BatchStats) -> None:
+    # Uma linha por resultado, com flush: após uma queda só a linha em
+    # escrita pode se perder.
+    output.write(json.dumps(result, ensure_ascii=False) + "\n")
+    output.flush()
+    if "error" in result:
+        stats.failed += 1
+        return
+    stats.succeeded += 1
+    stats.input_tokens += result["input_tokens"]
+    stats.output_tokens += result["output_tokens"]
+
+
+async def run_batch(
+    chat: BaseChatModel,
+    requests: Iterable[BatchRequest],
+    output_path: Path,
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    progress: Callable[[BatchStats], None] | None = None,
+    progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+) -> BatchStats:
+    """Executa as requisições com no máximo ``concurrency`` em andamento.
+
+    Args:
+        chat: Modelo compartilhado por todos os workers.
+        requests: Requisições, consumidas sob demanda.
+        output_path: JSONL de resultados; os ids concluídos com sucesso
+            nele são pulados (retomada).
+        concurrency: Número de workers.
+        progress: Chamado a cada ``progress_interval`` segundos e no fim.
+        progress_interval: Intervalo, em segundos, entre os relatórios.
+
+    Returns:
+        BatchStats: Contadores e taxas da execução.
+    """
+    if concurrency < 1:
+        msg = "concurrency must be at least 1."
+        raise ValueError(msg)
+
+    done = completed_ids(output_path)
+    stats = BatchStats()
+    queue: asyncio.Queue[BatchRequest | None] = asyncio.Queue(
+        maxsize=concurrency * 2)
+
+    async def feed() -> None:
+        seen: set[str] = set()
+        for request in requests:
+            if request.id in seen:
+                msg = f"Duplicate request id '{request.id}'."
+                raise ValueError(msg)
+            seen.add(request.id)
+            if request.id in done:
+                stats.skipped += 1
+                continue
+            # ``put`` bloqueia com a fila cheia: a entrada só é lida no
+            # ritmo em que os workers consomem.
+            await queue.put(request)
+
+    async def worker(output: TextIO) -> None:
+        while (request := await queue.get()) is not None:
+            _record(output, await _infer(chat, request), stats)
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(progress_interval)
+            progress(stats)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("a", encoding="utf-8") as output:
+        workers = [asyncio.create_task(worker(output)) for _ in range(concurrency)]
+        reporter = asyncio.create_task(report()) if progress else None
+        try:
+            await feed()
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in (*workers, reporter):
+                if task is not None:
+                    task.cancel()
+            await asyncio.gather(
+                *workers, *([reporter] if reporter else []),
+                return_exceptions=True)
+
+    stats.finished = time.perf_counter()
+    if progress:
+        progress(stats)
+    return stats
@@ -1,26 +1,40 @@
 """Helpers para montar kwargs do modelo de chat."""
 
-from src.envvar import get_env
+from typing import Any
+
+from src.envvar import get_settings
 from src.oauth import OAuth2ClientConfig, get_oauth2_token
 
 
+def get_base_chat_kargs() -> dict[str, Any]:
+    """Produz os parâmetros de ``ChatOpenAI`` que não dependem do token.
+
+    Inclui ``base_url`` obrigatório a partir da variável ``VLLM_BASE_URL``
+    (a primeira réplica, quando há várias; ver ``EndpointRouter``).
+    """
+    vllm = get_settings().vllm.require()
+
+    return {
+        "model": vllm.model_id,
+        "temperature": 0,
+        "base_url": vllm.base_url,
+        "api_key": "EMPTY",
+    }
+
+
 async def get_chat_kargs():
     """Produz um dicionário com os parâmetros necessários para ``ChatOpenAI``.
 
-    Inclui ``base_url`` obrigatório a partir da variável ``VLLM_BASE_URL``.
+    O token é fixado em ``default_headers`` e expira após ``expires_in``;
+    para sessões longas prefira ``create_chat_model``.
     """
     config = OAuth2ClientConfig.from_env()
 
     access_token = await get_oauth2_token(config)
-    vllm_model_id = get_env("VLLM_MODEL_ID")
-    base_url = get_env("VLLM_BASE_URL").rstrip("/")
 
     chat_kwargs = {
-        "model": vllm_model_id,
-        "temperature": 0,
+        **get_base_chat_kargs(),
         "default_headers": {"Authorization": f"Bearer {access_token}"},
-        "base_url": base_url,
-        "api_key": "EMPTY",
     }
 
     return chat_kwargs
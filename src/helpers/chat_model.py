@@ -0,0 +1,121 @@
+"""Fábrica de ``ChatOpenAI`` reutilizável com token OAuth2 por requisição.
+
+Em vez de fixar o token em ``default_headers`` (que expira após
+``expires_in``), o cliente HTTP do modelo usa um hook de autenticação que
+injeta o token atual do cache a cada requisição e, ao receber 401, força
+uma renovação e repete a requisição uma única vez. Assim o mesmo
+``ChatOpenAI`` (e o grafo compilado que o utiliza) pode viver por horas.
+"""
+
+from __future__ import annotations
+
+from typing import Any, AsyncGenerator, Generator
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from src.httpclient import (RetryPolicy, get_http_client_pool,
+                            get_llm_rate_limiter)
+from src.oauth import OAuth2ClientConfig, OAuth2TokenManager, get_token_manager
+
+from .chat_kargs import get_base_chat_kargs
+from .response_cache import get_response_cache
+
+
+class OAuth2BearerAuth(httpx.Auth):
+    """Hook ``httpx`` que aplica o token OAuth2 do cache em cada requisição.
+
+    Args:
+        config: Configuração OAuth2 cujo token será usado.
+        manager: Gerenciador de tokens; usa o padrão do processo se omitido.
+    """
+
+    requires_request_body = True
+
+    def __init__(
+        self,
+        config: OAuth2ClientConfig,
+        manager: OAuth2TokenManager | None = None,
+    ) -> None:
+        self._config = config
+        self._manager = manager or get_token_manager()
+
+    async def async_auth_flow(
+        self, request: httpx.Request
+    ) -> AsyncGenerator[httpx.Request, httpx.Response]:
+        token = await self._manager.get_token(self._config)
+        access_token = token["access_token"]
+        request.headers["Authorization"] = f"Bearer {access_token}"
+
+        response = yield request
+        if response.status_code != httpx.codes.UNAUTHORIZED:
+            return
+
+        # Outra corrotina pode já ter renovado o token; só descarta o token
+        # recusado (também no cache compartilhado) e força uma nova
+        # renovação se o cache ainda o contém.
+        current = self._manager.peek(self._config)
+        if current is None or current["access_token"] == access_token:
+            await self._manager.ainvalidate(
+                self._config, access_token=access_token)
+            current = await self._manager.refresh(self._config)
+
+        request.headers["Authorization"] = f"Bearer {current['access_token']}"
+        yield request
+
+    def sync_auth_flow(
+        self, request: httpx.Request
+    ) -> Generator[httpx.Request, httpx.Response, None]:
+        token = self._manager.peek(self._config)
+        if token is None:
+            msg = "OAuth2 token not cached; use the async API of the chat model."
+            raise RuntimeError(msg)
+
+        request.headers["Authorization"] = f"Bearer {token['access_token']}"
+        yield request
+
+
+def create_chat_model(
+    config: OAuth2ClientConfig | None = None,
+    *,
+    manager: OAuth2TokenManager | None = None,
+    **overrides: Any,
+) -> ChatOpenAI:
+    """Cria um ``ChatOpenAI`` cujo token OAuth2 é renovado automaticamente.
+
+    O cliente HTTP assíncrono do modelo compartilha o pool de conexões do
+    processo e aplica ``OAuth2BearerAuth``. Nenhuma requisição é feita
+    aqui; o token é obtido na primeira chamada ao modelo. Com ``LLM_CACHE``
+    habilitado, o modelo usa o cache de respostas do processo.
+
+    Todos os modelos criados aqui compartilham o limitador de taxa do
+    processo (``LLM_RATE_LIMIT_RPM``/``LLM_RATE_LIMIT_TPM``) e repetem
+    respostas 429/5xx com backoff dentro do prazo de ``RetryPolicy``. Com
+    várias réplicas em ``VLLM_BASE_URL``, compartilham também o roteador
+    do pool (``EndpointRouter``), que distribui as requisições entre elas.
+
+    Args:
+        config: Configuração OAuth2. Lida do ambiente se omitida.
+        manager: Gerenciador de tokens; usa o padrão do processo se omitido.
+        **overrides: Parâmetros adicionais repassados ao ``ChatOpenAI``.
+    """
+    config = config or OAuth2ClientConfig.from_env()
+    auth = OAuth2BearerAuth(config, manager)
+
+    policy = RetryPolicy.from_env()
+    pool = get_http_client_pool()
+    chat_kwargs: dict[str, Any] = {
+        **get_base_chat_kargs(),
+        "http_async_client": pool.client(
+            auth=auth, limiter=get_llm_rate_limiter(), router=pool.vllm_router),
+        # Os retries ficam no transporte (com backoff, prazo e AIMD); o
+        # cliente da OpenAI não deve repetir por conta própria.
+        "timeout": policy.timeout(),
+        "max_retries": 0,
+    }
+    cache = get_response_cache()
+    if cache is not None:
+        chat_kwargs["cache"] = cache
+    chat_kwargs.update(overrides)
+
+    return ChatOpenAI(**chat_kwargs)
@@ -0,0 +1,424 @@
+"""Retenção, compactação e estatísticas de checkpoints.
+
+Cada super-step do grafo grava um checkpoint completo por ``thread_id``;
+a sumarização reduz o estado vivo, mas não o histórico. Este módulo
+mantém apenas os últimos N checkpoints de cada thread (ou os mais novos
+que um TTL), remove os pending writes órfãos e, no SQLite, devolve as
+páginas livres ao sistema de arquivos com ``incremental_vacuum`` em
+segundo plano, para que o armazenamento e a latência de leitura fiquem
+estáveis ao longo do tempo.
+
+O último checkpoint de cada thread nunca é removido, pois contém o
+estado atual da conversa. No SQLite, só bancos criados por
+``open_checkpointer`` são alterados (``is_owned_database``); em um banco
+de terceiros (como ``db/example.db``) a retenção não faz nada.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from src.envvar import configured, finite, get_settings
+
+from .checkpointer import CompactAsyncSqliteSaver, is_owned_database
+
+logger = logging.getLogger(__name__)
+
+# Intervalos de 100 ns entre a época do UUID (1582-10-15) e a época Unix.
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+DEFAULT_KEEP_LAST = 20
+DEFAULT_RETENTION_INTERVAL = 300.0
+DEFAULT_VACUUM_PAGES = 1000
+
+
+def checkpoint_id_floor(timestamp: float) -> str:
+    """Retorna o menor id de checkpoint (UUIDv6) gerado em ``timestamp``.
+
+    Os ids de checkpoint do LangGraph são UUIDv6, cuja representação
+    textual ordena pelo instante de criação; comparar ids com este valor
+    equivale a comparar datas, sem desserializar o checkpoint.
+    """
+    ticks = int(timestamp * 10_000_000) + _UUID_EPOCH_OFFSET
+    time_high = (ticks >> 28) & 0xFFFFFFFF
+    time_mid = (ticks >> 12) & 0xFFFF
+    time_low = ticks & 0x0FFF
+    return f"{time_high:08x}-{time_mid:04x}-6{time_low:03x}-0000-000000000000"
+
+
+@dataclass(frozen=True, kw_only=True)
+class RetentionPolicy:  # pylint: disable=too-few-public-methods
+    """
+    Política de retenção de checkpoints.
+
+    Um checkpoint é mantido se estiver entre os ``keep_last`` mais recentes
+    da thread ou se for mais novo que ``ttl``.
+
+    Atributos:
+        keep_last (int | None): Quantidade de checkpoints mantidos por thread.
+        ttl (float | None): Idade máxima, em segundos, dos checkpoints além
+            dos ``keep_last`` mais recentes.
+        interval (float): Intervalo, em segundos, entre execuções em
+            segundo plano.
+        vacuum_pages (int): Páginas liberadas por ``incremental_vacuum``
+            a cada execução.
+    """
+    keep_last: int | None = DEFAULT_KEEP_LAST
+    ttl: float | None = None
+    interval: float = DEFAULT_RETENTION_INTERVAL
+    vacuum_pages: int = DEFAULT_VACUUM_PAGES
+
+    def __post_init__(self) -> None:
+        if self.keep_last is not None and self.keep_last < 1:
+            msg = "keep_last must be at least 1."
+            raise ValueError(msg)
+
+    @staticmethod
+    def from_env() -> "RetentionPolicy":
+        """Cria uma instância a partir das configurações validadas do processo."""
+        retention = get_settings().retention
+        # ``off`` chega como ``math.inf``: nenhum limite por quantidade.
+        keep_last = (
+            DEFAULT_KEEP_LAST if retention.keep_last is None
+            else finite(retention.keep_last))
+        return RetentionPolicy(
+            keep_last=None if keep_last is None else int(keep_last),
+            ttl=finite(retention.ttl),
+            **configured(interval=retention.interval),
+        )
+
+
+@dataclass(frozen=True, kw_only=True)
+class ThreadStorageStats:  # pylint: disable=too-few-public-methods
+    """
+    Uso de armazenamento de uma thread.
+
+    Atributos:
+        thread_id (str): Identificador da thread.
+        checkpoints (int): Quantidade de checkpoints armazenados.
+        writes (int): Quantidade de pending writes armazenados.
+        bytes (int): Bytes serializados de checkpoints, writes e mensagens
+            deduplicadas.
+    """
+    thread_id: str
+    checkpoints: int
+    writes: int
+    bytes: int
+
+
+@dataclass(frozen=True, kw_only=True)
+class StorageStats:  # pylint: disable=too-few-public-methods
+    """
+    Uso de armazenamento do checkpointer.
+
+    Atributos:
+        threads (list[ThreadStorageStats]): Uso por thread.
+        file_bytes (int | None): Tamanho do banco SQLite (páginas * tamanho).
+        free_bytes (int | None): Bytes em páginas livres, recuperáveis com
+            ``incremental_vacuum``.
+    """
+    threads: list[ThreadStorageStats]
+    file_bytes: int | None = None
+    free_bytes: int | None = None
+
+
+class CheckpointRetention:
+    """Aplica a política de retenção a um checkpointer.
+
+    Suporta ``AsyncSqliteSaver`` (e derivados) e ``InMemorySaver``. Pode
+    ser usado sob demanda (``prune``/``compact``/``stats``) ou como
+    tarefa periódica em segundo plano::
+
+        async with CheckpointRetention(saver, policy):
+            ...
+
+    Args:
+        saver: Checkpointer a ser mantido.
+        policy: Política de retenção; lida do ambiente se omitida.
+        owned_only: Só altera bancos SQLite criados por
+            ``open_checkpointer``; ``False`` aplica a retenção a qualquer
+            banco.
+    """
+
+    def __init__(
+        self,
+        saver: BaseCheckpointSaver,
+        policy: RetentionPolicy | None = None,
+        *,
+        owned_only: bool = True,
+    ) -> None:
+        if not isinstance(saver, (AsyncSqliteSaver, InMemorySaver)):
+            msg = f"Retention is not supported for {type(saver).__name__}."
+            raise TypeError(msg)
+
+        self._saver = saver
+        self._policy = policy or RetentionPolicy.from_env()
+        self._owned_only = owned_only
+        self._writable: bool | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def policy(self) -> RetentionPolicy:
+        """Política de retenção em uso."""
+        return self._policy
+
+    def _cutoff_id(self) -> str | None:
+        if self._policy.ttl is None:
+            return None
+        return checkpoint_id_floor(time.time() - self._policy.ttl)
+
+    async def _may_modify(self, saver: AsyncSqliteSaver) -> bool:
+        """Verifica (uma vez) se o banco pode ser alterado pela retenção."""
+        if self._writable is None:
+            await saver.setup()
+            async with saver.lock:
+                self._writable = (
+                    not self._owned_only or await is_owned_database(saver.conn))
+            if not self._writable:
+                logger.warning(
+                    "Retenção desabilitada: o banco de checkpoints não foi "
+                    "criado por open_checkpointer.")
+        return self._writable
+
+    async def prune(self, thread_id: str | None = None) -> int:
+        """Remove checkpoints fora da política e retorna quantos removeu."""
+        if isinstance(self._saver, AsyncSqliteSaver):
+            if not await self._may_modify(self._saver):
+                return 0
+            return await self._prune_sqlite(self._saver, thread_id)
+        return self._prune_memory(self._saver, thread_id)
+
+    async def _prune_sqlite(
+        self, saver: AsyncSqliteSaver, thread_id: str | None
+    ) -> int:
+        keep_last = self._policy.keep_last
+        cutoff = self._cutoff_id()
+        # Mantém sempre o checkpoint mais recente (rn = 1).
+        conditions = ["rn > 1"]
+        params: list[Any] = []
+        if thread_id is not None:
+            params.append(str(thread_id))
+        if keep_last is not None:
+            conditions.append("rn > ?")
+            params.append(keep_last)
+        if cutoff is not None:
+            conditions.append("checkpoint_id < ?")
+            params.append(cutoff)
+        if keep_last is None and cutoff is None:
+            return 0
+
+        where_thread = "WHERE thread_id = ?" if thread_id is not None else ""
+        query = (
+            "DELETE FROM checkpoints WHERE rowid IN ("
+            " SELECT rowid FROM ("
+            "  SELECT rowid, checkpoint_id, ROW_NUMBER() OVER ("
+            "   PARTITION BY thread_id, checkpoint_ns"
+            "   ORDER BY checkpoint_id DESC) AS rn"
+            f"  FROM checkpoints {where_thread})"
+            f" WHERE {' AND '.join(conditions)})"
+        )
+
+        await saver.setup()
+        async with saver.lock, saver.conn.cursor() as cur:
+            await cur.execute(query, params)
+            removed = cur.rowcount
+            await cur.execute(
+                "DELETE FROM writes WHERE NOT EXISTS ("
+                " SELECT 1 FROM checkpoints c"
+                " WHERE c.thread_id = writes.thread_id"
+                " AND c.checkpoint_ns = writes.checkpoint_ns"
+                " AND c.checkpoint_id = writes.checkpoint_id)"
+            )
+            await saver.conn.commit()
+        if removed > 0 and isinstance(saver, CompactAsyncSqliteSaver):
+            await saver.adelete_unreferenced_messages(thread_id)
+        return max(removed, 0)
+
+    def _prune_memory(self, saver: InMemorySaver, thread_id: str | None) -> int:
+        keep_last = self._policy.keep_last
+        cutoff = self._cutoff_id()
+        if keep_last is None and cutoff is None:
+            return 0
+
+        removed = 0
+        thread_ids = [thread_id] if thread_id is not None else list(saver.storage)
+        for tid in thread_ids:
+            for ns, checkpoints in saver.storage.get(tid, {}).items():
+                ordered = sorted(checkpoints, reverse=True)
+                expired = [
+                    checkpoint_id
+                    for rank, checkpoint_id in enumerate(ordered, start=1)
+                    if rank > 1
+                    and (keep_last is None or rank > keep_last)
+                    and (cutoff is None or checkpoint_id < cutoff)
+                ]
+                if not expired:
+                    continue
+
+                for checkpoint_id in expired:
+                    del checkpoints[checkpoint_id]
+                    saver.writes.pop((tid, ns, checkpoint_id), None)
+                removed += len(expired)
+                self._prune_memory_blobs(saver, tid, ns)
+        return removed
+
+    @staticmethod
+    def _prune_memory_blobs(saver: InMemorySaver, thread_id: str, ns: str) -> None:
+        """Remove valores de canais não referenciados pelos checkpoints restantes."""
+        live: set[tuple[str, Any]] = set()
+        for serialized, _, _ in saver.storage[thread_id][ns].values():
+            checkpoint = saver.serde.loads_typed(serialized)
+            live.update(checkpoint["channel_versions"].items())
+
+        for key in [
+            k for k in saver.blobs
+            if k[0] == thread_id and k[1] == ns and (k[2], k[3]) not in live
+        ]:
+            del saver.blobs[key]
+
+    async def compact(self) -> None:
+        """Libera páginas livres do SQLite de forma incremental.
+
+        Os bancos criados por ``open_checkpointer`` já nascem com
+        ``auto_vacuum=INCREMENTAL``; em outro banco (só com
+        ``owned_only=False``) a primeira execução faz um ``VACUUM``
+        completo (único) para habilitar o modo.
+        """
+        saver = self._saver
+        if not isinstance(saver, AsyncSqliteSaver) or not await self._may_modify(saver):
+            return
+
+        await saver.setup()
+        async with saver.lock:
+            async with saver.conn.execute("PRAGMA auto_vacuum") as cur:
+                row = await cur.fetchone()
+            if row is not None and row[0] != 2:
+                logger.info("Habilitando auto_vacuum=INCREMENTAL (VACUUM completo).")
+                await saver.conn.commit()
+                await saver.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                await saver.conn.execute("VACUUM")
+            # ``execute`` avança o pragma um único passo (uma página);
+            # ``executescript`` o executa até o fim.
+            await saver.conn.executescript(
+                f"PRAGMA incremental_vacuum({int(self._policy.vacuum_pages)});")
+            await saver.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    async def stats(self) -> StorageStats:
+        """Retorna quantidade de checkpoints, writes e bytes por thread."""
+        if isinstance(self._saver, AsyncSqliteSaver):
+            return await self._sqlite_stats(self._saver)
+        return self._memory_stats(self._saver)
+
+    @staticmethod
+    async def _sqlite_stats(saver: AsyncSqliteSaver) -> StorageStats:
+        await saver.setup()
+        per_thread: dict[str, list[int]] = {}
+        async with saver.lock:
+            async with saver.conn.execute(
+                "SELECT thread_id, COUNT(*),"
+                " COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0)"
+                " FROM checkpoints GROUP BY thread_id"
+            ) as cur:
+                async for tid, count, size in cur:
+                    per_thread[str(tid)] = [count, 0, size]
+            async with saver.conn.execute(
+                "SELECT thread_id, COUNT(*), COALESCE(SUM(LENGTH(value)), 0)"
+                " FROM writes GROUP BY thread_id"
+            ) as cur:
+                async for tid, count, size in cur:
+                    entry = per_thread.setdefault(str(tid), [0, 0, 0])
+                    entry[1] = count
+                    entry[2] += size
+            async with saver.conn.execute(
+                "SELECT 1 FROM sqlite_master"
+                " WHERE type = 'table' AND name = 'checkpoint_messages'"
+            ) as cur:
+                has_messages = await cur.fetchone() is not None
+            if has_messages:
+                async with saver.conn.execute(
+                    "SELECT thread_id, COALESCE(SUM(LENGTH(value)), 0)"
+                    " FROM checkpoint_messages GROUP BY thread_id"
+                ) as cur:
+                    async for tid, size in cur:
+                        per_thread.setdefault(str(tid), [0, 0, 0])[2] += size
+            pragmas = {}
+            for name in ("page_count", "page_size", "freelist_count"):
+                async with saver.conn.execute(f"PRAGMA {name}") as cur:
+                    row = await cur.fetchone()
+                    pragmas[name] = row[0] if row else 0
+
+        return StorageStats(
+            threads=[
+                ThreadStorageStats(
+                    thread_id=tid, checkpoints=c, writes=w, bytes=b)
+                for tid, (c, w, b) in sorted(per_thread.items())
+            ],
+            file_bytes=pragmas["page_count"] * pragmas["page_size"],
+            free_bytes=pragmas["freelist_count"] * pragmas["page_size"],
+        )
+
+    @staticmethod
+    def _memory_stats(saver: InMemorySaver) -> StorageStats:
+        per_thread: dict[str, list[int]] = {}
+        for tid, namespaces in saver.storage.items():
+            entry = per_thread.setdefault(str(tid), [0, 0, 0])
+            for checkpoints in namespaces.values():
+                for (_, checkpoint), (_, metadata), _ in checkpoints.values():
+                    entry[0] += 1
+                    entry[2] += len(checkpoint) + len(metadata)
+        for (tid, *_), writes in saver.writes.items():
+            entry = per_thread.setdefault(str(tid), [0, 0, 0])
+            entry[1] += len(writes)
+            entry[2] += sum(len(w[2][1]) for w in writes.values())
+        for (tid, *_), (_, blob) in saver.blobs.items():
+            per_thread.setdefault(str(tid), [0, 0, 0])[2] += len(blob)
+
+        return StorageStats(threads=[
+            ThreadStorageStats(thread_id=tid, checkpoints=c, writes=w, bytes=b)
+            for tid, (c, w, b) in sorted(per_thread.items())
+        ])
+
+    async def run_once(self) -> int:
+        """Executa uma rodada de retenção e compactação."""
+        removed = await self.prune()
+        await self.compact()
+        return removed
+
+    async def _run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self._policy.interval)
+            try:
+                removed = await self.run_once()
+                logger.debug("Retenção removeu %d checkpoints.", removed)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Falha na retenção de checkpoints.")
+
+    def start(self) -> None:
+        """Inicia a retenção periódica em segundo plano."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """Interrompe a retenção periódica."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def __aenter__(self) -> "CheckpointRetention":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.stop()
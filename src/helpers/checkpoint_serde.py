@@ -0,0 +1,294 @@
+"""Serialização compacta dos checkpoints com muitas mensagens.
+
+Cada checkpoint grava o estado inteiro da thread, inclusive a lista
+``messages`` completa; com o serializador padrão (``JsonPlusSerializer``)
+cada mensagem leva o caminho da classe e todos os campos, mesmo os vazios,
+e é recodificada a cada super-step. ``CompactSerializer``:
+
+- codifica cada mensagem como ``[tipo, campos diferentes do padrão]``
+  (em msgpack, como o serializador padrão) em vez do modelo pydantic
+  completo;
+- comprime com zlib as mensagens (``ToolMessage`` volumosas) e o restante
+  do estado a partir de ``compress_threshold`` bytes, quando a compressão
+  de fato reduz o tamanho;
+- guarda a codificação de cada mensagem em um cache LRU: entre
+  checkpoints consecutivos só as mensagens novas são codificadas e
+  comprimidas;
+- em ``dumps_typed_deduplicated``, substitui cada mensagem por uma
+  referência ao hash do seu conteúdo e devolve as mensagens à parte, para
+  que o checkpointer grave cada mensagem uma única vez por thread
+  (``CompactAsyncSqliteSaver``): entre checkpoints consecutivos só as
+  mensagens novas ocupam espaço.
+
+O cache supõe, como o reducer ``add_messages``, que mensagens já
+gravadas não são alteradas in-place (a atribuição do ``id`` invalida a
+entrada). Valores gravados pelo serializador padrão continuam legíveis.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Mapping
+
+from langchain_core.messages import (AIMessage, AIMessageChunk, BaseMessage,
+                                     ChatMessage, FunctionMessage,
+                                     HumanMessage, RemoveMessage,
+                                     SystemMessage, ToolMessage)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+DEFAULT_COMPRESS_THRESHOLD = 1024
+DEFAULT_COMPRESS_LEVEL = 1
+DEFAULT_CACHE_ENTRIES = 4096
+
+_COMPACT_PREFIX = "compact:"
+_ZLIB_SUFFIX = "+zlib"
+# Marcadores (dicts de uma chave) que substituem as mensagens na estrutura.
+_FIELDS_KEY = "__msg__"
+_ENCODED_KEY = "__msgb__"
+_REF_KEY = "__msgref__"
+
+_MESSAGE_CLASSES: dict[str, type[BaseMessage]] = {
+    cls.model_fields["type"].default: cls
+    for cls in (AIMessage, AIMessageChunk, ChatMessage, FunctionMessage,
+                HumanMessage, RemoveMessage, SystemMessage, ToolMessage)
+}
+_MESSAGE_KINDS = {cls: kind for kind, cls in _MESSAGE_CLASSES.items()}
+# Campo -> (padrão, fábrica) de cada classe; ``model_construct`` resolveria
+# os padrões dos campos omitidos via ``inspect`` a cada mensagem.
+_MESSAGE_DEFAULTS: dict[type[BaseMessage], dict[str, tuple[Any, Any]]] = {
+    cls: {
+        name: (field.default, field.default_factory)
+        for name, field in cls.model_fields.items() if not field.is_required()
+    }
+    for cls in _MESSAGE_CLASSES.values()
+}
+# Bytes do marcador ``{"__msgb__": [tipo, bin]}`` além do tipo e dos dados.
+_MARKER_OVERHEAD = 16
+
+
+@dataclass(frozen=True)
+class MessageRef:
+    """Mensagem deduplicada ainda não resolvida (ver ``resolve_refs``)."""
+    key: str
+
+
+@dataclass(frozen=True)
+class _EncodedMessage:
+    message: BaseMessage
+    message_id: str | None
+    key: str
+    type: str
+    data: bytes
+
+
+class CompactSerializer(SerializerProtocol):
+    """Serializador de checkpoints compacto e com compressão.
+
+    Args:
+        compress_threshold: Tamanho, em bytes, a partir do qual mensagens
+            e o restante do estado são comprimidos; ``None`` desabilita.
+        compress_level: Nível do zlib (1 é o mais rápido).
+        cache_entries: Mensagens codificadas mantidas em cache.
+        inner: Serializador dos demais valores; padrão ``JsonPlusSerializer``.
+        compact_writes: ``False`` grava no formato do serializador interno,
+            mantendo a leitura dos valores compactos já gravados.
+    """
+
+    def __init__(
+        self,
+        *,
+        compress_threshold: int | None = DEFAULT_COMPRESS_THRESHOLD,
+        compress_level: int = DEFAULT_COMPRESS_LEVEL,
+        cache_entries: int = DEFAULT_CACHE_ENTRIES,
+        inner: SerializerProtocol | None = None,
+        compact_writes: bool = True,
+    ) -> None:
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.cache_entries = cache_entries
+        self.inner = inner or JsonPlusSerializer()
+        self.compact_writes = compact_writes
+        self._cache: OrderedDict[int, _EncodedMessage] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        if (not self.compact_writes or obj is None
+                or isinstance(obj, (bytes, bytearray))):
+            return self.inner.dumps_typed(obj)
+        embedded = 0
+
+        def embed(message: BaseMessage) -> Any:
+            nonlocal embedded
+            encoded = self._encode(message)
+            if encoded is None:
+                return message
+            embedded += len(encoded.type) + len(encoded.data) + _MARKER_OVERHEAD
+            return {_ENCODED_KEY: [encoded.type, encoded.data]}
+
+        return self._dumps(_transform(obj, embed), embedded)
+
+    def dumps_typed_deduplicated(
+        self, obj: Any
+    ) -> tuple[tuple[str, bytes], dict[str, tuple[str, bytes]]]:
+        """Serializa ``obj`` com as mensagens substituídas por referências.
+
+        Returns:
+            O valor serializado e as mensagens referenciadas, por hash do
+            conteúdo (cada uma serializada como em ``dumps_typed``).
+        """
+        if not self.compact_writes:
+            msg = "Message deduplication requires compact_writes."
+            raise ValueError(msg)
+        messages: dict[str, tuple[str, bytes]] = {}
+
+        def reference(message: BaseMessage) -> Any:
+            encoded = self._encode(message)
+            if encoded is None:
+                return message
+            messages[encoded.key] = (encoded.type, encoded.data)
+            return {_REF_KEY: encoded.key}
+
+        return self._dumps(_transform(obj, reference), 0), messages
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        """Desserializa; mensagens deduplicadas voltam como ``MessageRef``."""
+        type_, payload = data
+        if type_.endswith(_ZLIB_SUFFIX):
+            type_ = type_[:-len(_ZLIB_SUFFIX)]
+            payload = zlib.decompress(payload)
+        if not type_.startswith(_COMPACT_PREFIX):
+            return self.inner.loads_typed((type_, payload))
+        value = self.inner.loads_typed((type_[len(_COMPACT_PREFIX):], payload))
+        return self._restore(value)
+
+    def resolve_refs(
+        self, obj: Any, messages: Mapping[str, tuple[str, bytes]]
+    ) -> Any:
+        """Substitui os ``MessageRef`` de ``obj`` pelas mensagens gravadas."""
+        decoded: dict[str, Any] = {}
+
+        def resolve(ref: MessageRef) -> Any:
+            if ref.key not in decoded:
+                if ref.key not in messages:
+                    msg = f"Checkpoint references missing message '{ref.key}'."
+                    raise KeyError(msg)
+                decoded[ref.key] = self.loads_typed(messages[ref.key])
+            return decoded[ref.key]
+
+        return _transform(obj, resolve, leaf=MessageRef)
+
+    def _encode(self, message: BaseMessage) -> _EncodedMessage | None:
+        """Codifica (e comprime) uma mensagem, reaproveitando o cache."""
+        kind = _MESSAGE_KINDS.get(type(message))
+        if kind is None:
+            # Subclasses desconhecidas seguem o caminho do serializador interno.
+            return None
+        with self._lock:
+            cached = self._cache.get(id(message))
+            if (cached is not None and cached.message is message
+                    and cached.message_id == message.id):
+                self._cache.move_to_end(id(message))
+                return cached
+
+        fields = message.model_dump(exclude_defaults=True)
+        fields.pop("type", None)
+        type_, data = self.inner.dumps_typed({_FIELDS_KEY: [kind, fields]})
+        key = hashlib.blake2b(
+            type_.encode() + b"\0" + data, digest_size=16).hexdigest()
+        type_, data = self._compress(_COMPACT_PREFIX + type_, data)
+        encoded = _EncodedMessage(
+            message=message, message_id=message.id, key=key, type=type_,
+            data=data)
+
+        with self._lock:
+            self._cache[id(message)] = encoded
+            self._cache.move_to_end(id(message))
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return encoded
+
+    def _dumps(self, obj: Any, embedded: int) -> tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(obj)
+        # As mensagens embutidas já passaram por ``_compress``.
+        if (self.compress_threshold is None
+                or len(data) - embedded < self.compress_threshold):
+            return _COMPACT_PREFIX + type_, data
+        return self._compress(_COMPACT_PREFIX + type_, data)
+
+    def _compress(self, type_: str, data: bytes) -> tuple[str, bytes]:
+        if self.compress_threshold is None or len(data) < self.compress_threshold:
+            return type_, data
+        compressed = zlib.compress(data, self.compress_level)
+        if len(compressed) >= len(data):
+            return type_, data
+        return type_ + _ZLIB_SUFFIX, compressed
+
+    def _restore(self, value: Any) -> Any:
+        if type(value) is dict:
+            if len(value) == 1:
+                if _FIELDS_KEY in value:
+                    kind, fields = value[_FIELDS_KEY]
+                    return _construct(_MESSAGE_CLASSES[kind], fields)
+                if _ENCODED_KEY in value:
+                    type_, data = value[_ENCODED_KEY]
+                    return self.loads_typed((type_, data))
+                if _REF_KEY in value:
+                    return MessageRef(value[_REF_KEY])
+            return {k: self._restore(v) for k, v in value.items()}
+        if type(value) is list:
+            return [self._restore(v) for v in value]
+        return value
+
+
+def _construct(cls: type[BaseMessage], fields: dict[str, Any]) -> BaseMessage:
+    values = {}
+    for name, (default, factory) in _MESSAGE_DEFAULTS[cls].items():
+        if name in fields:
+            continue
+        if factory is not None:
+            values[name] = factory()
+        elif type(default) is list or type(default) is dict:
+            values[name] = default.copy()
+        else:
+            values[name] = default
+    values.update(fields)
+    return cls.model_construct(_fields_set=set(fields), **values)
+
+
+def message_refs(obj: Any) -> set[str]:
+    """Hashes das mensagens referenciadas por um valor desserializado."""
+    keys: set[str] = set()
+
+    def collect(ref: MessageRef) -> MessageRef:
+        keys.add(ref.key)
+        return ref
+
+    _transform(obj, collect, leaf=MessageRef)
+    return keys
+
+
+def _transform(
+    value: Any,
+    replace: Callable[[Any], Any],
+    *,
+    leaf: type = BaseMessage,
+) -> Any:
+    """Aplica ``replace`` às instâncias de ``leaf`` em dicts, listas e tuplas.
+
+    Subclasses desses contêineres (``namedtuple``, modelos...) são mantidas
+    como estão e ficam a cargo do serializador interno.
+    """
+    if isinstance(value, leaf):
+        return replace(value)
+    kind = type(value)
+    if kind is dict:
+        return {k: _transform(v, replace, leaf=leaf) for k, v in value.items()}
+    if kind is list or kind is tuple:
+        items = [_transform(v, replace, leaf=leaf) for v in value]
+        return items if kind is list else tuple(items)
+    return value
@@ -0,0 +1,469 @@
+"""Fábrica de checkpointers (memória ou SQLite ajustado).
+
+``open_checkpointer`` escolhe entre ``MemorySaver`` e SQLite a partir da
+configuração. No modo SQLite a conexão é aberta com WAL, ``synchronous``
+e cache ajustados, e as escritas (checkpoint e pending writes de todas as
+threads que gravam ao mesmo tempo) são agrupadas em uma única transação
+por commit, em vez de um commit por chamada. Por padrão os checkpoints
+usam ``CompactSerializer`` e, no SQLite, cada mensagem é gravada uma
+única vez por thread.
+
+Os bancos SQLite criados aqui recebem ``PRAGMA application_id``
+(``CHECKPOINT_APPLICATION_ID``); a retenção (``CheckpointRetention``) só
+remove checkpoints e compacta bancos com essa marca, nunca um banco
+existente apontado por ``CHECKPOINTER_PATH``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Literal, Sequence, cast
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (WRITES_IDX_MAP, BaseCheckpointSaver,
+                                       ChannelVersions, Checkpoint,
+                                       CheckpointMetadata, CheckpointTuple,
+                                       get_checkpoint_metadata)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from src.envvar import configured, get_settings
+
+from .checkpoint_serde import (DEFAULT_COMPRESS_THRESHOLD, CompactSerializer,
+                               message_refs)
+
+CheckpointerKind = Literal["memory", "sqlite"]
+CheckpointSerializer = Literal["compact", "jsonplus"]
+
+DEFAULT_CHECKPOINT_DB = "db/chatbot.db"
+DEFAULT_SQLITE_CACHE_KIB = 64 * 1024
+DEFAULT_SQLITE_MMAP_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_BATCH = 256
+# ``PRAGMA application_id`` dos bancos criados por ``open_checkpointer``.
+CHECKPOINT_APPLICATION_ID = 0x4C47434B
+
+_INSERT_CHECKPOINT = (
+    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, "
+    "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+_UPSERT_WRITES = (
+    "INSERT OR REPLACE INTO writes (thread_id, checkpoint_ns, checkpoint_id, "
+    "task_id, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_INSERT_WRITES = (
+    "INSERT OR IGNORE INTO writes (thread_id, checkpoint_ns, checkpoint_id, "
+    "task_id, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+# Mensagens deduplicadas: cada mensagem é gravada uma vez por thread.
+_CREATE_MESSAGES = (
+    "CREATE TABLE IF NOT EXISTS checkpoint_messages ("
+    "thread_id TEXT NOT NULL, hash TEXT NOT NULL, type TEXT, value BLOB, "
+    "PRIMARY KEY (thread_id, hash))"
+)
+_INSERT_MESSAGES = (
+    "INSERT OR IGNORE INTO checkpoint_messages (thread_id, hash, type, value) "
+    "VALUES (?, ?, ?, ?)"
+)
+# Limite de parâmetros por consulta em versões antigas do SQLite.
+_MAX_QUERY_PARAMS = 900
+
+
+@dataclass(frozen=True, kw_only=True)
+class CheckpointerConfig:  # pylint: disable=too-few-public-methods
+    """
+    Configuração do checkpointer.
+
+    Atributos:
+        kind (str): ``memory`` ou ``sqlite``.
+        path (str): Caminho do banco SQLite.
+        synchronous (str): Valor de ``PRAGMA synchronous`` (``NORMAL`` é
+            seguro com WAL e evita um fsync por commit).
+        cache_size_kib (int): Tamanho do cache de páginas, em KiB.
+        mmap_size (int): Bytes mapeados em memória para leitura.
+        batch_writes (bool): Agrupa escritas concorrentes em uma transação.
+        max_batch (int): Máximo de escritas por transação.
+        serializer (str): ``compact`` (``CompactSerializer``; no SQLite,
+            as mensagens são deduplicadas por thread) ou ``jsonplus``
+            (formato do serializador padrão do LangGraph nas escritas).
+        compress_threshold (int | None): Bytes a partir dos quais o
+            ``CompactSerializer`` comprime o payload.
+    """
+    kind: CheckpointerKind = "memory"
+    path: str = DEFAULT_CHECKPOINT_DB
+    synchronous: str = "NORMAL"
+    cache_size_kib: int = DEFAULT_SQLITE_CACHE_KIB
+    mmap_size: int = DEFAULT_SQLITE_MMAP_BYTES
+    batch_writes: bool = True
+    max_batch: int = DEFAULT_MAX_BATCH
+    serializer: CheckpointSerializer = "compact"
+    compress_threshold: int | None = DEFAULT_COMPRESS_THRESHOLD
+
+    def __post_init__(self) -> None:
+        if self.synchronous not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            msg = f"Invalid SQLite synchronous mode '{self.synchronous}'."
+            raise ValueError(msg)
+
+    @staticmethod
+    def from_env(default_kind: CheckpointerKind = "memory") -> "CheckpointerConfig":
+        """Cria uma instância a partir das configurações validadas do processo."""
+        checkpointer = get_settings().checkpointer
+        return CheckpointerConfig(
+            kind=cast(CheckpointerKind, checkpointer.kind or default_kind),
+            **configured(
+                path=checkpointer.path,
+                synchronous=checkpointer.synchronous,
+                batch_writes=checkpointer.batch_writes,
+                serializer=checkpointer.serializer,
+                compress_threshold=checkpointer.compress_threshold,
+            ),
+        )
+
+
+class CompactAsyncSqliteSaver(AsyncSqliteSaver):
+    """``AsyncSqliteSaver`` com ``CompactSerializer`` e mensagens deduplicadas.
+
+    Com ``deduplicate_messages``, as mensagens do checkpoint são gravadas
+    na tabela ``checkpoint_messages`` uma única vez por thread,
+    identificadas pelo hash do conteúdo, e o checkpoint guarda apenas as
+    referências; as mensagens e o checkpoint entram na mesma transação.
+
+    A leitura sempre resolve as referências e o ``CompactSerializer`` lê
+    também valores do serializador padrão, de modo que um banco gravado
+    com qualquer combinação de ``CHECKPOINTER_SERDE`` e
+    ``CHECKPOINTER_BATCH_WRITES`` continua legível nas demais.
+    """
+
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        *,
+        serde: CompactSerializer | None = None,
+        deduplicate_messages: bool = True,
+    ) -> None:
+        serde = serde or CompactSerializer()
+        if not isinstance(serde, CompactSerializer):
+            msg = f"{type(self).__name__} requires a CompactSerializer."
+            raise ValueError(msg)
+        if deduplicate_messages and not serde.compact_writes:
+            msg = "deduplicate_messages requires compact_writes."
+            raise ValueError(msg)
+        super().__init__(conn, serde=serde)
+        self.compact_serde = serde
+        self.deduplicate_messages = deduplicate_messages
+        self._messages_ready = False
+
+    async def setup(self) -> None:
+        await super().setup()
+        # A tabela existe mesmo sem deduplicação: bancos gravados com ela
+        # ligada precisam continuar legíveis.
+        if not self._messages_ready:
+            async with self.lock:
+                if not self._messages_ready:
+                    await self.conn.execute(_CREATE_MESSAGES)
+                    await self.conn.commit()
+                    self._messages_ready = True
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        await self.setup()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        statements: list[tuple[str, list[tuple[Any, ...]]]] = []
+        if self.deduplicate_messages:
+            (type_, serialized_checkpoint), messages = (
+                self.compact_serde.dumps_typed_deduplicated(checkpoint))
+            statements.append((_INSERT_MESSAGES, [
+                (str(thread_id), key, message_type, value)
+                for key, (message_type, value) in messages.items()
+            ]))
+        else:
+            type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        serialized_metadata = self.jsonplus_serde.dumps(
+            get_checkpoint_metadata(config, metadata)
+        )
+        statements.append((_INSERT_CHECKPOINT, [(
+            str(thread_id),
+            checkpoint_ns,
+            checkpoint["id"],
+            config["configurable"].get("checkpoint_id"),
+            type_,
+            serialized_checkpoint,
+            serialized_metadata,
+        )]))
+        await self._execute(*statements)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self.setup()
+        query = (
+            _UPSERT_WRITES
+            if all(w[0] in WRITES_IDX_MAP for w in writes)
+            else _INSERT_WRITES
+        )
+        await self._execute((query, [
+            (
+                str(config["configurable"]["thread_id"]),
+                str(config["configurable"]["checkpoint_ns"]),
+                str(config["configurable"]["checkpoint_id"]),
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self.serde.dumps_typed(value),
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]))
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        checkpoint_tuple = await super().aget_tuple(config)
+        if checkpoint_tuple is None:
+            return None
+        async with self.lock:
+            return await self._resolve_messages(checkpoint_tuple)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # pylint: disable=redefined-builtin
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        async for checkpoint_tuple in super().alist(
+            config, filter=filter, before=before, limit=limit
+        ):
+            # ``super().alist`` mantém o lock da conexão durante a iteração.
+            yield await self._resolve_messages(checkpoint_tuple)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        await self.setup()
+        async with self.lock:
+            await self.conn.execute(
+                "DELETE FROM checkpoint_messages WHERE thread_id = ?",
+                (str(thread_id),))
+            await self.conn.commit()
+
+    async def adelete_unreferenced_messages(
+        self, thread_id: str | None = None
+    ) -> int:
+        """Remove as mensagens que nenhum checkpoint restante referencia.
+
+        Chamado pela retenção após remover checkpoints (mensagens retiradas
+        do estado pela sumarização deixam de ser referenciadas).
+
+        Returns:
+            Quantidade de mensagens removidas.
+        """
+        await self.setup()
+        removed = 0
+        async with self.lock:
+            if thread_id is None:
+                async with self.conn.execute(
+                    "SELECT DISTINCT thread_id FROM checkpoint_messages"
+                ) as cur:
+                    thread_ids = [row[0] async for row in cur]
+            else:
+                thread_ids = [str(thread_id)]
+
+            for tid in thread_ids:
+                live: set[str] = set()
+                async with self.conn.execute(
+                    "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ?",
+                    (tid,),
+                ) as cur:
+                    async for type_, checkpoint in cur:
+                        live |= message_refs(
+                            self.compact_serde.loads_typed((type_, checkpoint)))
+                async with self.conn.execute(
+                    "SELECT hash FROM checkpoint_messages WHERE thread_id = ?",
+                    (tid,),
+                ) as cur:
+                    stale = [(tid, key) async for (key,) in cur if key not in live]
+                if stale:
+                    await self.conn.executemany(
+                        "DELETE FROM checkpoint_messages"
+                        " WHERE thread_id = ? AND hash = ?", stale)
+                    removed += len(stale)
+            await self.conn.commit()
+        return removed
+
+    async def _resolve_messages(
+        self, checkpoint_tuple: CheckpointTuple
+    ) -> CheckpointTuple:
+        """Carrega as mensagens referenciadas pelo checkpoint (com o lock)."""
+        keys = list(message_refs(checkpoint_tuple.checkpoint))
+        if not keys:
+            return checkpoint_tuple
+        thread_id = str(checkpoint_tuple.config["configurable"]["thread_id"])
+        messages: dict[str, tuple[str, bytes]] = {}
+        for start in range(0, len(keys), _MAX_QUERY_PARAMS):
+            chunk = keys[start:start + _MAX_QUERY_PARAMS]
+            async with self.conn.execute(
+                "SELECT hash, type, value FROM checkpoint_messages"
+                f" WHERE thread_id = ? AND hash IN ({', '.join('?' * len(chunk))})",
+                (thread_id, *chunk),
+            ) as cur:
+                async for key, type_, value in cur:
+                    messages[key] = (type_, value)
+        return checkpoint_tuple._replace(checkpoint=self.compact_serde.resolve_refs(
+            checkpoint_tuple.checkpoint, messages))
+
+    async def _execute(
+        self, *statements: tuple[str, list[tuple[Any, ...]]]
+    ) -> None:
+        """Executa ``statements`` em uma transação própria."""
+        async with self.lock:
+            try:
+                for query, rows in statements:
+                    if rows:
+                        await self.conn.executemany(query, rows)
+                await self.conn.commit()
+            except Exception:
+                await self.conn.rollback()
+                raise
+
+
+class BatchedAsyncSqliteSaver(CompactAsyncSqliteSaver):
+    """``CompactAsyncSqliteSaver`` com commit em grupo.
+
+    ``aput`` e ``aput_writes`` enfileiram suas linhas e aguardam o commit
+    da transação que as contém. Todas as escritas enfileiradas enquanto
+    a transação anterior está em andamento entram na próxima, de modo que
+    sob concorrência um único commit persiste vários checkpoints e seus
+    pending writes. A semântica é preservada: cada chamada só retorna após
+    seus dados estarem comitados.
+    """
+
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        *,
+        serde: CompactSerializer | None = None,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        deduplicate_messages: bool = True,
+    ) -> None:
+        super().__init__(
+            conn, serde=serde, deduplicate_messages=deduplicate_messages)
+        self.max_batch = max_batch
+        self._pending: list[tuple[
+            tuple[tuple[str, list[tuple[Any, ...]]], ...],
+            asyncio.Future[None]]] = []
+        self._flusher: asyncio.Task[None] | None = None
+
+    async def _execute(
+        self, *statements: tuple[str, list[tuple[Any, ...]]]
+    ) -> None:
+        future: asyncio.Future[None] = self.loop.create_future()
+        self._pending.append((statements, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        await future
+
+    async def _flush(self) -> None:
+        # Cede o loop uma vez para que escritas concorrentes entrem no lote.
+        await asyncio.sleep(0)
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            try:
+                async with self.lock:
+                    for statements, _ in batch:
+                        for query, rows in statements:
+                            if rows:
+                                await self.conn.executemany(query, rows)
+                    await self.conn.commit()
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                await self.conn.rollback()
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+
+async def _apply_pragmas(
+    conn: aiosqlite.Connection, config: CheckpointerConfig
+) -> None:
+    async with conn.execute("PRAGMA page_count") as cur:
+        row = await cur.fetchone()
+    if row is not None and row[0] == 0:
+        # Banco novo: criado (e portanto gerenciado) pela aplicação.
+        await conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        await conn.execute(f"PRAGMA application_id={CHECKPOINT_APPLICATION_ID}")
+    await conn.execute("PRAGMA journal_mode=WAL")
+    await conn.execute(f"PRAGMA synchronous={config.synchronous}")
+    await conn.execute(f"PRAGMA cache_size=-{int(config.cache_size_kib)}")
+    await conn.execute(f"PRAGMA mmap_size={int(config.mmap_size)}")
+    await conn.execute("PRAGMA temp_store=MEMORY")
+    await conn.execute("PRAGMA busy_timeout=5000")
+
+
+async def is_owned_database(conn: aiosqlite.Connection) -> bool:
+    """Indica se o banco foi criado por ``open_checkpointer``."""
+    async with conn.execute("PRAGMA application_id") as cur:
+        row = await cur.fetchone()
+    return row is not None and row[0] == CHECKPOINT_APPLICATION_ID
+
+
+@asynccontextmanager
+async def open_checkpointer(
+    config: CheckpointerConfig | None = None,
+) -> AsyncIterator[BaseCheckpointSaver]:
+    """Abre o checkpointer indicado pela configuração.
+
+    Args:
+        config: Configuração; lida do ambiente (``CHECKPOINTER``) se omitida.
+
+    Yields:
+        BaseCheckpointSaver: ``MemorySaver`` ou um saver SQLite ajustado.
+    """
+    config = config or CheckpointerConfig.from_env()
+    compact = config.serializer == "compact"
+
+    if config.kind == "memory":
+        yield MemorySaver(serde=(
+            CompactSerializer(compress_threshold=config.compress_threshold)
+            if compact else None))
+        return
+
+    # No SQLite a leitura é sempre do ``CompactSerializer`` (que também lê
+    # o formato padrão); ``jsonplus`` só muda o formato das escritas.
+    serde = CompactSerializer(
+        compress_threshold=config.compress_threshold, compact_writes=compact)
+    Path(config.path).parent.mkdir(parents=True, exist_ok=True)
+    async with aiosqlite.connect(config.path) as conn:
+        await _apply_pragmas(conn, config)
+        if config.batch_writes:
+            saver: CompactAsyncSqliteSaver = BatchedAsyncSqliteSaver(
+                conn, serde=serde, max_batch=config.max_batch,
+                deduplicate_messages=compact)
+        else:
+            saver = CompactAsyncSqliteSaver(
+                conn, serde=serde, deduplicate_messages=compact)
+        await saver.setup()
+        yield saver
@@ -3,49 +3,330 @@ from __future__ import annotations
 
 import asyncio
 import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
 from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from functools import partial
+from multiprocessing.util import Finalize
 from pathlib import Path
-from typing import Any
-from uuid import uuid4
-from langchain_core.runnables.graph import MermaidDrawMethod
+from typing import Any, Iterable, Literal, cast
+from xml.sax.saxutils import escape
 
+from src.envvar import get_settings
+
+logger = logging.getLogger(__name__)
 
 _PNG_EXECUTOR: ProcessPoolExecutor | None = None
 
+DEFAULT_OUTPUT_DIR = Path("artifacts/graphs")
+MERMAID_JS_URL = "https://cdn.jsdelivr.net/npm/mermaid/dist/mermaid.min.js"
+
+
+@dataclass(frozen=True, kw_only=True)
+class RenderCacheConfig:  # pylint: disable=too-few-public-methods
+    """
+    Limites do cache de imagens renderizadas.
+
+    Atributos:
+        max_files (int): Quantidade máxima de imagens mantidas.
+        max_bytes (int): Tamanho total máximo das imagens, em bytes.
+        max_age (float | None): Idade máxima, em segundos, desde o último uso.
+    """
+    max_files: int = 64
+    max_bytes: int = 64 * 1024 * 1024
+    max_age: float | None = 30 * 24 * 3600
+
+
+DEFAULT_RENDER_CACHE = RenderCacheConfig()
+
+_PENDING_RENDERS: dict[Path, asyncio.Future[Path]] = {}
+
+
+def _render_workers() -> int:
+    """Quantidade de processos de render (``GRAPH_RENDER_WORKERS``, padrão 1)."""
+    return get_settings().graph_render.workers or 1
+
 
 def _get_png_executor() -> ProcessPoolExecutor:
     """Create a process executor lazily so pyppeteer runs in main thread."""
     global _PNG_EXECUTOR
     if _PNG_EXECUTOR is None:
-        _PNG_EXECUTOR = ProcessPoolExecutor(max_workers=1)
+        _PNG_EXECUTOR = ProcessPoolExecutor(max_workers=_render_workers())
         atexit.register(_PNG_EXECUTOR.shutdown, wait=False)
     return _PNG_EXECUTOR
 
 
+def render_cache_key(mermaid_syntax: str, **options: Any) -> str:
+    """Calcula a chave de cache a partir do Mermaid e das opções de render."""
+    payload = json.dumps(
+        {"mermaid": mermaid_syntax, "options": options},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _evict_renders(
+    output_dir: Path,
+    cache: RenderCacheConfig,
+    keep: Path | None = None,
+) -> None:
+    """Remove imagens antigas até respeitar os limites do cache (LRU por mtime)."""
+    now = time.time()
+    entries: list[tuple[float, int, Path]] = []
+    for path in output_dir.glob("langgraph_*.*"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    entries.sort(key=lambda entry: entry[0], reverse=True)
+
+    kept_files = 0
+    kept_bytes = 0
+    for mtime, size, path in entries:
+        expired = cache.max_age is not None and now - mtime > cache.max_age
+        over_limit = (
+            kept_files + 1 > cache.max_files or kept_bytes + size > cache.max_bytes
+        )
+        if path != keep and (expired or over_limit):
+            path.unlink(missing_ok=True)
+            continue
+        kept_files += 1
+        kept_bytes += size
+
+
+# Estado do processo de renderização: um navegador headless quente, com o
+# Mermaid já carregado, reaproveitado entre renders.
+_WORKER_LOOP: asyncio.AbstractEventLoop | None = None
+_WORKER_BROWSER: Any = None
+_WORKER_PAGE: Any = None
+
+
+async def _get_worker_page() -> Any:
+    """Retorna a página do navegador quente, iniciando-o na primeira vez."""
+    global _WORKER_BROWSER, _WORKER_PAGE
+    if _WORKER_PAGE is not None and not _WORKER_PAGE.isClosed():
+        return _WORKER_PAGE
+
+    from pyppeteer import launch  # pylint: disable=import-outside-toplevel
+
+    if _WORKER_BROWSER is None:
+        # Sinais são tratados pelo processo pai; o navegador é fechado pelo
+        # finalizador registrado abaixo.
+        _WORKER_BROWSER = await launch(
+            handleSIGINT=False, handleSIGTERM=False, handleSIGHUP=False
+        )
+        Finalize(None, _close_worker_browser, exitpriority=10)
+
+    page = await _WORKER_BROWSER.newPage()
+    await page.goto("about:blank")
+    await page.addScriptTag({"url": MERMAID_JS_URL})
+    await page.evaluate("() => { mermaid.initialize({startOnLoad: false}); }")
+    _WORKER_PAGE = page
+    return page
+
+
+def _close_worker_browser() -> None:
+    """Fecha o navegador quente ao encerrar o processo de renderização."""
+    global _WORKER_BROWSER, _WORKER_PAGE
+    if _WORKER_BROWSER is not None and _WORKER_LOOP is not None:
+        _WORKER_LOOP.run_until_complete(_WORKER_BROWSER.close())
+    _WORKER_BROWSER = None
+    _WORKER_PAGE = None
+
+
+async def _render_png_with_warm_browser(
+    mermaid_syntax: str,
+    background_color: str,
+    padding: int,
+    device_scale_factor: int,
+) -> bytes:
+    page = await _get_worker_page()
+
+    svg_code = await page.evaluate(
+        """(mermaidGraph) => mermaid.mermaidAPI.render('mermaid', mermaidGraph)""",
+        mermaid_syntax,
+    )
+    await page.evaluate(
+        """(svg, backgroundColor) => {
+            document.body.innerHTML = svg;
+            document.body.style.background = backgroundColor;
+        }""",
+        svg_code["svg"],
+        background_color,
+    )
+    dimensions = await page.evaluate(
+        """() => {
+            const rect = document.querySelector('svg').getBoundingClientRect();
+            return { width: rect.width, height: rect.height };
+        }"""
+    )
+    await page.setViewport(
+        {
+            "width": int(dimensions["width"] + padding),
+            "height": int(dimensions["height"] + padding),
+            "deviceScaleFactor": device_scale_factor,
+        }
+    )
+    return await page.screenshot({"fullPage": False})
+
+
 def _render_png_via_pyppeteer(
     mermaid_syntax: str,
     background_color: str,
     padding: int,
     output_file_path: Path,
+    device_scale_factor: int = 3,
 ) -> Path:
-    """Helper executed in a separate process to avoid nested event loops."""
-    from langchain_core.runnables.graph_mermaid import draw_mermaid_png
+    """Helper executed in a separate process to avoid nested event loops.
 
-    draw_mermaid_png(
-        mermaid_syntax=mermaid_syntax,
-        draw_method=MermaidDrawMethod.PYPPETEER,
-        background_color=background_color,
-        padding=padding,
-        output_file_path=str(output_file_path),
-    )
+    O processo mantém o navegador aberto entre chamadas; apenas o primeiro
+    render paga a inicialização do Chromium. A imagem é escrita em um
+    arquivo temporário e movida atomicamente para o destino.
+    """
+    global _WORKER_LOOP, _WORKER_PAGE
+    if _WORKER_LOOP is None:
+        _WORKER_LOOP = asyncio.new_event_loop()
+
+    try:
+        img_bytes = _WORKER_LOOP.run_until_complete(
+            _render_png_with_warm_browser(
+                mermaid_syntax, background_color, padding, device_scale_factor
+            )
+        )
+    except Exception:
+        # Descarta a página para que o próximo render recomece do zero.
+        _WORKER_PAGE = None
+        raise
+
+    tmp_path = output_file_path.with_name(f".{output_file_path.name}.tmp")
+    tmp_path.write_bytes(img_bytes)
+    os.replace(tmp_path, output_file_path)
     return output_file_path
 
 
-async def render_graph(compiled_graph: Any) -> None:
-    """Renderiza o grafo compilado."""
-    # render_ascii_graph(compiled_graph)
-    await render_png_graph(compiled_graph)
+RenderMethod = Literal["pyppeteer", "svg", "svg_png", "mermaid", "ascii"]
+
+
+async def render_graph(
+    compiled_graph: Any,
+    method: RenderMethod = "pyppeteer",
+) -> Path | None:
+    """Renderiza o grafo compilado com o método escolhido.
+
+    Os renders que geram arquivo rodam fora do event loop: ``pyppeteer`` no
+    executor de processos e ``svg``/``svg_png`` em uma thread.
+
+    Métodos:
+        ``pyppeteer``: PNG via Mermaid em Chromium headless.
+        ``svg``: SVG com layout grandalf, sem subprocesso nem rede.
+        ``svg_png``: SVG do método anterior rasterizado em PNG (``cairosvg``).
+        ``mermaid`` / ``ascii``: imprime o grafo no terminal.
+    """
+    if method == "pyppeteer":
+        return await render_png_graph(compiled_graph)
+    if method == "svg":
+        return await asyncio.to_thread(render_svg_graph, compiled_graph)
+    if method == "svg_png":
+        return await asyncio.to_thread(
+            render_svg_graph, compiled_graph, rasterize=True)
+    if method == "mermaid":
+        render_mermaid_graph(compiled_graph)
+        return None
+    if method == "ascii":
+        render_ascii_graph(compiled_graph)
+        return None
+
+    msg = f"Unsupported graph render method '{method}'."
+    raise ValueError(msg)
+
+
+def graph_rendering_enabled() -> bool:
+    """Indica se a renderização está habilitada (``GRAPH_RENDER``, padrão on)."""
+    return get_settings().graph_render.enabled is not False
+
+
+def default_render_method() -> RenderMethod:
+    """Método de render padrão (``GRAPH_RENDER_METHOD``, padrão ``svg``)."""
+    return cast(RenderMethod, get_settings().graph_render.method or "svg")
+
+
+_BACKGROUND_RENDERS: set[asyncio.Task[Path | None]] = set()
+
+
+async def _render_and_report(
+    compiled_graph: Any,
+    method: RenderMethod | None,
+) -> Path | None:
+    """Renderiza registrando erros em log em vez de propagá-los.
+
+    Sem ``method``, o padrão é resolvido aqui, de modo que um
+    ``GRAPH_RENDER_METHOD`` inválido também vai para o log.
+    """
+    try:
+        method = method or default_render_method()
+        return await render_graph(compiled_graph, method)
+    except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception("Falha ao renderizar o grafo (método %s)", method)
+        return None
+
+
+def schedule_render_graph(
+    compiled_graph: Any,
+    method: RenderMethod | None = None,
+    *,
+    enabled: bool | None = None,
+) -> asyncio.Task[Path | None] | None:
+    """Agenda a renderização em segundo plano, fora do caminho da requisição.
+
+    Retorna a ``Task`` (cujo resultado é o caminho gerado, ou ``None`` em
+    caso de erro) ou ``None`` quando a renderização está desabilitada.
+
+    Args:
+        compiled_graph: Grafo retornado por ``get_graph(xray=True)``.
+        method: Método de render; padrão ``GRAPH_RENDER_METHOD``.
+        enabled: Força habilitar/desabilitar; padrão ``GRAPH_RENDER``.
+    """
+    if enabled is None:
+        enabled = graph_rendering_enabled()
+    if not enabled:
+        return None
+
+    task = asyncio.create_task(_render_and_report(compiled_graph, method))
+    _BACKGROUND_RENDERS.add(task)
+    task.add_done_callback(_BACKGROUND_RENDERS.discard)
+    return task
+
+
+async def drain_background_renders(timeout: float | None = 5.0) -> None:
+    """Aguarda (até ``timeout``) os renders em segundo plano no encerramento."""
+    if _BACKGROUND_RENDERS:
+        await asyncio.wait(set(_BACKGROUND_RENDERS), timeout=timeout)
+
+
+async def render_graphs(
+    compiled_graphs: Iterable[Any],
+    method: RenderMethod | None = None,
+) -> list[Path | None]:
+    """Renderiza vários grafos concorrentemente.
+
+    Com ``pyppeteer`` os renders são distribuídos entre os processos do
+    executor (``GRAPH_RENDER_WORKERS``); com ``svg``/``svg_png``, entre
+    threads. Erros são registrados em log e o item correspondente do
+    resultado fica ``None``.
+    """
+    return list(
+        await asyncio.gather(
+            *(_render_and_report(graph, method) for graph in compiled_graphs)
+        )
+    )
 
 
 def render_mermaid_graph(compiled_graph: Any) -> None:
@@ -58,24 +339,57 @@ def render_mermaid_graph(compiled_graph: Any) -> None:
     print(mermaid_graph)
 
 
-async def render_png_graph(compiled_graph: Any) -> Path:
-    """Renderiza o grafo compilado em PNG, salva e informa o caminho."""
-    loop = asyncio.get_running_loop()
+async def render_png_graph(
+    compiled_graph: Any,
+    *,
+    output_dir: Path = DEFAULT_OUTPUT_DIR,
+    background_color: str = "white",
+    padding: int = 10,
+    cache: RenderCacheConfig = DEFAULT_RENDER_CACHE,
+) -> Path:
+    """Renderiza o grafo compilado em PNG, salva e informa o caminho.
+
+    O arquivo é nomeado pelo hash do Mermaid e das opções de render; se já
+    existir, é devolvido sem renderizar de novo.
+    """
     mermaid_syntax = compiled_graph.draw_mermaid()
+    key = render_cache_key(
+        mermaid_syntax,
+        method="pyppeteer",
+        background_color=background_color,
+        padding=padding,
+    )
 
-    output_dir = Path("artifacts/graphs")
     output_dir.mkdir(parents=True, exist_ok=True)
-    output_path = output_dir / f"langgraph_{uuid4().hex}.png"
+    output_path = output_dir / f"langgraph_{key[:32]}.png"
+
+    if output_path.exists():
+        os.utime(output_path)
+        print(f"Mermaid graph PNG (cache) em: {output_path}")
+        return output_path
 
+    pending = _PENDING_RENDERS.get(output_path)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    loop = asyncio.get_running_loop()
     draw = partial(
         _render_png_via_pyppeteer,
         mermaid_syntax,
-        "white",
-        10,
+        background_color,
+        padding,
         output_path,
     )
 
-    png_path = await loop.run_in_executor(_get_png_executor(), draw)
+    future = asyncio.ensure_future(
+        loop.run_in_executor(_get_png_executor(), draw))
+    _PENDING_RENDERS[output_path] = future
+    try:
+        png_path = await asyncio.shield(future)
+    finally:
+        _PENDING_RENDERS.pop(output_path, None)
+
+    _evict_renders(output_dir, cache, keep=png_path)
     print(f"Mermaid graph PNG salvo em: {png_path}")
     return png_path
 
@@ -88,3 +402,219 @@ def render_ascii_graph(compiled_graph: Any) -> None:
         ascii_graph = compiled_graph.draw_mermaid()
 
     print(ascii_graph)
+
+
+# Métricas aproximadas do texto no SVG (fonte sans-serif de 14px).
+_SVG_FONT_SIZE = 14
+_SVG_CHAR_WIDTH = 8.0
+_SVG_BOX_HEIGHT = 36.0
+_SVG_BOX_PAD_X = 16.0
+_SVG_RANK_SPACE = 40.0
+_SVG_NODE_SPACE = 30.0
+_SVG_COMPONENT_SPACE = 40.0
+
+
+class _SvgVertexView:  # pylint: disable=too-few-public-methods
+    """Dimensões e posição (centro) de um nó para o layout do grandalf."""
+
+    def __init__(self, label: str) -> None:
+        self.w = len(label) * _SVG_CHAR_WIDTH + 2 * _SVG_BOX_PAD_X
+        self.h = _SVG_BOX_HEIGHT
+        self.xy: tuple[float, float] = (0.0, 0.0)
+
+
+class _SvgEdgeView:  # pylint: disable=too-few-public-methods
+    """Trajeto de uma aresta calculado pelo grandalf."""
+
+    def __init__(self) -> None:
+        self.pts: list[tuple[float, float]] = []
+        self.head_angle = 0.0
+
+    def setpath(self, pts: list[tuple[float, float]]) -> None:
+        """Recebe os pontos da aresta calculados pelo layout."""
+        self.pts = pts
+
+
+def draw_svg(
+    graph: Any,
+    *,
+    background_color: str = "white",
+    padding: int = 10,
+) -> str:
+    """Desenha o grafo (``get_graph(xray=True)``) em SVG usando grandalf.
+
+    O layout Sugiyama é calculado em Python puro, sem navegador ou rede.
+    Arestas condicionais são tracejadas, como no Mermaid.
+    """
+    # pylint: disable=import-outside-toplevel
+    from grandalf.graphs import Edge, Graph, Vertex
+    from grandalf.layouts import SugiyamaLayout
+    from grandalf.routing import route_with_lines
+
+    vertices = {
+        node_id: Vertex(node.name) for node_id, node in graph.nodes.items()
+    }
+    for vertex in vertices.values():
+        vertex.view = _SvgVertexView(vertex.data)
+
+    self_loops: list[Vertex] = []
+    edges: list[Edge] = []
+    for edge in graph.edges:
+        if edge.source == edge.target:
+            self_loops.append(vertices[edge.source])
+            continue
+        layout_edge = Edge(
+            vertices[edge.source], vertices[edge.target], data=edge.conditional
+        )
+        layout_edge.view = _SvgEdgeView()
+        edges.append(layout_edge)
+
+    layout_graph = Graph(list(vertices.values()), edges)
+
+    # Cada componente conexo é posicionado à direita do anterior.
+    offset_x = 0.0
+    for component in layout_graph.C:
+        sug = SugiyamaLayout(component)
+        roots = [v for v in component.sV if len(v.e_in()) == 0]
+        sug.init_all(roots=roots or None, optimize=True)
+        sug.yspace = _SVG_RANK_SPACE
+        sug.xspace = _SVG_NODE_SPACE
+        sug.route_edge = route_with_lines
+        sug.draw()
+
+        min_x = min(v.view.xy[0] - v.view.w / 2 for v in component.sV)
+        max_x = max(v.view.xy[0] + v.view.w / 2 for v in component.sV)
+        shift = offset_x - min_x
+        for vertex in component.sV:
+            x, y = vertex.view.xy
+            vertex.view.xy = (x + shift, y)
+        for edge in component.sE:
+            edge.view.pts = [(x + shift, y) for x, y in edge.view.pts]
+        offset_x += max_x - min_x + _SVG_COMPONENT_SPACE
+
+    boxes = [
+        (
+            v.view.xy[0] - v.view.w / 2,
+            v.view.xy[1] - v.view.h / 2,
+            v.view.xy[0] + v.view.w / 2,
+            v.view.xy[1] + v.view.h / 2,
+        )
+        for v in vertices.values()
+    ]
+    points = [pt for edge in edges for pt in edge.view.pts]
+    min_x = min([b[0] for b in boxes] + [p[0] for p in points]) - padding
+    min_y = min([b[1] for b in boxes] + [p[1] for p in points]) - padding
+    max_x = max([b[2] for b in boxes] + [p[0] for p in points]) + padding
+    max_y = max([b[3] for b in boxes] + [p[1] for p in points]) + padding
+    # Espaço extra à direita para os laços.
+    max_x += 24 if self_loops else 0
+
+    def fmt(value: float) -> str:
+        return f"{value:.1f}"
+
+    parts = [
+        '<svg xmlns="http://www.w3.org/2000/svg" '
+        f'width="{fmt(max_x - min_x)}" height="{fmt(max_y - min_y)}" '
+        f'viewBox="{fmt(min_x)} {fmt(min_y)} {fmt(max_x - min_x)} {fmt(max_y - min_y)}">',
+        "<defs><marker id=\"arrow\" viewBox=\"0 0 10 10\" refX=\"10\" refY=\"5\" "
+        "markerWidth=\"8\" markerHeight=\"8\" orient=\"auto-start-reverse\">"
+        "<path d=\"M 0 0 L 10 5 L 0 10 z\" fill=\"#333\"/></marker></defs>",
+        f'<rect x="{fmt(min_x)}" y="{fmt(min_y)}" width="{fmt(max_x - min_x)}" '
+        f'height="{fmt(max_y - min_y)}" fill="{escape(background_color)}"/>',
+    ]
+
+    for edge in edges:
+        path = " ".join(f"{fmt(x)},{fmt(y)}" for x, y in edge.view.pts)
+        dash = ' stroke-dasharray="4 3"' if edge.data else ""
+        parts.append(
+            f'<polyline points="{path}" fill="none" stroke="#333" '
+            f'stroke-width="1.5"{dash} marker-end="url(#arrow)"/>'
+        )
+
+    for vertex in self_loops:
+        x, y = vertex.view.xy
+        right = x + vertex.view.w / 2
+        parts.append(
+            f'<path d="M {fmt(right)} {fmt(y - 8)} C {fmt(right + 24)} {fmt(y - 20)} '
+            f'{fmt(right + 24)} {fmt(y + 20)} {fmt(right)} {fmt(y + 8)}" '
+            'fill="none" stroke="#333" stroke-width="1.5" '
+            'stroke-dasharray="4 3" marker-end="url(#arrow)"/>'
+        )
+
+    for vertex in vertices.values():
+        x, y = vertex.view.xy
+        w, h = vertex.view.w, vertex.view.h
+        is_terminal = vertex.data in ("__start__", "__end__")
+        fill = "#bfb6fc" if is_terminal else "#f2f0ff"
+        radius = h / 2 if is_terminal else 6
+        parts.append(
+            f'<rect x="{fmt(x - w / 2)}" y="{fmt(y - h / 2)}" width="{fmt(w)}" '
+            f'height="{fmt(h)}" rx="{fmt(radius)}" fill="{fill}" stroke="#9370db"/>'
+        )
+        parts.append(
+            f'<text x="{fmt(x)}" y="{fmt(y)}" text-anchor="middle" '
+            'dominant-baseline="central" font-family="sans-serif" '
+            f'font-size="{_SVG_FONT_SIZE}">{escape(vertex.data)}</text>'
+        )
+
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def _rasterize_svg(svg: str, output_file_path: Path) -> None:
+    """Converte o SVG em PNG usando ``cairosvg`` (dependência opcional)."""
+    try:
+        import cairosvg  # pylint: disable=import-outside-toplevel
+    except (ImportError, OSError) as exc:
+        msg = "Rasterizing SVG graphs requires the 'cairosvg' package."
+        raise RuntimeError(msg) from exc
+
+    cairosvg.svg2png(bytestring=svg.encode("utf-8"), write_to=str(output_file_path))
+
+
+def render_svg_graph(
+    compiled_graph: Any,
+    *,
+    output_dir: Path = DEFAULT_OUTPUT_DIR,
+    background_color: str = "white",
+    padding: int = 10,
+    rasterize: bool = False,
+    cache: RenderCacheConfig = DEFAULT_RENDER_CACHE,
+) -> Path:
+    """Renderiza o grafo compilado em SVG (ou PNG), salva e informa o caminho.
+
+    Roda no próprio processo (sem navegador) e usa o mesmo cache endereçado
+    por conteúdo de ``render_png_graph``. É síncrona: em código assíncrono
+    use ``render_graph``, que a executa em uma thread.
+    """
+    suffix = "png" if rasterize else "svg"
+    key = render_cache_key(
+        compiled_graph.draw_mermaid(),
+        method=f"grandalf_{suffix}",
+        background_color=background_color,
+        padding=padding,
+    )
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"langgraph_{key[:32]}.{suffix}"
+
+    if output_path.exists():
+        os.utime(output_path)
+        print(f"Graph {suffix.upper()} (cache) em: {output_path}")
+        return output_path
+
+    svg = draw_svg(
+        compiled_graph, background_color=background_color, padding=padding)
+
+    # Renders simultâneos do mesmo grafo (em threads) não dividem o temporário.
+    tmp_path = output_path.with_name(
+        f".{output_path.name}.{threading.get_ident()}.tmp")
+    if rasterize:
+        _rasterize_svg(svg, tmp_path)
+    else:
+        tmp_path.write_text(svg, encoding="utf-8")
+    os.replace(tmp_path, output_path)
+
+    _evict_renders(output_dir, cache, keep=output_path)
+    print(f"Graph {suffix.upper()} salvo em: {output_path}")
+    return output_path
@@ -0,0 +1,360 @@
+"""Instrumentação de grafos: tempo por nó, tokens, TTFT e checkpoints.
+
+``GraphInstrumentation`` é um callback do LangChain que funciona com
+qualquer ``StateGraph`` compilado: basta incluí-lo em ``callbacks`` da
+configuração da execução (ou usar ``instrumented_config``). As medições
+vão para o ``MetricsRegistry`` do processo:
+
+- ``langgraph_run_seconds``: duração de cada ``ainvoke``/``astream``;
+- ``langgraph_node_seconds{node}``: duração de cada nó;
+- ``llm_request_seconds{model}``, ``llm_time_to_first_token_seconds{model}``
+  (apenas em streaming), ``llm_prompt_tokens{model}`` e
+  ``llm_completion_tokens{model}``;
+- ``llm_prompt_stable_prefix_tokens{model}``: tokens estimados do início
+  do prompt idênticos aos da requisição anterior do mesmo nó e thread,
+  isto é, o prefixo que o cache de prefixo do vLLM pode reaproveitar;
+- ``tool_call_seconds{tool,status}``: duração de cada chamada de
+  ferramenta, incluindo a espera por vaga e os acertos da memoização;
+- ``checkpoint_operation_seconds{operation}``, via
+  ``instrument_checkpointer``.
+
+O tempo de renovação do token OAuth2 é medido pelo próprio
+``OAuth2TokenManager``. Com as métricas desabilitadas, as duas funções
+devolvem a configuração e o checkpointer intactos.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Awaitable, Callable, TypeVar
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+from src.metrics import TOKEN_BUCKETS, MetricsRegistry, get_metrics_registry
+
+from .token_budget import estimate_message_tokens, heuristic_token_count
+
+GRAPH_SECONDS = "langgraph_run_seconds"
+NODE_SECONDS = "langgraph_node_seconds"
+LLM_SECONDS = "llm_request_seconds"
+LLM_TTFT_SECONDS = "llm_time_to_first_token_seconds"
+LLM_PROMPT_TOKENS = "llm_prompt_tokens"
+LLM_COMPLETION_TOKENS = "llm_completion_tokens"
+LLM_STABLE_PREFIX_TOKENS = "llm_prompt_stable_prefix_tokens"
+TOOL_SECONDS = "tool_call_seconds"
+CHECKPOINT_SECONDS = "checkpoint_operation_seconds"
+
+SaverT = TypeVar("SaverT", bound=BaseCheckpointSaver)
+
+# Quantidade de prompts (um por thread e nó) lembrados para comparar o
+# prefixo com o da requisição seguinte.
+MAX_TRACKED_PROMPTS = 1024
+
+
+def _is_node_run(name: str | None, tags: list[str] | None,
+                 metadata: dict[str, Any] | None) -> bool:
+    # O LangGraph marca a execução de cada nó com ``graph:step:N`` e
+    # ``langgraph_node``; runnables internos do nó herdam apenas o metadata.
+    return (
+        bool(metadata)
+        and metadata.get("langgraph_node") == name
+        and any(tag.startswith("graph:step:") for tag in tags or ())
+    )
+
+
+def _fingerprint(message: BaseMessage) -> tuple[str, int]:
+    # Apenas o que é enviado à API; ids de mensagem não entram no prompt.
+    data = {
+        "type": message.type,
+        "content": message.content,
+        "name": message.name,
+        "tool_calls": [
+            {"name": c["name"], "args": c["args"]}
+            for c in getattr(message, "tool_calls", None) or ()
+        ],
+        "tool_call_id": getattr(message, "tool_call_id", None),
+    }
+    text = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha1(text.encode("utf-8"), usedforsecurity=False).hexdigest()
+    return digest, estimate_message_tokens(message)
+
+
+class _PromptPrefixTracker:
+    """Último prompt de cada (thread, nó), para medir o prefixo reaproveitado."""
+
+    def __init__(self, max_entries: int = MAX_TRACKED_PROMPTS) -> None:
+        self.max_entries = max_entries
+        self._prompts: OrderedDict[
+            tuple[str, str], tuple[str, list[tuple[str, int]]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def stable_prefix_tokens(
+        self, key: tuple[str, str], tools: str, messages: list[BaseMessage]
+    ) -> int:
+        """Registra o prompt e retorna os tokens do prefixo em comum."""
+        current = [_fingerprint(m) for m in messages]
+        with self._lock:
+            previous = self._prompts.pop(key, None)
+            self._prompts[key] = (tools, current)
+            while len(self._prompts) > self.max_entries:
+                self._prompts.popitem(last=False)
+
+        if previous is None or previous[0] != tools:
+            return 0
+        tokens = heuristic_token_count(tools) if tools else 0
+        for (digest, count), (before, _) in zip(current, previous[1]):
+            if digest != before:
+                break
+            tokens += count
+        return tokens
+
+
+_PROMPT_PREFIXES = _PromptPrefixTracker()
+
+
+class GraphInstrumentation(BaseCallbackHandler):
+    """Callback que registra tempos de nós e do LLM no ``MetricsRegistry``.
+
+    Args:
+        registry: Registro de destino; usa o registro do processo se omitido.
+    """
+
+    run_inline = True
+
+    def __init__(self, registry: MetricsRegistry | None = None) -> None:
+        self.registry = registry or get_metrics_registry()
+        self._graph = self.registry.histogram(
+            GRAPH_SECONDS, "Duração de uma execução do grafo.")
+        self._nodes = self.registry.histogram(
+            NODE_SECONDS, "Duração de cada nó do grafo.")
+        self._llm = self.registry.histogram(
+            LLM_SECONDS, "Duração de cada chamada ao LLM.")
+        self._ttft = self.registry.histogram(
+            LLM_TTFT_SECONDS,
+            "Tempo até o primeiro token (apenas em streaming).")
+        self._prompt_tokens = self.registry.histogram(
+            LLM_PROMPT_TOKENS,
+            "Tokens de prompt por chamada ao LLM.", TOKEN_BUCKETS)
+        self._completion_tokens = self.registry.histogram(
+            LLM_COMPLETION_TOKENS,
+            "Tokens gerados por chamada ao LLM.", TOKEN_BUCKETS)
+        self._stable_prefix = self.registry.histogram(
+            LLM_STABLE_PREFIX_TOKENS,
+            "Tokens do início do prompt iguais aos da requisição anterior "
+            "da mesma thread.", TOKEN_BUCKETS)
+        self._tool_calls = self.registry.histogram(
+            TOOL_SECONDS, "Duração de cada chamada de ferramenta.")
+        self._chains: dict[UUID, tuple[str | None, float]] = {}
+        self._llms: dict[UUID, tuple[str, float, bool]] = {}
+        self._tools: dict[UUID, tuple[str, float]] = {}
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any],
+        inputs: dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        tags: list[str] | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        name = kwargs.get("name")
+        if parent_run_id is None:
+            self._chains[run_id] = (None, time.perf_counter())
+        elif _is_node_run(name, tags, metadata):
+            self._chains[run_id] = (name, time.perf_counter())
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_chain(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._finish_chain(run_id)
+
+    def _finish_chain(self, run_id: UUID) -> None:
+        started = self._chains.pop(run_id, None)
+        if started is None:
+            return
+        node, start = started
+        elapsed = time.perf_counter() - start
+        if node is None:
+            self._graph.observe(elapsed)
+        else:
+            self._nodes.observe(elapsed, node=node)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[Any]],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        model = str((metadata or {}).get("ls_model_name", "unknown"))
+        self._llms[run_id] = (model, time.perf_counter(), False)
+
+        thread_id = (metadata or {}).get("thread_id")
+        if thread_id is not None and messages:
+            tools = (kwargs.get("invocation_params") or {}).get("tools")
+            self._stable_prefix.observe(
+                _PROMPT_PREFIXES.stable_prefix_tokens(
+                    (str(thread_id), str(metadata.get("langgraph_node"))),
+                    json.dumps(tools, sort_keys=True, default=str) if tools else "",
+                    messages[0],
+                ),
+                model=model,
+            )
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        model = str((metadata or {}).get("ls_model_name", "unknown"))
+        self._llms[run_id] = (model, time.perf_counter(), False)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._llms.get(run_id)
+        if started is None or started[2]:
+            return
+        model, start, _ = started
+        self._ttft.observe(time.perf_counter() - start, model=model)
+        self._llms[run_id] = (model, start, True)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._llms.pop(run_id, None)
+        if started is None:
+            return
+        model, start, _ = started
+        self._llm.observe(time.perf_counter() - start, model=model)
+
+        usage = _usage(response)
+        if usage is not None:
+            self._prompt_tokens.observe(usage[0], model=model)
+            self._completion_tokens.observe(usage[1], model=model)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._llms.pop(run_id, None)
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        # Ferramentas envolvidas por ``create_tool_node`` executam a original
+        # como filha; só a chamada externa é medida.
+        if parent_run_id in self._tools:
+            return
+        name = kwargs.get("name") or serialized.get("name", "unknown")
+        self._tools[run_id] = (str(name), time.perf_counter())
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_tool(run_id, getattr(output, "status", "success"))
+
+    def on_tool_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._finish_tool(run_id, "error")
+
+    def _finish_tool(self, run_id: UUID, status: str) -> None:
+        started = self._tools.pop(run_id, None)
+        if started is None:
+            return
+        tool, start = started
+        self._tool_calls.observe(
+            time.perf_counter() - start, tool=tool, status=status)
+
+
+def _usage(response: LLMResult) -> tuple[int, int] | None:
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None),
+                               "usage_metadata", None)
+            if metadata:
+                return metadata["input_tokens"], metadata["output_tokens"]
+
+    token_usage = (response.llm_output or {}).get("token_usage")
+    if token_usage:
+        return (token_usage.get("prompt_tokens", 0),
+                token_usage.get("completion_tokens", 0))
+    return None
+
+
+def instrumented_config(
+    config: RunnableConfig | None = None,
+    *,
+    registry: MetricsRegistry | None = None,
+) -> RunnableConfig:
+    """Acrescenta ``GraphInstrumentation`` aos callbacks de ``config``.
+
+    Retorna ``config`` sem alterações quando as métricas estão desabilitadas.
+    """
+    config = config or RunnableConfig()
+    registry = registry or get_metrics_registry()
+    if not registry.enabled:
+        return config
+
+    callbacks = list(config.get("callbacks") or [])
+    callbacks.append(GraphInstrumentation(registry))
+    return RunnableConfig(**{**config, "callbacks": callbacks})
+
+
+_CHECKPOINT_OPERATIONS = {
+    "aget_tuple": "get",
+    "aput": "put",
+    "aput_writes": "put_writes",
+}
+
+
+def instrument_checkpointer(
+    saver: SaverT, registry: MetricsRegistry | None = None
+) -> SaverT:
+    """Mede leituras e escritas assíncronas do ``saver``.
+
+    Os métodos são envolvidos apenas nesta instância, preservando o tipo
+    do checkpointer (e, portanto, ``CheckpointRetention`` e afins).
+    """
+    registry = registry or get_metrics_registry()
+    if not registry.enabled:
+        return saver
+
+    histogram = registry.histogram(
+        CHECKPOINT_SECONDS, "Duração das operações do checkpointer.")
+
+    def timed(method: Callable[..., Awaitable[Any]], operation: str):
+        @wraps(method)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, operation=operation)
+
+        return wrapper
+
+    for name, operation in _CHECKPOINT_OPERATIONS.items():
+        setattr(saver, name, timed(getattr(saver, name), operation))
+    return saver
@@ -0,0 +1,443 @@
+"""Memória de longo prazo do chatbot indexada por vetores.
+
+O resumo da conversa perde fatos pontuais (o nome do usuário, uma
+preferência citada uma vez). Esta memória guarda trechos das mensagens do
+usuário e do assistente com seus embeddings e, a cada turno, recupera os
+``top_k`` trechos mais parecidos com a pergunta atual (similaridade de
+cosseno em ``VectorIndex``), para que apenas eles entrem no prompt.
+
+A memória é separada por usuário e, no backend ``disk``, persistida em
+``db/memory`` em arquivos que só crescem: ``<usuário>.f32`` (vetores
+``float32``, uma linha por trecho) e ``<usuário>.jsonl`` (texto e origem
+de cada trecho). Uma escrita interrompida é descartada na leitura. A
+leitura dos arquivos, as gravações e o trabalho do índice (inclusive o
+reagrupamento do IVF, que pode levar centenas de milissegundos) rodam em
+uma thread, fora do event loop.
+
+O embedder é plugável (``Embedder``): ``HashingEmbedder`` é local e
+determinístico (testes e execução offline) e ``EmbeddingsEmbedder``
+adapta qualquer ``Embeddings`` do LangChain (por exemplo, um modelo de
+embeddings servido pelo vLLM). O diretório registra o embedder usado e
+não pode ser reaberto com outro.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Collection, Literal, Protocol, Sequence, cast
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from src.envvar import configured, get_settings
+
+from .vector_index import VectorIndex, normalize
+
+MemoryBackend = Literal["off", "memory", "disk"]
+
+DEFAULT_MEMORY_DIR = "db/memory"
+DEFAULT_TOP_K = 4
+DEFAULT_MIN_SCORE = 0.15
+DEFAULT_DIMENSIONS = 256
+DEFAULT_CHUNK_CHARS = 512
+
+_MANIFEST = "memory.json"
+_WORD = re.compile(r"\w+")
+_TRIGRAM_WEIGHT = 0.5
+_ROLES: dict[type[BaseMessage], str] = {HumanMessage: "user", AIMessage: "assistant"}
+
+
+class Embedder(Protocol):
+    """Converte textos em vetores de ``dimensions`` posições."""
+
+    name: str
+    dimensions: int
+
+    async def aembed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embeddings dos trechos armazenados (uma linha por texto)."""
+
+    async def aembed_query(self, text: str) -> np.ndarray:
+        """Embedding de uma consulta."""
+
+
+class HashingEmbedder:
+    """Embedder local e determinístico por *feature hashing*.
+
+    Cada palavra (minúscula, sem acentos) soma ±1 em uma posição escolhida
+    pelo hash BLAKE2b, que é estável entre processos, e cada trigrama de
+    caracteres da palavra soma ±0,5. Os trigramas aproximam flexões
+    ("mora"/"moro") e diluem as colisões de hash entre palavras. Captura
+    sobreposição de vocabulário, não sinônimos.
+    """
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS) -> None:
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Versão síncrona de ``aembed``."""
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _words(text):
+                for position, weight in _features(word, self.dimensions):
+                    vectors[row, position] += weight
+        return normalize(vectors)
+
+    async def aembed(self, texts: Sequence[str]) -> np.ndarray:
+        return self.embed(texts)
+
+    async def aembed_query(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+
+class EmbeddingsEmbedder:
+    """Adapta um ``Embeddings`` do LangChain ao protocolo ``Embedder``.
+
+    Args:
+        embeddings: Modelo de embeddings (``OpenAIEmbeddings``...).
+        dimensions: Dimensão dos vetores produzidos pelo modelo.
+        name: Identifica o modelo no diretório persistido.
+    """
+
+    def __init__(self, embeddings: Embeddings, *, dimensions: int, name: str) -> None:
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+        self.name = name
+
+    async def aembed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = await self.embeddings.aembed_documents(list(texts))
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dimensions)
+
+    async def aembed_query(self, text: str) -> np.ndarray:
+        return np.asarray(await self.embeddings.aembed_query(text), dtype=np.float32)
+
+
+@dataclass(frozen=True, kw_only=True)
+class LongTermMemoryConfig:  # pylint: disable=too-few-public-methods
+    """
+    Configuração da memória de longo prazo.
+
+    Atributos:
+        backend (str): ``off``, ``memory`` (só no processo) ou ``disk``.
+        path (str): Diretório dos arquivos no backend ``disk``.
+        top_k (int): Trechos recuperados por turno.
+        min_score (float): Similaridade mínima de um trecho recuperado.
+        dimensions (int): Dimensão do ``HashingEmbedder``.
+        chunk_chars (int): Tamanho máximo, em caracteres, de cada trecho.
+        nprobe (int | None): Grupos visitados por busca no IVF;
+            ``None`` acompanha o tamanho do índice (ver ``VectorIndex``).
+    """
+    backend: MemoryBackend = "off"
+    path: str = DEFAULT_MEMORY_DIR
+    top_k: int = DEFAULT_TOP_K
+    min_score: float = DEFAULT_MIN_SCORE
+    dimensions: int = DEFAULT_DIMENSIONS
+    chunk_chars: int = DEFAULT_CHUNK_CHARS
+    nprobe: int | None = None
+
+    @staticmethod
+    def from_env(default_backend: MemoryBackend = "off") -> "LongTermMemoryConfig":
+        """Cria uma instância a partir das configurações validadas do processo."""
+        memory = get_settings().memory
+        return LongTermMemoryConfig(
+            backend=cast(MemoryBackend, memory.backend or default_backend),
+            **configured(
+                path=memory.path,
+                top_k=memory.top_k,
+                min_score=memory.min_score,
+                dimensions=memory.dimensions,
+                chunk_chars=memory.chunk_chars,
+                nprobe=memory.nprobe,
+            ),
+        )
+
+
+@dataclass(frozen=True, kw_only=True)
+class MemoryHit:  # pylint: disable=too-few-public-methods
+    """
+    Trecho recuperado da memória.
+
+    Atributos:
+        text (str): Conteúdo do trecho.
+        role (str): ``user`` ou ``assistant``.
+        score (float): Similaridade de cosseno com a consulta.
+        message_id (str | None): Id da mensagem de origem.
+        thread_id (str | None): Thread de origem.
+    """
+    text: str
+    role: str
+    score: float
+    message_id: str | None = None
+    thread_id: str | None = None
+
+
+class _UserMemory:
+    """Índice e trechos de um usuário, com os arquivos correspondentes.
+
+    Os métodos bloqueiam (arquivos, NumPy) e são chamados em threads; o
+    lock serializa gravações e buscas do mesmo usuário.
+    """
+
+    def __init__(
+        self,
+        dimensions: int,
+        files: tuple[Path, Path] | None,
+        nprobe: int | None = None,
+    ) -> None:
+        self.index = VectorIndex(dimensions, nprobe=nprobe)
+        self.entries: list[dict[str, Any]] = []
+        self.files = files
+        self.lock = threading.Lock()
+        if files is not None:
+            self._load(*files)
+
+    def _load(self, vectors_path: Path, entries_path: Path) -> None:
+        dimensions = self.index.dimensions
+        line_sizes: list[int] = []
+        if entries_path.exists():
+            with entries_path.open("rb") as file:
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break
+                    self.entries.append(json.loads(line))
+                    line_sizes.append(len(line))
+        vectors = np.empty((0, dimensions), dtype=np.float32)
+        if vectors_path.exists():
+            raw = np.fromfile(vectors_path, dtype=np.float32)
+            vectors = raw[:len(raw) // dimensions * dimensions].reshape(-1, dimensions)
+
+        # Vetores e trechos são gravados nessa ordem; após uma queda entre
+        # as duas escritas o excedente de qualquer um deles é descartado.
+        rows = min(len(vectors), len(self.entries))
+        del self.entries[rows:]
+        _truncate(vectors_path, rows * dimensions * 4)
+        _truncate(entries_path, sum(line_sizes[:rows]))
+        if rows:
+            self.index.add(vectors[:rows])
+
+    def add(self, vectors: np.ndarray, entries: list[dict[str, Any]]) -> None:
+        with self.lock:
+            if self.files is not None:
+                vectors_path, entries_path = self.files
+                with vectors_path.open("ab") as file:
+                    file.write(vectors.astype(np.float32).tobytes())
+                with entries_path.open("a", encoding="utf-8") as file:
+                    file.writelines(
+                        json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+            self.index.add(vectors)
+            self.entries.extend(entries)
+
+    def search(self, vector: np.ndarray, k: int) -> list[tuple[dict[str, Any], float]]:
+        with self.lock:
+            ids, scores = self.index.search(vector, k)
+            return [(self.entries[row], score)
+                    for row, score in zip(ids.tolist(), scores.tolist())]
+
+
+class LongTermMemory:
+    """Memória vetorial de longo prazo, separada por usuário.
+
+    Args:
+        embedder: Gera os embeddings dos trechos e das consultas.
+        directory: Diretório de persistência; ``None`` mantém tudo em memória.
+        chunk_chars: Tamanho máximo, em caracteres, de cada trecho.
+        top_k: Padrão de trechos retornados por ``asearch``.
+        min_score: Padrão de similaridade mínima em ``asearch``.
+        nprobe: Grupos visitados por busca no IVF; ``None`` acompanha o
+            tamanho do índice.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        *,
+        directory: str | Path | None = None,
+        chunk_chars: int = DEFAULT_CHUNK_CHARS,
+        top_k: int = DEFAULT_TOP_K,
+        min_score: float = DEFAULT_MIN_SCORE,
+        nprobe: int | None = None,
+    ) -> None:
+        self.embedder = embedder
+        self.chunk_chars = chunk_chars
+        self.top_k = top_k
+        self.min_score = min_score
+        self.nprobe = nprobe
+        self.directory = Path(directory) if directory is not None else None
+        self._users: dict[str, _UserMemory] = {}
+        self._users_lock = threading.Lock()
+        if self.directory is not None:
+            self._check_manifest(self.directory)
+
+    def _check_manifest(self, directory: Path) -> None:
+        manifest = {"embedder": self.embedder.name,
+                    "dimensions": self.embedder.dimensions}
+        path = directory / _MANIFEST
+        if path.exists():
+            stored = json.loads(path.read_text(encoding="utf-8"))
+            if stored != manifest:
+                msg = (f"Memory directory '{directory}' was built with {stored}, "
+                       f"not {manifest}; use the same embedder or a new directory.")
+                raise ValueError(msg)
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(manifest), encoding="utf-8")
+
+    def _user(self, user_id: str) -> _UserMemory:
+        with self._users_lock:
+            memory = self._users.get(user_id)
+            if memory is None:
+                files = None
+                if self.directory is not None:
+                    key = hashlib.blake2b(user_id.encode(), digest_size=16).hexdigest()
+                    files = (self.directory / f"{key}.f32",
+                             self.directory / f"{key}.jsonl")
+                memory = self._users[user_id] = _UserMemory(
+                    self.embedder.dimensions, files, self.nprobe)
+            return memory
+
+    async def _auser(self, user_id: str) -> _UserMemory:
+        memory = self._users.get(user_id)
+        if memory is None:
+            # A primeira consulta do usuário lê os arquivos em uma thread.
+            memory = await asyncio.to_thread(self._user, user_id)
+        return memory
+
+    def size(self, user_id: str) -> int:
+        """Quantidade de trechos guardados para o usuário."""
+        return len(self._user(user_id).entries)
+
+    async def aadd(
+        self,
+        user_id: str,
+        messages: Sequence[BaseMessage],
+        *,
+        thread_id: str | None = None,
+    ) -> int:
+        """Guarda os trechos das mensagens do usuário e do assistente.
+
+        Mensagens de ferramentas e sem texto são ignoradas.
+
+        Returns:
+            Quantidade de trechos guardados.
+        """
+        entries = [
+            {"text": chunk, "role": _ROLES[type(message)],
+             "message_id": message.id, "thread_id": thread_id}
+            for message in messages if type(message) in _ROLES
+            for chunk in chunk_text(message.text(), self.chunk_chars)
+        ]
+        if not entries:
+            return 0
+        vectors = normalize(await self.embedder.aembed([e["text"] for e in entries]))
+        memory = await self._auser(user_id)
+        await asyncio.to_thread(memory.add, vectors, entries)
+        return len(entries)
+
+    async def asearch(
+        self,
+        user_id: str,
+        query: str,
+        *,
+        k: int | None = None,
+        min_score: float | None = None,
+        exclude_ids: Collection[str] = (),
+    ) -> list[MemoryHit]:
+        """Retorna até ``k`` trechos parecidos com ``query``.
+
+        Args:
+            user_id: Usuário cuja memória é consultada.
+            query: Texto da consulta (em geral, a última pergunta).
+            k: Máximo de trechos retornados; padrão ``top_k``.
+            min_score: Similaridade mínima de cosseno; padrão ``min_score``.
+            exclude_ids: Ids de mensagens já presentes no prompt.
+        """
+        k = self.top_k if k is None else k
+        min_score = self.min_score if min_score is None else min_score
+        memory = await self._auser(user_id)
+        if not memory.entries or not query.strip():
+            return []
+        vector = await self.embedder.aembed_query(query)
+        found = await asyncio.to_thread(
+            memory.search, vector, k + len(exclude_ids))
+
+        hits: list[MemoryHit] = []
+        for entry, score in found:
+            if score < min_score or len(hits) == k:
+                break
+            if entry.get("message_id") in exclude_ids:
+                continue
+            hits.append(MemoryHit(score=score, **entry))
+        return hits
+
+
+def create_long_term_memory(
+    config: LongTermMemoryConfig | None = None,
+    embedder: Embedder | None = None,
+) -> LongTermMemory | None:
+    """Cria a memória indicada pela configuração (``None`` se desabilitada).
+
+    Args:
+        config: Configuração; lida do ambiente (``LONG_TERM_MEMORY``) se omitida.
+        embedder: Embedder; padrão ``HashingEmbedder(config.dimensions)``.
+    """
+    config = config or LongTermMemoryConfig.from_env()
+    if config.backend == "off":
+        return None
+    return LongTermMemory(
+        embedder or HashingEmbedder(config.dimensions),
+        directory=config.path if config.backend == "disk" else None,
+        chunk_chars=config.chunk_chars,
+        top_k=config.top_k,
+        min_score=config.min_score,
+        nprobe=config.nprobe,
+    )
+
+
+def chunk_text(text: str, max_chars: int) -> list[str]:
+    """Divide ``text`` em trechos de até ``max_chars`` caracteres entre palavras."""
+    chunks: list[str] = []
+    current = ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {word}" if current else word
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _words(text: str) -> list[str]:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    plain = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return [w for w in _WORD.findall(plain) if len(w) > 1]
+
+
+@functools.lru_cache(maxsize=65536)
+def _features(word: str, dimensions: int) -> tuple[tuple[int, float], ...]:
+    """Posições e pesos da palavra e dos seus trigramas (``<palavra>``)."""
+    marked = f"<{word}>"
+    grams = [(word, 1.0)] + [
+        (marked[i:i + 3], _TRIGRAM_WEIGHT) for i in range(len(marked) - 2)]
+    features = []
+    for gram, weight in grams:
+        digest = int.from_bytes(
+            hashlib.blake2b(gram.encode(), digest_size=8).digest(), "little")
+        features.append(
+            (digest % dimensions, weight if digest >> 63 else -weight))
+    return tuple(features)
+
+
+def _truncate(path: Path, size: int) -> None:
+    if path.exists() and path.stat().st_size > size:
+        with path.open("r+b") as file:
+            file.truncate(size)
@@ -0,0 +1,84 @@
+"""Montagem do prompt com prefixo estável para o cache de prefixo do vLLM.
+
+O vLLM reaproveita o KV-cache do maior prefixo (em blocos de tokens) que
+a requisição compartilha com requisições anteriores. Qualquer byte que
+muda no início do prompt invalida o cache de tudo que vem depois; por
+isso o prompt é montado do mais estável para o mais volátil:
+
+1. o prompt de sistema fixo (os esquemas das ferramentas vinculadas com
+   ``bind_tools`` são inseridos pelo template do modelo junto dele e
+   também não mudam entre requisições);
+2. o resumo da conversa, que muda apenas quando a conversa é resumida;
+   vai na mesma mensagem de sistema, depois do texto fixo, pois vários
+   templates de chat (Llama, Mistral, Gemma) só aceitam uma mensagem de
+   sistema, no início;
+3. as mensagens recentes, que só crescem ao final entre um turno e outro;
+   as memórias de longo prazo recuperadas para o turno entram como um
+   bloco delimitado (``<memories>``) no início da última ``HumanMessage``:
+   mudam a cada pergunta, então ficam depois de todo o histórico anterior
+   (que segue reaproveitável), mas antes das chamadas de ferramenta do
+   turno, que as compartilham. Ficam na mensagem do usuário porque os
+   templates que só aceitam o sistema no início (ou que exigem turnos
+   alternados de usuário e assistente) recusariam outra mensagem ali.
+
+O tamanho do prefixo efetivamente reaproveitado em cada requisição é
+medido por ``GraphInstrumentation`` (``llm_prompt_stable_prefix_tokens``).
+"""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+from langchain_core.messages import AnyMessage, HumanMessage, SystemMessage
+
+SUMMARY_PREFIX = "Summary of conversation earlier: "
+MEMORIES_PREFIX = (
+    "Relevant memories from earlier conversations (context only; the "
+    "message follows after the block):")
+
+
+def assemble_prompt(
+    messages: Sequence[AnyMessage],
+    *,
+    system_prompt: str,
+    summary: str | None = None,
+    memories: Sequence[str] = (),
+) -> list[AnyMessage]:
+    """Monta o prompt: sistema fixo e resumo, e mensagens recentes com as memórias.
+
+    Args:
+        messages: Mensagens recentes da conversa, em ordem.
+        system_prompt: Texto fixo do sistema; deve ser idêntico em todas as
+            requisições (sem datas, ids ou outros valores variáveis).
+        summary: Resumo das mensagens anteriores, se houver; acrescentado à
+            mensagem de sistema, depois de ``system_prompt``.
+        memories: Trechos da memória de longo prazo relevantes ao turno;
+            inseridos em um bloco no início da última ``HumanMessage`` (ou
+            em uma ``HumanMessage`` ao final, se não houver nenhuma).
+    """
+    system = system_prompt
+    if summary:
+        system += "\n\n" + SUMMARY_PREFIX + summary
+    prompt: list[AnyMessage] = [SystemMessage(content=system)]
+    prompt.extend(messages)
+    if memories:
+        block = "\n".join((
+            MEMORIES_PREFIX, "<memories>", *(f"- {m}" for m in memories),
+            "</memories>"))
+        turn = next(
+            (i for i in range(len(prompt) - 1, 0, -1)
+             if isinstance(prompt[i], HumanMessage)),
+            None)
+        if turn is None:
+            prompt.append(HumanMessage(content=block))
+        else:
+            # Cópia: a mensagem do estado não recebe as memórias.
+            prompt[turn] = prompt[turn].model_copy(
+                update={"content": _with_context(block, prompt[turn].content)})
+    return prompt
+
+
+def _with_context(block: str, content: str | list) -> str | list:
+    if isinstance(content, str):
+        return f"{block}\n\n{content}"
+    return [{"type": "text", "text": block}, *content]
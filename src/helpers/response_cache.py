@@ -0,0 +1,426 @@
+"""Cache de respostas do LLM para execuções repetidas (``temperature=0``).
+
+Replays, benchmarks e testes de regressão repetem exatamente as mesmas
+requisições (modelo, parâmetros, ferramentas e mensagens). Com o cache
+habilitado (``LLM_CACHE=memory`` ou ``sqlite``) a resposta é servida
+localmente e a rede não é usada.
+
+A chave é um SHA-256 encadeado sobre a forma canônica da requisição:
+parte dos parâmetros do modelo (incluindo as ferramentas vinculadas, mas
+não a URL e a chave de acesso) e incorpora uma mensagem por vez, usando
+de cada mensagem apenas o que vai para a API. Ids gerados a cada
+execução (ids de mensagem e de chamadas de ferramenta) são normalizados,
+de modo que a mesma conversa produza a mesma chave em execuções
+diferentes.
+
+A resposta só é servida para a requisição idêntica (a resposta a um
+prefixo não responde a uma conversa mais longa). O encadeamento torna a
+consulta ciente de prefixos: o hash de cada prefixo das conversas
+gravadas fica em um índice, e uma falta informa quantas mensagens iniciais
+coincidem com alguma conversa já em cache (``prefix_messages`` e o
+histograma ``llm_cache_prefix_messages``). Em um replay, isso aponta em
+que mensagem a execução divergiu da gravada.
+
+Entradas ficam em um LRU em memória limitado por quantidade e por bytes,
+com TTL, e opcionalmente em um SQLite que sobrevive entre processos.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal, Sequence, cast
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import ChatGeneration, Generation
+
+from src.envvar import configured, get_settings
+from src.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+CacheBackend = Literal["off", "memory", "sqlite"]
+
+DEFAULT_CACHE_DB = "db/llm_cache.db"
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Histograma (``src.metrics``) com a duração das consultas ao cache.
+CACHE_LOOKUP_SECONDS = "llm_cache_lookup_seconds"
+# Histograma com as mensagens iniciais em cache de cada falta.
+CACHE_PREFIX_MESSAGES = "llm_cache_prefix_messages"
+# Prefixos indexados por entrada do LRU (em média).
+_PREFIXES_PER_ENTRY = 16
+
+_MESSAGE_FIELDS = ("content", "name", "tool_call_id", "status")
+# Parâmetros de conexão que não alteram a resposta do modelo.
+_CONNECTION_PARAMS = ("openai_api_base", "openai_api_key", "openai_proxy")
+
+
+@dataclass(frozen=True, kw_only=True)
+class ResponseCacheConfig:  # pylint: disable=too-few-public-methods
+    """
+    Configuração do cache de respostas.
+
+    Atributos:
+        backend (str): ``off``, ``memory`` ou ``sqlite`` (memória + SQLite).
+        path (str): Caminho do banco SQLite.
+        max_entries (int): Máximo de respostas no LRU em memória.
+        max_bytes (int): Máximo de bytes serializados no LRU em memória.
+        ttl (float | None): Validade das respostas, em segundos.
+    """
+    backend: CacheBackend = "off"
+    path: str = DEFAULT_CACHE_DB
+    max_entries: int = DEFAULT_MAX_ENTRIES
+    max_bytes: int = DEFAULT_MAX_BYTES
+    ttl: float | None = None
+
+    @staticmethod
+    def from_env() -> "ResponseCacheConfig":
+        """Cria uma instância a partir das configurações validadas do processo."""
+        cache = get_settings().llm_cache
+        return ResponseCacheConfig(
+            backend=cast(CacheBackend, cache.backend or "off"),
+            **configured(
+                path=cache.path, max_entries=cache.max_entries, ttl=cache.ttl),
+        )
+
+
+@dataclass(kw_only=True)
+class ResponseCacheStats:  # pylint: disable=too-few-public-methods
+    """Contadores do cache de respostas.
+
+    ``prefix_misses`` conta as faltas cuja conversa começa por um prefixo
+    já em cache e ``prefix_messages`` soma o tamanho desses prefixos.
+    """
+    hits: int = 0
+    misses: int = 0
+    store_hits: int = 0
+    evictions: int = 0
+    expired: int = 0
+    prefix_misses: int = 0
+    prefix_messages: int = 0
+
+
+def _canonical_messages(prompt: str) -> list[dict[str, Any]]:
+    """Reduz as mensagens serializadas ao que é enviado à API."""
+    call_ids: dict[str, str] = {}
+
+    def call_id(value: str | None) -> str | None:
+        if value is None:
+            return None
+        return call_ids.setdefault(value, f"call_{len(call_ids)}")
+
+    canonical = []
+    for message in json.loads(prompt):
+        kwargs = message.get("kwargs", {})
+        item: dict[str, Any] = {"type": message.get("id", ["?"])[-1]}
+        item.update({k: kwargs[k] for k in _MESSAGE_FIELDS if kwargs.get(k)})
+        if "tool_call_id" in item:
+            item["tool_call_id"] = call_id(item["tool_call_id"])
+        if kwargs.get("tool_calls"):
+            item["tool_calls"] = [
+                {"name": c["name"], "args": c["args"], "id": call_id(c.get("id"))}
+                for c in kwargs["tool_calls"]
+            ]
+        canonical.append(item)
+    return canonical
+
+
+def _canonical_llm_string(llm_string: str) -> str:
+    """Remove do ``llm_string`` os parâmetros de conexão (URL, chave)."""
+    model, separator, params = llm_string.partition("---")
+    try:
+        serialized = json.loads(model)
+    except ValueError:
+        return llm_string
+    kwargs = serialized.get("kwargs") if isinstance(serialized, dict) else None
+    if not isinstance(kwargs, dict):
+        return llm_string
+    for name in _CONNECTION_PARAMS:
+        kwargs.pop(name, None)
+    return json.dumps(serialized, sort_keys=True) + separator + params
+
+
+def _digest(previous: str, item: Any) -> str:
+    payload = json.dumps(
+        item, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(
+        previous.encode("ascii") + b"\0" + payload.encode("utf-8")).hexdigest()
+
+
+def response_cache_prefix_keys(prompt: str, llm_string: str) -> list[str]:
+    """Retorna as chaves encadeadas de cada prefixo da requisição.
+
+    O item ``i`` identifica o modelo com as ``i`` primeiras mensagens; o
+    último é a chave da requisição inteira.
+    """
+    try:
+        messages: list[Any] = _canonical_messages(prompt)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        messages = [prompt]
+    keys = [_digest("", _canonical_llm_string(llm_string))]
+    for message in messages:
+        keys.append(_digest(keys[-1], message))
+    return keys
+
+
+def response_cache_key(prompt: str, llm_string: str) -> str:
+    """Retorna a chave canônica de uma requisição."""
+    return response_cache_prefix_keys(prompt, llm_string)[-1]
+
+
+def _without_ids(generations: Sequence[Generation]) -> list[Generation]:
+    # Ids de mensagem gravados no cache fariam respostas repetidas na mesma
+    # thread substituírem umas às outras no estado (``add_messages``).
+    result = []
+    for generation in generations:
+        if isinstance(generation, ChatGeneration) and generation.message.id:
+            generation = generation.model_copy(update={
+                "message": generation.message.model_copy(update={"id": None})})
+        result.append(generation)
+    return result
+
+
+class _SqliteStore:
+    """Armazenamento persistente das respostas (chave -> JSON)."""
+
+    def __init__(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, value: str, created_at: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at)"
+                " VALUES (?, ?, ?)", (key, value, created_at))
+
+    def delete_older_than(self, created_at: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (created_at,))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache")
+
+
+class LLMResponseCache(BaseCache):
+    """``BaseCache`` do LangChain com LRU em memória, TTL e SQLite opcional.
+
+    As respostas são guardadas serializadas e reconstruídas a cada acerto,
+    para que quem as recebe possa alterá-las sem afetar o cache.
+
+    Args:
+        config: Configuração; ``backend="sqlite"`` habilita a persistência.
+    """
+
+    def __init__(self, config: ResponseCacheConfig | None = None) -> None:
+        self._config = config or ResponseCacheConfig(backend="memory")
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._bytes = 0
+        # Prefixos (sem o modelo) das conversas gravadas, em ordem LRU.
+        self._prefixes: OrderedDict[str, None] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = ResponseCacheStats()
+        self._store = (
+            _SqliteStore(self._config.path)
+            if self._config.backend == "sqlite" else None
+        )
+        if self._store is not None and self._config.ttl is not None:
+            self._store.delete_older_than(time.time() - self._config.ttl)
+
+    @property
+    def stats(self) -> ResponseCacheStats:
+        """Contadores de acertos, faltas e remoções."""
+        return self._stats
+
+    def _fresh(self, created_at: float) -> bool:
+        ttl = self._config.ttl
+        return ttl is None or time.time() - created_at < ttl
+
+    def _memory_get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not self._fresh(entry[1]):
+                self._drop(key)
+                self._stats.expired += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _memory_set(self, key: str, value: str, created_at: float) -> None:
+        size = len(value)
+        if size > self._config.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, created_at)
+            self._bytes += size
+            while (len(self._entries) > self._config.max_entries
+                   or self._bytes > self._config.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self._stats.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def _index_prefixes(self, keys: list[str]) -> None:
+        limit = self._config.max_entries * _PREFIXES_PER_ENTRY
+        with self._lock:
+            # Do mais longo para o mais curto: um prefixo é sempre usado
+            # depois dos seus prolongamentos e sai do LRU depois deles.
+            for key in reversed(keys[1:]):
+                self._prefixes[key] = None
+                self._prefixes.move_to_end(key)
+            while len(self._prefixes) > limit:
+                self._prefixes.popitem(last=False)
+
+    def _cached_prefix(self, keys: list[str]) -> int:
+        """Quantidade de mensagens iniciais que coincidem com uma conversa gravada."""
+        with self._lock:
+            # Um prefixo indexado implica que os menores também foram.
+            low, high = 0, len(keys) - 1
+            while low < high:
+                middle = (low + high + 1) // 2
+                if keys[middle] in self._prefixes:
+                    low = middle
+                else:
+                    high = middle - 1
+        return low
+
+    def _record(self, started: float, keys: list[str], hit: bool) -> None:
+        registry = get_metrics_registry()
+        if hit:
+            self._stats.hits += 1
+            self._index_prefixes(keys)
+        else:
+            self._stats.misses += 1
+            prefix = self._cached_prefix(keys)
+            if prefix:
+                self._stats.prefix_misses += 1
+                self._stats.prefix_messages += prefix
+            if registry.enabled:
+                registry.histogram(
+                    CACHE_PREFIX_MESSAGES,
+                    "Mensagens iniciais já em cache nas faltas do cache de respostas.",
+                ).observe(prefix)
+        if registry.enabled:
+            registry.histogram(
+                CACHE_LOOKUP_SECONDS, "Duração das consultas ao cache de respostas."
+            ).observe(time.perf_counter() - started, result="hit" if hit else "miss")
+
+    def _store_get(self, key: str) -> str | None:
+        if self._store is None:
+            return None
+        row = self._store.get(key)
+        if row is None or not self._fresh(row[1]):
+            return None
+        self._stats.store_hits += 1
+        self._memory_set(key, row[0], row[1])
+        return row[0]
+
+    @staticmethod
+    def _decode(value: str) -> RETURN_VAL_TYPE | None:
+        try:
+            with warnings.catch_warnings():
+                # ``loads`` é marcado como beta no ``langchain_core`` e, nas
+                # versões recentes, avisa sobre o padrão de ``allowed_objects``.
+                warnings.simplefilter("ignore", LangChainBetaWarning)
+                warnings.simplefilter("ignore", PendingDeprecationWarning)
+                return loads(value)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.warning("Entrada inválida no cache de respostas; ignorando.")
+            return None
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        started = time.perf_counter()
+        keys = response_cache_prefix_keys(prompt, llm_string)
+        value = self._memory_get(keys[-1]) or self._store_get(keys[-1])
+        result = self._decode(value) if value is not None else None
+        self._record(started, keys, result is not None)
+        return result
+
+    def update(
+        self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE
+    ) -> None:
+        keys = response_cache_prefix_keys(prompt, llm_string)
+        value = dumps(_without_ids(return_val))
+        created_at = time.time()
+        self._memory_set(keys[-1], value, created_at)
+        self._index_prefixes(keys)
+        if self._store is not None:
+            self._store.set(keys[-1], value, created_at)
+
+    async def alookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        started = time.perf_counter()
+        keys = response_cache_prefix_keys(prompt, llm_string)
+        value = self._memory_get(keys[-1])
+        if value is None and self._store is not None:
+            value = await asyncio.to_thread(self._store_get, keys[-1])
+        result = self._decode(value) if value is not None else None
+        self._record(started, keys, result is not None)
+        return result
+
+    async def aupdate(
+        self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE
+    ) -> None:
+        keys = response_cache_prefix_keys(prompt, llm_string)
+        value = dumps(_without_ids(return_val))
+        created_at = time.time()
+        self._memory_set(keys[-1], value, created_at)
+        self._index_prefixes(keys)
+        if self._store is not None:
+            await asyncio.to_thread(self._store.set, keys[-1], value, created_at)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._prefixes.clear()
+            self._bytes = 0
+        if self._store is not None:
+            self._store.clear()
+
+
+_DEFAULT_CACHE: LLMResponseCache | None = None
+_DEFAULT_CACHE_LOADED = False
+
+
+def get_response_cache() -> LLMResponseCache | None:
+    """Retorna o cache do processo configurado por ``LLM_CACHE`` (ou ``None``)."""
+    global _DEFAULT_CACHE, _DEFAULT_CACHE_LOADED  # instância compartilhada
+    if not _DEFAULT_CACHE_LOADED:
+        config = ResponseCacheConfig.from_env()
+        if config.backend != "off":
+            _DEFAULT_CACHE = LLMResponseCache(config)
+        _DEFAULT_CACHE_LOADED = True
+    return _DEFAULT_CACHE
@@ -0,0 +1,124 @@
+"""Execução de um turno do grafo com streaming de tokens.
+
+``stream_graph_turn`` usa ``astream`` com ``stream_mode="messages"``: os
+tokens do modelo são escritos assim que chegam, e as chamadas de
+ferramenta aparecem quando o modelo as emite e quando o ``ToolNode``
+devolve o resultado. O estado final é o mesmo de ``ainvoke`` (as mesmas
+mensagens são gravadas pelo checkpointer); apenas a entrega é
+incremental.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Collection, TextIO
+
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph.state import CompiledStateGraph
+
+
+@dataclass(frozen=True, kw_only=True)
+class StreamResult:  # pylint: disable=too-few-public-methods
+    """
+    Resultado de um turno executado com streaming.
+
+    Atributos:
+        values (dict[str, Any]): Estado final do grafo (igual ao de ``ainvoke``).
+        time_to_first_token (float | None): Segundos até o primeiro token
+            de texto exibido; ``None`` se o modelo não gerou texto.
+        total_time (float): Duração total do turno, em segundos.
+        chunks (int): Quantidade de fragmentos de texto exibidos.
+        tool_calls (int): Quantidade de ferramentas executadas.
+    """
+    values: dict[str, Any]
+    time_to_first_token: float | None
+    total_time: float
+    chunks: int
+    tool_calls: int
+
+
+def _chunk_text(chunk: AIMessage) -> str:
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in chunk.content
+    )
+
+
+async def stream_graph_turn(
+    graph: CompiledStateGraph,
+    graph_input: Any,
+    config: RunnableConfig,
+    *,
+    token_nodes: Collection[str] | None = None,
+    out: TextIO | None = None,
+) -> StreamResult:
+    """Executa um turno exibindo tokens e eventos de ferramenta em ``out``.
+
+    Args:
+        graph: Grafo compilado (com checkpointer, para ler o estado final).
+        graph_input: Entrada do turno, como em ``ainvoke``.
+        config: Configuração da execução (``thread_id`` etc.).
+        token_nodes: Nós cujos tokens são exibidos; ``None`` exibe todos.
+            Útil para ocultar chamadas internas (ex.: sumarização).
+        out: Destino da saída; ``sys.stdout`` por padrão.
+
+    Returns:
+        StreamResult: Estado final e tempos do turno.
+    """
+    out = out or sys.stdout
+    started = time.perf_counter()
+    first_token: float | None = None
+    chunks = 0
+    tool_started: dict[str, float] = {}
+    tools_done = 0
+
+    async for chunk, metadata in graph.astream(
+        graph_input, config, stream_mode="messages"
+    ):
+        node = metadata.get("langgraph_node")
+        if isinstance(chunk, AIMessage):
+            if token_nodes is not None and node not in token_nodes:
+                continue
+            # Respostas que não vieram em streaming (ex.: acerto no cache de
+            # respostas) chegam como um ``AIMessage`` completo.
+            calls = (
+                chunk.tool_call_chunks
+                if isinstance(chunk, AIMessageChunk) else chunk.tool_calls
+            )
+            for call in calls:
+                if call.get("name"):
+                    tool_started[call.get("id") or call["name"]] = time.perf_counter()
+                    out.write(f"\n[ferramenta] {call['name']} ...\n")
+            text = _chunk_text(chunk)
+            if text:
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                chunks += 1
+                out.write(text)
+            out.flush()
+        elif isinstance(chunk, ToolMessage):
+            tools_done += 1
+            began = tool_started.pop(chunk.tool_call_id, None)
+            elapsed = f" em {time.perf_counter() - began:.2f}s" if began else ""
+            status = "falhou" if chunk.status == "error" else "concluída"
+            out.write(f"[ferramenta] {chunk.name} {status}{elapsed}\n")
+            out.flush()
+
+    total = time.perf_counter() - started
+    ttft = f"{first_token:.2f}s" if first_token is not None else "-"
+    out.write(f"\n(primeiro token: {ttft} | total: {total:.2f}s)\n")
+    out.flush()
+
+    state = await graph.aget_state(config)
+    return StreamResult(
+        values=dict(state.values),
+        time_to_first_token=first_token,
+        total_time=total,
+        chunks=chunks,
+        tool_calls=tools_done,
+    )
@@ -0,0 +1,178 @@
+"""Estimativa de tokens e política de sumarização por orçamento de tokens.
+
+A decisão de resumir a conversa é tomada pelo tamanho estimado do prompt
+(resumo + mensagens), e não pela quantidade de mensagens: só pagamos uma
+chamada de sumarização quando o contexto se aproxima do limite (marca
+alta) e, ao resumir, mantemos apenas as mensagens recentes que cabem na
+marca baixa.
+
+O tokenizador é plugável; o padrão é uma heurística rápida (cerca de
+quatro caracteres por token). ``tiktoken`` pode ser usado quando estiver
+disponível localmente.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Sequence
+
+from langchain_core.messages import AnyMessage, ToolMessage
+
+from src.envvar import configured, get_settings
+
+logger = logging.getLogger(__name__)
+
+Tokenizer = Callable[[str], int]
+
+# Tokens extras por mensagem (papel, delimitadores do template de chat).
+MESSAGE_TOKEN_OVERHEAD = 4
+DEFAULT_HIGH_WATERMARK = 8000
+DEFAULT_LOW_WATERMARK = 3000
+
+
+def heuristic_token_count(text: str) -> int:
+    """Estima tokens por comprimento (aproximadamente 4 caracteres por token)."""
+    return (len(text) + 3) // 4
+
+
+def tiktoken_tokenizer(encoding_name: str = "cl100k_base") -> Tokenizer:
+    """Cria um tokenizador baseado em ``tiktoken``."""
+    import tiktoken  # pylint: disable=import-outside-toplevel
+
+    encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(text: str) -> int:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return count
+
+
+def get_tokenizer(name: str | None = None) -> Tokenizer:
+    """Retorna o tokenizador pelo nome (``heuristic`` ou ``tiktoken``).
+
+    Se ``tiktoken`` não puder ser carregado (pacote ausente ou encoding
+    indisponível offline), usa a heurística.
+    """
+    if name == "tiktoken":
+        try:
+            return tiktoken_tokenizer()
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.warning("tiktoken indisponível; usando estimativa heurística.")
+    return heuristic_token_count
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for part in content:
+            if isinstance(part, str):
+                parts.append(part)
+            elif isinstance(part, dict) and "text" in part:
+                parts.append(str(part["text"]))
+        return "".join(parts)
+    return str(content)
+
+
+def estimate_message_tokens(
+    message: AnyMessage,
+    tokenizer: Tokenizer = heuristic_token_count,
+) -> int:
+    """Estima os tokens de uma mensagem, incluindo chamadas de ferramenta."""
+    tokens = MESSAGE_TOKEN_OVERHEAD + tokenizer(_content_text(message.content))
+
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        tokens += tokenizer(json.dumps(
+            [{"name": c["name"], "args": c["args"]} for c in tool_calls],
+            ensure_ascii=False,
+        ))
+    return tokens
+
+
+def estimate_tokens(
+    messages: Sequence[AnyMessage],
+    tokenizer: Tokenizer = heuristic_token_count,
+) -> int:
+    """Estima os tokens de uma lista de mensagens."""
+    return sum(estimate_message_tokens(m, tokenizer) for m in messages)
+
+
+@dataclass(frozen=True, kw_only=True)
+class SummarizationPolicy:
+    """
+    Política de sumarização guiada por marcas alta/baixa de tokens.
+
+    Atributos:
+        high_watermark (int): Tamanho estimado do prompt (resumo + mensagens)
+            a partir do qual a conversa é resumida.
+        low_watermark (int): Orçamento de tokens das mensagens recentes
+            mantidas após a sumarização.
+        tokenizer (Tokenizer): Função que conta tokens de um texto.
+    """
+    high_watermark: int = DEFAULT_HIGH_WATERMARK
+    low_watermark: int = DEFAULT_LOW_WATERMARK
+    tokenizer: Tokenizer = field(default=heuristic_token_count, compare=False)
+
+    def __post_init__(self) -> None:
+        if not 0 < self.low_watermark < self.high_watermark:
+            msg = (
+                "Summarization watermarks must satisfy "
+                "0 < low_watermark < high_watermark."
+            )
+            raise ValueError(msg)
+
+    @staticmethod
+    def from_env() -> "SummarizationPolicy":
+        """Cria uma instância a partir das configurações validadas do processo."""
+        summary = get_settings().summary
+        return SummarizationPolicy(
+            **configured(
+                high_watermark=summary.high_watermark,
+                low_watermark=summary.low_watermark,
+            ),
+            tokenizer=get_tokenizer(summary.tokenizer),
+        )
+
+    def prompt_tokens(
+        self, messages: Sequence[AnyMessage], summary: str | None = None
+    ) -> int:
+        """Estima o tamanho do prompt enviado ao modelo."""
+        tokens = estimate_tokens(messages, self.tokenizer)
+        if summary:
+            tokens += MESSAGE_TOKEN_OVERHEAD + self.tokenizer(summary)
+        return tokens
+
+    def split_index(self, messages: Sequence[AnyMessage]) -> int:
+        """Retorna o índice a partir do qual as mensagens são mantidas.
+
+        Mantém as mensagens mais recentes que cabem em ``low_watermark``
+        (sempre ao menos a última) sem separar um ``ToolMessage`` do
+        ``AIMessage`` que originou a chamada.
+        """
+        if not messages:
+            return 0
+
+        index = len(messages) - 1
+        kept = estimate_message_tokens(messages[index], self.tokenizer)
+        while index > 0:
+            cost = estimate_message_tokens(messages[index - 1], self.tokenizer)
+            if kept + cost > self.low_watermark:
+                break
+            kept += cost
+            index -= 1
+
+        while index > 0 and isinstance(messages[index], ToolMessage):
+            index -= 1
+        return index
+
+    def should_summarize(
+        self, messages: Sequence[AnyMessage], summary: str | None = None
+    ) -> bool:
+        """Indica se o prompt passou da marca alta e há o que resumir."""
+        if self.prompt_tokens(messages, summary) <= self.high_watermark:
+            return False
+        return self.split_index(messages) > 0
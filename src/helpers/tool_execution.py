@@ -0,0 +1,284 @@
+"""Execução das ferramentas do ReAct: concorrência, timeout e memoização.
+
+Quando o modelo emite várias chamadas de ferramenta em um mesmo
+``AIMessage``, o ``ToolNode`` assíncrono já as executa concorrentemente,
+de modo que o turno custa a latência da ferramenta mais lenta, e não a
+soma das latências. ``create_tool_node`` envolve cada ferramenta para
+acrescentar:
+
+- um limite de chamadas simultâneas por nó (``TOOL_MAX_CONCURRENCY``),
+  para que turnos com muitas chamadas não sobrecarreguem os serviços
+  chamados pelas ferramentas;
+- um timeout por chamada (``TOOL_TIMEOUT_SECONDS``); ao estourar, a
+  ferramenta devolve um ``ToolMessage`` com ``status="error"`` em vez de
+  derrubar o grafo;
+- memoização com TTL das ferramentas declaradas com ``memoize_tool``:
+  chamadas repetidas com os mesmos argumentos, no mesmo turno ou em
+  outras threads, são servidas do cache do processo, e chamadas
+  idênticas simultâneas compartilham uma única execução. Só declare
+  ferramentas puras (resultado determinado pelos argumentos): ferramentas
+  que leem o relógio ou estado externo mutável não devem ser memoizadas.
+
+A latência de cada ferramenta é medida por ``GraphInstrumentation``
+(``tool_call_seconds{tool,status}``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Sequence
+
+from langchain_core.callbacks import Callbacks
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import patch_config
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+from langchain_core.tools import tool as create_tool
+from langgraph.prebuilt import ToolNode
+
+from src.envvar import configured, finite, get_settings
+
+DEFAULT_TOOL_TIMEOUT = 30.0
+DEFAULT_TOOL_CONCURRENCY = 8
+DEFAULT_MEMO_ENTRIES = 1024
+
+# Chave de ``BaseTool.metadata`` com o TTL declarado por ``memoize_tool``.
+_MEMO_TTL_KEY = "memoize_ttl"
+
+
+def memoize_tool(ttl: float) -> Callable[[BaseTool | Callable], BaseTool]:
+    """Declara uma ferramenta pura/idempotente, memoizada por ``ttl`` segundos.
+
+    Pode ser aplicado sobre ``@tool`` ou diretamente sobre uma função (que
+    é convertida em ferramenta como o ``ToolNode`` faria). A declaração só
+    tem efeito nas ferramentas executadas por ``create_tool_node``.
+    """
+    if ttl <= 0:
+        msg = "ttl must be positive."
+        raise ValueError(msg)
+
+    def decorate(target: BaseTool | Callable) -> BaseTool:
+        tool = target if isinstance(target, BaseTool) else create_tool(target)
+        tool.metadata = {**(tool.metadata or {}), _MEMO_TTL_KEY: ttl}
+        return tool
+
+    return decorate
+
+
+@dataclass(frozen=True, kw_only=True)
+class ToolExecutionPolicy:  # pylint: disable=too-few-public-methods
+    """
+    Limites da execução das ferramentas de um ``ToolNode``.
+
+    Atributos:
+        timeout (float | None): Tempo máximo, em segundos, de cada chamada
+            (incluindo a espera por uma vaga); ``None`` desabilita.
+        max_concurrency (int): Chamadas simultâneas permitidas no nó.
+    """
+    timeout: float | None = DEFAULT_TOOL_TIMEOUT
+    max_concurrency: int = DEFAULT_TOOL_CONCURRENCY
+
+    def __post_init__(self) -> None:
+        if self.max_concurrency < 1:
+            msg = "max_concurrency must be at least 1."
+            raise ValueError(msg)
+
+    @staticmethod
+    def from_env() -> "ToolExecutionPolicy":
+        """Cria uma instância a partir das configurações validadas do processo."""
+        tools = get_settings().tools
+        return ToolExecutionPolicy(
+            timeout=(
+                DEFAULT_TOOL_TIMEOUT if tools.timeout is None
+                else finite(tools.timeout)),
+            **configured(max_concurrency=tools.max_concurrency),
+        )
+
+
+@dataclass
+class ToolMemoStats:
+    """
+    Contadores da memoização de ferramentas.
+
+    Atributos:
+        hits (int): Chamadas servidas do cache ou de uma execução idêntica
+            em andamento.
+        misses (int): Chamadas que executaram a ferramenta.
+    """
+    hits: int = 0
+    misses: int = 0
+
+
+class ToolMemo:
+    """Cache LRU com TTL dos resultados de ferramentas memoizadas.
+
+    Args:
+        max_entries: Quantidade máxima de resultados mantidos.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MEMO_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.stats = ToolMemoStats()
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._pending: dict[str, asyncio.Future[Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(name: str, arguments: dict[str, Any]) -> str:
+        """Chave canônica de uma chamada (nome e argumentos ordenados)."""
+        return name + ":" + json.dumps(arguments, sort_keys=True, default=str)
+
+    def _get(self, key: str) -> tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def call(
+        self, key: str, ttl: float, compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Retorna o resultado memoizado de ``key`` ou executa ``compute``.
+
+        Falhas não são memoizadas; chamadas que aguardavam a mesma
+        execução recebem a mesma exceção (um ``ToolException`` se a
+        execução for cancelada).
+        """
+        found, value = self._get(key)
+        if found:
+            self.stats.hits += 1
+            return value
+
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            self.stats.hits += 1
+            return await asyncio.shield(pending)
+
+        self.stats.misses += 1
+        future: asyncio.Future[Any] = loop.create_future()
+        self._pending[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            # Quem aguardava recebe uma falha da ferramenta, e não um
+            # ``CancelledError`` que se confundiria com o da própria tarefa.
+            future.set_exception(ToolException("The shared tool call was cancelled."))
+            future.exception()  # evita o aviso de exceção nunca recuperada
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # evita o aviso de exceção nunca recuperada
+            raise
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+        self._set(key, value, ttl)
+        future.set_result(value)
+        return value
+
+    def clear(self) -> None:
+        """Descarta os resultados memoizados."""
+        with self._lock:
+            self._entries.clear()
+
+
+_TOOL_MEMO: ToolMemo | None = None
+
+
+def get_tool_memo() -> ToolMemo:
+    """Retorna o cache de ferramentas compartilhado pelo processo."""
+    global _TOOL_MEMO  # instância compartilhada por todas as threads
+    if _TOOL_MEMO is None:
+        _TOOL_MEMO = ToolMemo()
+    return _TOOL_MEMO
+
+
+def _guarded_tool(
+    tool: BaseTool,
+    policy: ToolExecutionPolicy,
+    semaphore: asyncio.Semaphore,
+    memo: ToolMemo,
+) -> BaseTool:
+    ttl = (tool.metadata or {}).get(_MEMO_TTL_KEY)
+
+    async def run(
+        config: RunnableConfig, callbacks: Callbacks = None, **arguments: Any
+    ) -> Any:
+        # A ferramenta original roda como filha desta, no mesmo rastreamento.
+        child_config = patch_config(config, callbacks=callbacks)
+
+        async def guarded() -> Any:
+            async with semaphore:
+                return await tool.ainvoke(arguments, child_config)
+
+        async def invoke() -> Any:
+            # O timeout fica dentro da execução memoizada: chamadas que
+            # aguardam a mesma execução recebem o mesmo ``ToolException``.
+            try:
+                return await asyncio.wait_for(guarded(), policy.timeout)
+            except TimeoutError as exc:
+                msg = f"Tool '{tool.name}' timed out after {policy.timeout}s."
+                raise ToolException(msg) from exc
+
+        if ttl is None:
+            return await invoke()
+        return await memo.call(ToolMemo.key(tool.name, arguments), ttl, invoke)
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        coroutine=run,
+        return_direct=tool.return_direct,
+        tags=tool.tags,
+        metadata=tool.metadata,
+        handle_tool_error=True,
+    )
+
+
+def create_tool_node(
+    tools: Sequence[BaseTool | Callable],
+    *,
+    policy: ToolExecutionPolicy | None = None,
+    memo: ToolMemo | None = None,
+    name: str = "tools",
+) -> ToolNode:
+    """Cria um ``ToolNode`` com limite de concorrência, timeout e memoização.
+
+    Args:
+        tools: Ferramentas (ou funções) executadas pelo nó; são as mesmas
+            vinculadas ao modelo com ``bind_tools``.
+        policy: Limites de execução; por padrão vêm do ambiente.
+        memo: Cache das ferramentas memoizadas; por padrão, o do processo.
+        name: Nome do nó.
+    """
+    policy = policy or ToolExecutionPolicy.from_env()
+    memo = memo or get_tool_memo()
+    semaphore = asyncio.Semaphore(policy.max_concurrency)
+    return ToolNode(
+        [
+            _guarded_tool(
+                t if isinstance(t, BaseTool) else create_tool(t),
+                policy, semaphore, memo)
+            for t in tools
+        ],
+        name=name,
+    )
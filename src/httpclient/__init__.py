@@ -0,0 +1,8 @@
+"""Barrel exports for the shared HTTP client pool."""
+
+from .pool import HttpClientPool, HttpPoolConfig, get_http_client_pool
+from .resilience import (AdaptiveRateLimiter, RateLimitConfig,
+                         ResilientTransport, RetryPolicy, TokenBucket,
+                         get_llm_rate_limiter)
+from .router import (EndpointRouter, RouterConfig, RoutingTransport,
+                     current_routing_key, routing_key)
@@ -0,0 +1,246 @@
+"""Pool de conexões HTTP compartilhado pelo processo.
+
+Mantém um único ``httpx.AsyncHTTPTransport`` (e portanto um único pool de
+conexões com keep-alive) criado sob demanda. Os clientes entregues pelo
+pool compartilham esse transporte, de modo que fechar um cliente não
+derruba as conexões dos demais; o transporte só é encerrado quando o
+ciclo de vida do pool termina (``aclose`` ou saída do ``async with``).
+
+Os certificados TLS são validados por padrão (``HTTP_VERIFY``). Um
+cliente que precise falar com um servidor sem certificado válido (o
+provedor OAuth2, com ``OAUTH2_VERIFY=false``) pede um transporte sem
+validação, separado do usado pelos demais clientes.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+import httpx
+
+from src.envvar import configured, get_settings
+
+from .resilience import AdaptiveRateLimiter, ResilientTransport, RetryPolicy
+from .router import EndpointRouter, RouterConfig
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+
+ClientT = TypeVar("ClientT", bound=httpx.AsyncClient)
+
+
+@dataclass(frozen=True, kw_only=True)
+class HttpPoolConfig:  # pylint: disable=too-few-public-methods
+    """
+    Configuração do pool de conexões HTTP.
+
+    Atributos:
+        max_connections (int): Máximo de conexões simultâneas no pool.
+        max_keepalive_connections (int): Máximo de conexões ociosas mantidas.
+        keepalive_expiry (float): Segundos que uma conexão ociosa é mantida.
+        http2 (bool): Habilita HTTP/2 (requer o pacote ``h2``).
+        verify (bool): Valida certificados TLS.
+    """
+    max_connections: int = DEFAULT_MAX_CONNECTIONS
+    max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS
+    keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY
+    http2: bool = False
+    verify: bool = True
+
+    @staticmethod
+    def from_env() -> "HttpPoolConfig":
+        """Cria uma instância a partir das configurações validadas do processo."""
+        http = get_settings().http
+        return HttpPoolConfig(**configured(
+            max_connections=http.max_connections,
+            max_keepalive_connections=http.max_keepalive_connections,
+            keepalive_expiry=http.keepalive_expiry,
+            http2=http.http2,
+            verify=http.verify,
+        ))
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """Delega ao transporte do pool, ignorando ``aclose`` dos clientes."""
+
+    def __init__(self, pool: "HttpClientPool", verify: bool | None = None) -> None:
+        self._pool = pool
+        self._verify = verify
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        transport = self._pool.transport_for(self._verify)
+        return await transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        # O ciclo de vida das conexões pertence ao pool.
+        return None
+
+
+class HttpClientPool:
+    """Ciclo de vida de um pool de conexões HTTP compartilhado.
+
+    Uso típico nos pontos de entrada::
+
+        async with get_http_client_pool():
+            ...
+
+    Args:
+        config: Configuração do pool. Quando omitida, é lida do ambiente
+            na primeira utilização.
+    """
+
+    def __init__(self, config: HttpPoolConfig | None = None) -> None:
+        self._config = config
+        # Um transporte por modo de validação TLS, criados sob demanda.
+        self._transports: dict[bool, httpx.AsyncHTTPTransport] = {}
+        self._router: EndpointRouter | None = None
+        self._owned: dict[str, httpx.AsyncClient] = {}
+
+    @property
+    def config(self) -> HttpPoolConfig:
+        """Configuração efetiva do pool."""
+        if self._config is None:
+            self._config = HttpPoolConfig.from_env()
+        return self._config
+
+    @property
+    def transport(self) -> httpx.AsyncHTTPTransport:
+        """Transporte compartilhado, criado na primeira requisição."""
+        return self.transport_for(None)
+
+    def transport_for(self, verify: bool | None) -> httpx.AsyncHTTPTransport:
+        """Transporte compartilhado com a validação TLS pedida.
+
+        ``None`` segue ``HttpPoolConfig.verify``; os clientes com o mesmo
+        modo compartilham as conexões.
+        """
+        config = self.config
+        verify = config.verify if verify is None else verify
+        transport = self._transports.get(verify)
+        if transport is None:
+            if config.http2:
+                try:
+                    import h2  # pylint: disable=import-outside-toplevel,unused-import
+                except ImportError as exc:
+                    msg = "HTTP/2 requer o pacote 'h2' (instale 'httpx[http2]')."
+                    raise RuntimeError(msg) from exc
+
+            transport = httpx.AsyncHTTPTransport(
+                verify=verify,
+                http2=config.http2,
+                limits=httpx.Limits(
+                    max_connections=config.max_connections,
+                    max_keepalive_connections=config.max_keepalive_connections,
+                    keepalive_expiry=config.keepalive_expiry,
+                ),
+            )
+            self._transports[verify] = transport
+        return transport
+
+    def shared_transport(self, verify: bool | None = None) -> httpx.AsyncBaseTransport:
+        """Retorna um transporte que usa o pool e não o fecha em ``aclose``.
+
+        Args:
+            verify: Validação TLS; ``None`` segue a configuração do pool.
+        """
+        return _SharedTransport(self, verify)
+
+    @property
+    def vllm_router(self) -> EndpointRouter | None:
+        """Roteador entre as réplicas do vLLM; ``None`` com uma só réplica."""
+        if self._router is None:
+            config = RouterConfig.from_env()
+            if not config.enabled:
+                return None
+            self._router = EndpointRouter(config, self.shared_transport())
+        return self._router
+
+    def resilient_transport(
+        self,
+        policy: RetryPolicy | None = None,
+        limiter: AdaptiveRateLimiter | None = None,
+        router: EndpointRouter | None = None,
+    ) -> httpx.AsyncBaseTransport:
+        """Transporte compartilhado com retry, prazo e limite de taxa.
+
+        Com ``router``, cada tentativa é enviada à réplica escolhida por
+        ele (uma repetição pode ir para outra réplica).
+        """
+        transport = self.shared_transport()
+        if router is not None:
+            transport = router.transport(transport)
+        return ResilientTransport(
+            transport, policy or RetryPolicy.from_env(), limiter)
+
+    def client(
+        self,
+        *,
+        limiter: AdaptiveRateLimiter | None = None,
+        router: EndpointRouter | None = None,
+        **kwargs: Any,
+    ) -> httpx.AsyncClient:
+        """Cria um ``httpx.AsyncClient`` leve sobre o pool compartilhado.
+
+        O cliente repete requisições com falhas transitórias conforme
+        ``RetryPolicy.from_env`` (com timeouts de conexão e de leitura
+        separados), com ``limiter`` respeita o limite de taxa e, com
+        ``router``, distribui as requisições entre as réplicas. Nenhuma
+        conexão é aberta aqui; o cliente pode ser fechado pelo chamador
+        sem afetar o pool.
+        """
+        policy = RetryPolicy.from_env()
+        kwargs.setdefault("timeout", policy.timeout())
+        return httpx.AsyncClient(
+            transport=self.resilient_transport(policy, limiter, router), **kwargs)
+
+    def get_or_create(
+        self,
+        key: str,
+        factory: Callable[[httpx.AsyncBaseTransport], ClientT],
+        *,
+        verify: bool | None = None,
+    ) -> ClientT:
+        """Retorna um cliente de longa duração identificado por ``key``.
+
+        ``factory`` recebe o transporte compartilhado (com a validação TLS
+        ``verify``) e só é chamada na primeira vez. O cliente é fechado
+        junto com o pool.
+        """
+        client = self._owned.get(key)
+        if client is None or client.is_closed:
+            client = factory(self.shared_transport(verify))
+            self._owned[key] = client
+        return client  # type: ignore[return-value]
+
+    async def aclose(self) -> None:
+        """Fecha os clientes do pool e todas as conexões abertas."""
+        router, self._router = self._router, None
+        if router is not None:
+            await router.aclose()
+
+        owned, self._owned = self._owned, {}
+        for client in owned.values():
+            await client.aclose()
+
+        transports, self._transports = self._transports, {}
+        for transport in transports.values():
+            await transport.aclose()
+
+    async def __aenter__(self) -> "HttpClientPool":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+
+_DEFAULT_POOL: HttpClientPool | None = None
+
+
+def get_http_client_pool() -> HttpClientPool:
+    """Retorna o pool HTTP padrão do processo (criado sob demanda)."""
+    global _DEFAULT_POOL  # instância compartilhada por todo o processo
+    if _DEFAULT_POOL is None:
+        _DEFAULT_POOL = HttpClientPool()
+    return _DEFAULT_POOL
@@ -0,0 +1,371 @@
+"""Limite de taxa adaptativo, retry com backoff e timeouts do cliente HTTP.
+
+Sob rajadas de carga o vLLM responde 429/503 e o provedor OAuth2 pode
+demorar a responder. ``ResilientTransport`` envolve o transporte do pool
+e, em cada requisição:
+
+- aguarda vaga no ``AdaptiveRateLimiter`` (baldes de requisições e de
+  tokens por minuto), quando configurado;
+- repete a requisição em 429/5xx transitórios e em falhas de conexão ou
+  timeout, com backoff exponencial e jitter (respeitando ``Retry-After``),
+  sem ultrapassar o prazo total (``deadline``) da requisição;
+- ao receber 429/503, reduz a taxa do limitador pela metade; cada
+  sucesso a aumenta aos poucos (AIMD), de modo que a vazão se ajusta à
+  capacidade do backend em vez de colapsar.
+
+``RetryPolicy.timeout`` separa o timeout de conexão (curto: um servidor
+inalcançável falha rápido) do de leitura (longo o bastante para uma
+geração completa).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from src.envvar import configured, finite, get_settings
+from src.metrics import get_metrics_registry
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 120.0
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 20.0
+DEFAULT_DEADLINE = 180.0
+# Tokens de resposta presumidos quando o pedido não informa ``max_tokens``.
+DEFAULT_COMPLETION_ESTIMATE = 256
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Respostas que indicam sobrecarga e reduzem a taxa do limitador.
+THROTTLE_STATUSES = frozenset({429, 503})
+RETRY_EXCEPTIONS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.ReadTimeout,
+    httpx.PoolTimeout,
+    httpx.RemoteProtocolError,
+)
+
+# Histogramas (``src.metrics``) de espera no limitador e entre tentativas.
+RATE_LIMIT_WAIT_SECONDS = "http_rate_limit_wait_seconds"
+RETRY_DELAY_SECONDS = "http_retry_delay_seconds"
+
+
+@dataclass(frozen=True, kw_only=True)
+class RetryPolicy:  # pylint: disable=too-few-public-methods
+    """
+    Política de timeouts e de repetição das requisições.
+
+    Atributos:
+        connect_timeout (float): Segundos para estabelecer a conexão.
+        read_timeout (float): Segundos entre bytes recebidos da resposta.
+        max_attempts (int): Tentativas por requisição (1 desabilita o retry).
+        backoff_base (float): Espera máxima da primeira repetição; dobra a
+            cada tentativa (o valor efetivo é sorteado entre 0 e o teto).
+        backoff_max (float): Teto da espera entre tentativas.
+        deadline (float | None): Prazo total, em segundos, da requisição
+            (esperas no limitador e entre tentativas incluídas) até a
+            chegada dos cabeçalhos da resposta.
+    """
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT
+    read_timeout: float = DEFAULT_READ_TIMEOUT
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    backoff_base: float = DEFAULT_BACKOFF_BASE
+    backoff_max: float = DEFAULT_BACKOFF_MAX
+    deadline: float | None = DEFAULT_DEADLINE
+
+    def __post_init__(self) -> None:
+        if self.max_attempts < 1:
+            msg = "max_attempts must be at least 1."
+            raise ValueError(msg)
+
+    @staticmethod
+    def from_env() -> "RetryPolicy":
+        """Cria uma instância a partir das configurações validadas do processo."""
+        http = get_settings().http
+        return RetryPolicy(
+            **configured(
+                connect_timeout=http.connect_timeout,
+                read_timeout=http.read_timeout,
+                max_attempts=http.retry_max_attempts,
+            ),
+            deadline=(
+                DEFAULT_DEADLINE if http.retry_deadline is None
+                else finite(http.retry_deadline)),
+        )
+
+    def timeout(self, read: float | None = None) -> httpx.Timeout:
+        """Timeouts do ``httpx``: conexão curta e leitura/escrita longas."""
+        read = self.read_timeout if read is None else min(read, self.read_timeout)
+        return httpx.Timeout(read, connect=self.connect_timeout)
+
+    def backoff(self, attempt: int) -> float:
+        """Espera antes da tentativa ``attempt + 1`` (full jitter)."""
+        return random.uniform(
+            0.0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+
+@dataclass(frozen=True, kw_only=True)
+class RateLimitConfig:  # pylint: disable=too-few-public-methods
+    """
+    Limites de taxa e parâmetros da adaptação AIMD.
+
+    Atributos:
+        requests_per_minute (float | None): Requisições por minuto.
+        tokens_per_minute (float | None): Tokens (prompt estimado +
+            ``max_tokens``) por minuto.
+        decrease (float): Fator aplicado à taxa a cada 429/503.
+        increase (float): Fração da taxa máxima somada a cada sucesso.
+        min_fraction (float): Menor fração da taxa máxima admitida.
+        cooldown (float): Segundos entre reduções consecutivas, para que
+            uma rajada de 429 conte como um único sinal de sobrecarga.
+    """
+    requests_per_minute: float | None = None
+    tokens_per_minute: float | None = None
+    decrease: float = 0.5
+    increase: float = 0.05
+    min_fraction: float = 0.05
+    cooldown: float = 1.0
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se algum limite foi configurado."""
+        return bool(self.requests_per_minute or self.tokens_per_minute)
+
+    @staticmethod
+    def from_env() -> "RateLimitConfig":
+        """Cria uma instância a partir das configurações validadas do processo."""
+        http = get_settings().http
+        return RateLimitConfig(
+            requests_per_minute=http.rate_limit_rpm,
+            tokens_per_minute=http.rate_limit_tpm,
+        )
+
+
+class TokenBucket:
+    """Balde de tokens com reserva: quem chega primeiro é atendido primeiro.
+
+    Args:
+        rate: Tokens repostos por segundo (e capacidade do balde, isto é,
+            a maior rajada admitida corresponde a um segundo de taxa).
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.capacity = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Reserva ``amount`` tokens e retorna quanto esperar por eles."""
+        self._refill()
+        # O saldo pode ficar negativo: a reserva é cobrada por inteiro e
+        # pedidos maiores que o balde apenas esperam a reposição da diferença.
+        self._tokens -= amount
+        return max(0.0, -self._tokens / self.rate)
+
+    def set_rate(self, rate: float) -> None:
+        """Altera a taxa de reposição, preservando o saldo atual."""
+        self._refill()
+        self.rate = rate
+
+
+class AdaptiveRateLimiter:
+    """Baldes de requisições e tokens por minuto com adaptação AIMD.
+
+    Args:
+        config: Limites máximos e parâmetros da adaptação.
+    """
+
+    def __init__(self, config: RateLimitConfig) -> None:
+        self.config = config
+        self.fraction = 1.0
+        self._last_decrease = 0.0
+        self._requests = (
+            TokenBucket(config.requests_per_minute / 60)
+            if config.requests_per_minute else None)
+        self._tokens = (
+            TokenBucket(config.tokens_per_minute / 60)
+            if config.tokens_per_minute else None)
+
+    async def acquire(self, tokens: int) -> float:
+        """Aguarda vaga para uma requisição de ``tokens`` e retorna a espera."""
+        wait = 0.0
+        if self._requests is not None:
+            wait = max(wait, self._requests.reserve(1))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.reserve(tokens))
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def on_success(self) -> None:
+        """Aumento aditivo da taxa após uma resposta bem-sucedida."""
+        if self.fraction < 1.0:
+            self._set_fraction(self.fraction + self.config.increase)
+
+    def on_throttle(self) -> None:
+        """Redução multiplicativa da taxa após 429/503."""
+        now = time.monotonic()
+        if now - self._last_decrease < self.config.cooldown:
+            return
+        self._last_decrease = now
+        self._set_fraction(self.fraction * self.config.decrease)
+
+    def _set_fraction(self, fraction: float) -> None:
+        self.fraction = min(1.0, max(self.config.min_fraction, fraction))
+        if self._requests is not None and self.config.requests_per_minute:
+            self._requests.set_rate(
+                self.config.requests_per_minute / 60 * self.fraction)
+        if self._tokens is not None and self.config.tokens_per_minute:
+            self._tokens.set_rate(self.config.tokens_per_minute / 60 * self.fraction)
+
+
+_LLM_RATE_LIMITER: AdaptiveRateLimiter | None = None
+
+
+def get_llm_rate_limiter() -> AdaptiveRateLimiter | None:
+    """Retorna o limitador compartilhado pelos modelos de chat do processo.
+
+    Retorna ``None`` quando ``LLM_RATE_LIMIT_RPM`` e ``LLM_RATE_LIMIT_TPM``
+    não estão configurados.
+    """
+    global _LLM_RATE_LIMITER  # instância compartilhada por todo o processo
+    if _LLM_RATE_LIMITER is None:
+        config = RateLimitConfig.from_env()
+        if not config.enabled:
+            return None
+        _LLM_RATE_LIMITER = AdaptiveRateLimiter(config)
+    return _LLM_RATE_LIMITER
+
+
+def estimate_request_tokens(request: httpx.Request) -> int:
+    """Estima os tokens de uma requisição de chat (prompt + resposta)."""
+    body = request.content
+    completion = DEFAULT_COMPLETION_ESTIMATE
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict):
+        completion = int(
+            payload.get("max_completion_tokens")
+            or payload.get("max_tokens")
+            or DEFAULT_COMPLETION_ESTIMATE)
+    # Cerca de quatro bytes por token, como em ``heuristic_token_count``.
+    return len(body) // 4 + completion
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _observe(name: str, description: str, value: float, **labels: str) -> None:
+    registry = get_metrics_registry()
+    if registry.enabled:
+        registry.histogram(name, description).observe(value, **labels)
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """Transporte que aplica limite de taxa, retry e prazo total.
+
+    Args:
+        transport: Transporte de destino (normalmente o do pool).
+        policy: Política de repetição e prazo.
+        limiter: Limitador de taxa opcional.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        policy: RetryPolicy | None = None,
+        limiter: AdaptiveRateLimiter | None = None,
+    ) -> None:
+        self._transport = transport
+        self.policy = policy or RetryPolicy()
+        self.limiter = limiter
+
+    def _remaining(self, deadline: float | None) -> float | None:
+        return None if deadline is None else deadline - time.monotonic()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        policy = self.policy
+        deadline = (
+            time.monotonic() + policy.deadline if policy.deadline else None)
+        # O corpo precisa estar em memória para ser reenviado.
+        await request.aread()
+        cost = estimate_request_tokens(request) if self.limiter else 0
+        host = request.url.host
+
+        attempt = 0
+        while True:
+            attempt += 1
+            response: httpx.Response | None = None
+            error: Exception | None = None
+            try:
+                async with asyncio.timeout(self._remaining(deadline)):
+                    if self.limiter is not None:
+                        waited = await self.limiter.acquire(cost)
+                        if waited:
+                            _observe(
+                                RATE_LIMIT_WAIT_SECONDS,
+                                "Espera no limitador de taxa do cliente.",
+                                waited, host=host)
+                    response = await self._transport.handle_async_request(request)
+            except TimeoutError as exc:
+                msg = f"Request to {host} exceeded its {policy.deadline}s deadline."
+                raise httpx.ReadTimeout(msg, request=request) from exc
+            except RETRY_EXCEPTIONS as exc:
+                error = exc
+
+            if response is not None:
+                if response.status_code not in RETRY_STATUSES:
+                    if self.limiter is not None:
+                        self.limiter.on_success()
+                    return response
+                if self.limiter is not None and response.status_code in THROTTLE_STATUSES:
+                    self.limiter.on_throttle()
+
+            delay = policy.backoff(attempt)
+            if response is not None:
+                delay = max(delay, _retry_after(response) or 0.0)
+            remaining = self._remaining(deadline)
+            if attempt >= policy.max_attempts or (
+                    remaining is not None and delay >= remaining):
+                if response is not None:
+                    return response
+                raise error  # type: ignore[misc]
+
+            reason = str(response.status_code) if response is not None else type(
+                error).__name__
+            if response is not None:
+                await response.aclose()
+            _observe(
+                RETRY_DELAY_SECONDS, "Espera antes de repetir uma requisição.",
+                delay, host=host, reason=reason)
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
@@ -0,0 +1,397 @@
+"""Roteamento das requisições entre várias réplicas do vLLM.
+
+Com ``VLLM_BASE_URL`` listando várias réplicas (separadas por vírgula), o
+``ChatOpenAI`` continua apontado para a primeira; ``RoutingTransport``
+reescreve cada requisição para a réplica escolhida por ``EndpointRouter``:
+
+- menor número de requisições em andamento (*least outstanding
+  requests*); uma requisição só deixa de contar quando o corpo da
+  resposta (inclusive em streaming) é fechado;
+- afinidade de sessão: requisições com a mesma chave de roteamento (o
+  ``thread_id`` da execução do grafo, ou a definida com
+  ``routing_key``) preferem sempre a mesma réplica (*rendezvous
+  hashing*), o que maximiza os acertos do cache de prefixo do vLLM. A
+  preferência é abandonada quando a réplica tem ``affinity_slack``
+  requisições a mais que a menos ocupada;
+- ejeção passiva: após ``eject_after`` falhas consecutivas (erros de
+  conexão ou 5xx) a réplica sai do rodízio por ``eject_seconds``,
+  tempo que dobra a cada nova ejeção; ao voltar, uma única falha a
+  ejeta de novo;
+- verificação ativa: a cada ``health_interval`` segundos ``GET /models``
+  é enviado a cada réplica; uma réplica que não responde é ejetada e uma
+  ejetada que volta a responder é readmitida.
+
+Uma tentativa repetida por ``ResilientTransport`` evita as réplicas que já
+falharam para a mesma requisição. Se todas estiverem ejetadas, todas
+voltam a ser candidatas: melhor tentar do que recusar.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Iterator
+
+import httpx
+
+from src.envvar import configured, finite, get_settings
+
+DEFAULT_AFFINITY_SLACK = 4
+DEFAULT_EJECT_AFTER = 3
+DEFAULT_EJECT_SECONDS = 10.0
+DEFAULT_MAX_EJECT_SECONDS = 300.0
+DEFAULT_HEALTH_INTERVAL = 15.0
+DEFAULT_HEALTH_TIMEOUT = 2.0
+HEALTH_CHECK_PATH = "/models"
+
+# Respostas que indicam réplica com problema (429 é sobrecarga, não falha).
+FAILURE_STATUSES = frozenset({500, 502, 503, 504})
+# Réplicas que já falharam para a requisição (entre tentativas).
+_FAILED_EXTENSION = "router_failed_endpoints"
+
+_ROUTING_KEY: ContextVar[str | None] = ContextVar("routing_key", default=None)
+
+
+@contextmanager
+def routing_key(key: str | None) -> Iterator[None]:
+    """Define a chave de afinidade das requisições feitas dentro do bloco."""
+    token = _ROUTING_KEY.set(key)
+    try:
+        yield
+    finally:
+        _ROUTING_KEY.reset(token)
+
+
+def current_routing_key() -> str | None:
+    """Chave de afinidade atual: a de ``routing_key`` ou o ``thread_id``.
+
+    Dentro de um nó do grafo o ``RunnableConfig`` da execução fica em uma
+    variável de contexto do LangChain; o ``thread_id`` é lido dela.
+    """
+    key = _ROUTING_KEY.get()
+    if key is not None:
+        return key
+    # pylint: disable-next=import-outside-toplevel
+    from langchain_core.runnables.config import var_child_runnable_config
+    config = var_child_runnable_config.get() or {}
+    thread_id = (config.get("configurable") or {}).get("thread_id")
+    return None if thread_id is None else str(thread_id)
+
+
+@dataclass(frozen=True, kw_only=True)
+class RouterConfig:  # pylint: disable=too-few-public-methods
+    """
+    Réplicas e parâmetros do roteamento.
+
+    Atributos:
+        base_urls (tuple[str, ...]): URLs base das réplicas; a primeira é a
+            configurada no ``ChatOpenAI``.
+        affinity (bool): Prefere a mesma réplica para a mesma chave.
+        affinity_slack (int): Requisições a mais, em relação à réplica
+            menos ocupada, toleradas para manter a afinidade.
+        eject_after (int): Falhas consecutivas até a ejeção.
+        eject_seconds (float): Duração da primeira ejeção.
+        max_eject_seconds (float): Teto da duração das ejeções.
+        health_interval (float | None): Segundos entre verificações
+            ativas; ``None`` desabilita.
+        health_timeout (float): Timeout de cada verificação.
+    """
+    base_urls: tuple[str, ...]
+    affinity: bool = True
+    affinity_slack: int = DEFAULT_AFFINITY_SLACK
+    eject_after: int = DEFAULT_EJECT_AFTER
+    eject_seconds: float = DEFAULT_EJECT_SECONDS
+    max_eject_seconds: float = DEFAULT_MAX_EJECT_SECONDS
+    health_interval: float | None = DEFAULT_HEALTH_INTERVAL
+    health_timeout: float = DEFAULT_HEALTH_TIMEOUT
+
+    def __post_init__(self) -> None:
+        if not self.base_urls:
+            msg = "At least one base URL is required."
+            raise ValueError(msg)
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se há mais de uma réplica a escolher."""
+        return len(self.base_urls) > 1
+
+    @staticmethod
+    def from_env() -> "RouterConfig":
+        """Cria uma instância a partir das configurações validadas do processo."""
+        vllm = get_settings().vllm.require()
+        return RouterConfig(
+            base_urls=vllm.base_urls or (vllm.base_url,),
+            **configured(
+                affinity=vllm.router_affinity,
+                eject_after=vllm.router_eject_after,
+                eject_seconds=vllm.router_eject_seconds,
+            ),
+            health_interval=(
+                DEFAULT_HEALTH_INTERVAL if vllm.router_health_interval is None
+                else finite(vllm.router_health_interval)),
+        )
+
+
+class _Endpoint:
+    """Estado de uma réplica."""
+
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url
+        self.url = httpx.URL(base_url)
+        self.outstanding = 0
+        self.served = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def rewrite(self, path: str) -> httpx.URL:
+        """URL da réplica com ``path`` (e query) após o caminho base."""
+        return self.url.copy_with(
+            raw_path=self.url.raw_path.rstrip(b"/") + path.encode("ascii"))
+
+
+class EndpointRouter:
+    """Escolhe a réplica de cada requisição e acompanha a saúde delas.
+
+    Args:
+        config: Réplicas e parâmetros do roteamento.
+        transport: Transporte usado nas verificações ativas (normalmente o
+            compartilhado do pool).
+    """
+
+    def __init__(
+        self,
+        config: RouterConfig,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.config = config
+        self._transport = transport
+        self._endpoints = [_Endpoint(url) for url in config.base_urls]
+        self._health_task: asyncio.Task[None] | None = None
+
+    def transport(self, inner: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        """Transporte que roteia para as réplicas e entrega a ``inner``."""
+        return RoutingTransport(inner, self)
+
+    def endpoint_for(self, url: httpx.URL) -> tuple[_Endpoint, str] | None:
+        """Réplica cuja URL base é prefixo de ``url`` e o caminho restante."""
+        for endpoint in self._endpoints:
+            base = endpoint.url
+            prefix = base.raw_path.rstrip(b"/")
+            if (url.scheme, url.host, url.port) != (base.scheme, base.host, base.port):
+                continue
+            # ``raw_path`` inclui a query string, preservada no restante.
+            rest = url.raw_path[len(prefix):]
+            if url.raw_path.startswith(prefix) and rest[:1] in (b"", b"/", b"?"):
+                return endpoint, rest.decode("ascii")
+        return None
+
+    def acquire(
+        self,
+        key: str | None = None,
+        exclude: frozenset[str] = frozenset(),
+    ) -> _Endpoint:
+        """Escolhe uma réplica e a conta como ocupada até ``release``."""
+        self._ensure_health_checks()
+        now = time.monotonic()
+        candidates = [
+            e for e in self._endpoints
+            if e.available(now) and e.base_url not in exclude]
+        if not candidates:
+            # Todas ejetadas (ou já tentadas): melhor tentar do que recusar.
+            candidates = [
+                e for e in self._endpoints if e.base_url not in exclude
+            ] or self._endpoints
+
+        chosen = min(candidates, key=lambda e: (e.outstanding, e.served))
+        if key is not None and self.config.affinity:
+            preferred = max(candidates, key=lambda e: _affinity(key, e.base_url))
+            if preferred.outstanding <= chosen.outstanding + self.config.affinity_slack:
+                chosen = preferred
+        chosen.outstanding += 1
+        chosen.served += 1
+        return chosen
+
+    def release(self, endpoint: _Endpoint) -> None:
+        """Marca o fim de uma requisição de ``endpoint``."""
+        endpoint.outstanding -= 1
+
+    def on_success(self, endpoint: _Endpoint) -> None:
+        """Zera as falhas consecutivas (e o histórico de ejeções)."""
+        endpoint.failures = 0
+        endpoint.ejections = 0
+        endpoint.ejected_until = 0.0
+
+    def on_failure(self, endpoint: _Endpoint) -> None:
+        """Conta uma falha e ejeta a réplica após ``eject_after`` seguidas."""
+        endpoint.failures += 1
+        if endpoint.failures >= self.config.eject_after:
+            self._eject(endpoint)
+
+    def _eject(self, endpoint: _Endpoint) -> None:
+        config = self.config
+        duration = min(
+            config.max_eject_seconds, config.eject_seconds * 2 ** endpoint.ejections)
+        endpoint.ejections += 1
+        endpoint.ejected_until = time.monotonic() + duration
+        # Ao voltar ao rodízio, uma única falha basta para nova ejeção.
+        endpoint.failures = config.eject_after - 1
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        """Estado de cada réplica (para logs e benchmarks)."""
+        now = time.monotonic()
+        return [{
+            "base_url": e.base_url,
+            "outstanding": e.outstanding,
+            "served": e.served,
+            "failures": e.failures,
+            "ejected_for": round(max(0.0, e.ejected_until - now), 3),
+        } for e in self._endpoints]
+
+    def _ensure_health_checks(self) -> None:
+        if self.config.health_interval is None or self._transport is None:
+            return
+        task = self._health_task
+        loop = asyncio.get_running_loop()
+        # Uma tarefa de um event loop anterior (outro ``asyncio.run``) não roda mais.
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._health_task = loop.create_task(self._health_loop())
+
+    async def _health_loop(self) -> None:
+        interval = self.config.health_interval or DEFAULT_HEALTH_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_health()
+
+    async def check_health(self) -> None:
+        """Verifica todas as réplicas uma vez (``GET <base>/models``)."""
+        transport = self._transport
+        if transport is None:
+            return
+        await asyncio.gather(*(self._probe(transport, e) for e in self._endpoints))
+
+    async def _probe(
+        self, transport: httpx.AsyncBaseTransport, endpoint: _Endpoint
+    ) -> None:
+        timeout = self.config.health_timeout
+        request = httpx.Request(
+            "GET", endpoint.rewrite(HEALTH_CHECK_PATH),
+            extensions={"timeout": httpx.Timeout(timeout).as_dict()})
+        try:
+            async with asyncio.timeout(timeout):
+                response = await transport.handle_async_request(request)
+                await response.aclose()
+        except (httpx.TransportError, TimeoutError):
+            healthy = False
+        else:
+            # Qualquer resposta abaixo de 500 (inclusive 401) prova que a
+            # réplica está de pé.
+            healthy = response.status_code < 500
+        if healthy:
+            if endpoint.ejected_until:
+                self.on_success(endpoint)
+        elif endpoint.available(time.monotonic()):
+            self._eject(endpoint)
+
+    async def aclose(self) -> None:
+        """Interrompe as verificações ativas."""
+        task, self._health_task = self._health_task, None
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+def _affinity(key: str, base_url: str) -> int:
+    """Peso de *rendezvous hashing* de ``key`` para a réplica."""
+    digest = hashlib.blake2b(f"{key}\0{base_url}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Corpo da resposta que libera a réplica ao ser fechado."""
+
+    def __init__(
+        self, stream: httpx.AsyncByteStream, release: Callable[[], None]
+    ) -> None:
+        self._stream = stream
+        self._release: Callable[[], None] | None = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+class RoutingTransport(httpx.AsyncBaseTransport):
+    """Transporte que envia cada requisição à réplica escolhida.
+
+    Requisições para URLs fora das réplicas configuradas passam sem
+    alteração.
+
+    Args:
+        transport: Transporte de destino (normalmente o do pool).
+        router: Roteador compartilhado pelos clientes.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, router: EndpointRouter) -> None:
+        self._transport = transport
+        self.router = router
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        router = self.router
+        # Em uma repetição a URL já aponta para a réplica da tentativa anterior.
+        match = router.endpoint_for(request.url)
+        if match is None:
+            return await self._transport.handle_async_request(request)
+
+        failed: frozenset[str] = request.extensions.get(_FAILED_EXTENSION, frozenset())
+        endpoint = router.acquire(current_routing_key(), failed)
+        request.url = endpoint.rewrite(match[1])
+        request.headers["Host"] = request.url.netloc.decode("ascii")
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TransportError:
+            router.release(endpoint)
+            router.on_failure(endpoint)
+            request.extensions[_FAILED_EXTENSION] = failed | {endpoint.base_url}
+            raise
+        except BaseException:
+            router.release(endpoint)
+            raise
+
+        if response.status_code in FAILURE_STATUSES:
+            router.on_failure(endpoint)
+            request.extensions[_FAILED_EXTENSION] = failed | {endpoint.base_url}
+        else:
+            router.on_success(endpoint)
+        stream = response.stream
+        if not isinstance(stream, httpx.AsyncByteStream):
+            router.release(endpoint)
+            return response
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(stream, lambda: router.release(endpoint)),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
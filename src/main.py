@@ -0,0 +1,114 @@
+"""Command line entry point dispatching to the example scenarios.
+
+Usage::
+
+    python -m src.main basis
+    python -m src.main tools
+    python -m src.main agent [--stream] [--no-render-graph]
+    python -m src.main chatbot [--stream] [--no-render-graph]
+    python -m src.main batch prompts.jsonl results.jsonl [--concurrency N]
+
+Only the standard library and ``src.envvar`` are imported at startup; the
+scenario module (and with it LangChain, LangGraph and the OpenAI client)
+is imported by the selected subcommand. The settings are validated
+before that, so a bad ``.env`` fails in milliseconds with every problem
+listed at once.
+"""
+
+import argparse
+import importlib
+import json
+import sys
+from pathlib import Path
+from typing import Any, Sequence
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+# pylint: disable=wrong-import-position
+from src.envvar import SettingsError, get_settings
+
+# Subcommand -> (module, help, accepts --stream/--no-render-graph).
+SCENARIOS: dict[str, tuple[str, str, bool]] = {
+    "basis": ("src.main_1_basis", "single chat completion", False),
+    "tools": ("src.main_2_tools", "chat completion with bound tools", False),
+    "agent": ("src.main_3_agent", "ReAct agent with a checkpointer", True),
+    "chatbot": ("src.main_4_chatbot", "chatbot with summarization", True),
+}
+BATCH_MODULE = "src.main_5_batch"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser with one subcommand per scenario."""
+    parser = argparse.ArgumentParser(
+        prog="langgraph-experiments",
+        description="Run the LangGraph example scenarios.",
+    )
+    subparsers = parser.add_subparsers(dest="scenario", required=True)
+    for name, (_, help_text, graph_options) in SCENARIOS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        if graph_options:
+            subparser.add_argument(
+                "--stream", action="store_true",
+                help="print tokens and tool calls as they are produced")
+            subparser.add_argument(
+                "--no-render-graph", action="store_true",
+                help="skip the background graph rendering")
+
+    batch = subparsers.add_parser(
+        "batch", help="resumable batch inference over a JSONL file of prompts")
+    batch.add_argument("input", type=Path, help="JSONL with one {id, prompt} per line")
+    batch.add_argument(
+        "output", type=Path,
+        help="JSONL results; completed ids in it are skipped when resuming")
+    batch.add_argument(
+        "--concurrency", type=positive_int, default=16,
+        help="requests in flight at once (default: 16)")
+    return parser
+
+
+def positive_int(value: str) -> int:
+    """Parse a strictly positive integer argument."""
+    number = int(value)
+    if number < 1:
+        msg = f"expected a positive integer, got {value}"
+        raise argparse.ArgumentTypeError(msg)
+    return number
+
+
+def run_scenario(args: argparse.Namespace) -> None:
+    """Import the selected scenario module and run its ``main`` coroutine."""
+    import asyncio  # pylint: disable=import-outside-toplevel
+
+    if args.scenario == "batch":
+        module = importlib.import_module(BATCH_MODULE)
+        stats = asyncio.run(module.main_batch(
+            args.input, args.output, concurrency=args.concurrency))
+        print(json.dumps(stats.as_dict()))
+        return
+
+    module_name, _, graph_options = SCENARIOS[args.scenario]
+    module = importlib.import_module(module_name)
+    kwargs: dict[str, Any] = {}
+    if graph_options:
+        kwargs = {
+            "render": False if args.no_render_graph else None,
+            "stream": args.stream,
+        }
+    asyncio.run(module.main(**kwargs))
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Parse ``argv``, validate the settings and run the chosen scenario."""
+    args = build_parser().parse_args(argv)
+    try:
+        get_settings().require_llm()
+    except SettingsError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    run_scenario(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,25 +6,25 @@ import sys
 from pathlib import Path
 
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
-from prettyprinter import pprint
 
-from src.helpers import get_chat_kargs
+from src.helpers import create_chat_model
+from src.httpclient import get_http_client_pool
 
 
 async def main() -> None:
     """Entry point of the program. Obtains an OAuth token and runs a sample chat."""
+    from prettyprinter import pprint  # pylint: disable=import-outside-toplevel
 
-    chat_kwargs = await get_chat_kargs()
-    chat = ChatOpenAI(**chat_kwargs)
+    async with get_http_client_pool():
+        chat = create_chat_model()
 
-    message = await chat.ainvoke(
-        [
-            HumanMessage(content="que dia é hoje exatamente?"),
-        ]
-    )
+        message = await chat.ainvoke(
+            [
+                HumanMessage(content="que dia é hoje exatamente?"),
+            ]
+        )
 
-    pprint(message.content)
+        pprint(message.content)
 
 
 if __package__ in (None, ""):
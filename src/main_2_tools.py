@@ -7,10 +7,9 @@ from datetime import datetime
 from pathlib import Path
 
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
-from prettyprinter import pprint
 
-from src.helpers import get_chat_kargs
+from src.helpers import create_chat_model
+from src.httpclient import get_http_client_pool
 
 
 def agora() -> datetime:
@@ -20,20 +19,20 @@ def agora() -> datetime:
 
 async def main() -> None:
     """Entry point of the program. Obtains an OAuth token and runs a sample chat."""
+    from prettyprinter import pprint  # pylint: disable=import-outside-toplevel
 
-    tools = [agora]
+    async with get_http_client_pool():
+        tools = [agora]
 
-    chat_kwargs = await get_chat_kargs()
-    chat = ChatOpenAI(**chat_kwargs)
-    chat = chat.bind_tools(tools)
+        chat = create_chat_model().bind_tools(tools)
 
-    message = await chat.ainvoke(
-        [
-            HumanMessage(content="que dia é hoje exatamente?"),
-        ]
-    )
+        message = await chat.ainvoke(
+            [
+                HumanMessage(content="que dia é hoje exatamente?"),
+            ]
+        )
 
-    pprint(message.additional_kwargs.get("tool_calls", []))
+        pprint(message.additional_kwargs.get("tool_calls", []))
 
 
 if __package__ in (None, ""):
@@ -8,13 +8,20 @@ from pathlib import Path
 from typing import cast
 
 from langchain_core.messages import AnyMessage, HumanMessage
+from langchain_core.runnables import Runnable
 from langchain_core.runnables.config import RunnableConfig
-from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import START, MessagesState, StateGraph
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.prebuilt import tools_condition
 
-from src.helpers import get_chat_kargs, render_graph
+from src.helpers import (CheckpointerConfig, create_chat_model,
+                         create_tool_node, drain_background_renders,
+                         instrument_checkpointer, instrumented_config,
+                         open_checkpointer, schedule_render_graph,
+                         stream_graph_turn)
+from src.httpclient import get_http_client_pool
+from src.metrics import export_metrics
 
 
 async def tool_agora() -> datetime:
@@ -22,14 +29,19 @@ async def tool_agora() -> datetime:
     return datetime.now()
 
 
-async def main() -> None:
-    """Entry point of the program. Obtains an OAuth token and runs a sample chat."""
+def build_agent_graph(
+    chat: Runnable,
+    tools: list,
+    *,
+    checkpointer: BaseCheckpointSaver | None = None,
+) -> CompiledStateGraph:
+    """Build and compile the ReAct agent graph (chat <-> tools).
 
-    # tools = []
-    tools = [tool_agora]
-
-    chat_kwargs = await get_chat_kargs()
-    chat = ChatOpenAI(**chat_kwargs).bind_tools(tools)
+    Args:
+        chat: Chat model (already bound to ``tools``).
+        tools: Tools executed by the ``tools`` node.
+        checkpointer: Optional checkpointer for per-thread state.
+    """
 
     # def assistant(state: MessagesState):
     #     return {"messages": [chat.invoke(state["messages"])]}
@@ -50,7 +62,7 @@ async def main() -> None:
 
     graph = StateGraph(MessagesState)
     graph.add_node(node_chat_name, invoke_chat)
-    graph.add_node(node_tool_name, ToolNode(tools))
+    graph.add_node(node_tool_name, create_tool_node(tools))
     graph.add_edge(START, node_chat_name)
     graph.add_conditional_edges(
         node_chat_name,
@@ -58,24 +70,56 @@ async def main() -> None:
     )
     graph.add_edge(node_tool_name, node_chat_name)
 
-    memory = MemorySaver()
-    react_graph = graph.compile(checkpointer=memory)
-    compiled_graph = react_graph.get_graph(xray=True)
-    await render_graph(compiled_graph)
+    return graph.compile(checkpointer=checkpointer)
+
+
+async def main(*, render: bool | None = None, stream: bool = False) -> None:
+    """Entry point of the program. Obtains an OAuth token and runs a sample chat.
+
+    Args:
+        render: Habilita/desabilita a renderização do grafo em segundo
+            plano; por padrão segue a variável ``GRAPH_RENDER``.
+        stream: Exibe os tokens e as chamadas de ferramenta à medida que
+            são produzidos, com o tempo até o primeiro token.
+    """
+
+    async with (
+        get_http_client_pool(),
+        open_checkpointer(CheckpointerConfig.from_env()) as memory,
+    ):
+        # tools = []
+        tools = [tool_agora]
+
+        chat = create_chat_model().bind_tools(tools)
+
+        react_graph = build_agent_graph(
+            chat, tools, checkpointer=instrument_checkpointer(memory))
+        compiled_graph = react_graph.get_graph(xray=True)
+        schedule_render_graph(compiled_graph, enabled=render)
+
+        message = HumanMessage(
+            content="Que dia é hoje e quando será o próximo domingo?")
+        state = MessagesState(messages=[message])
+        config = instrumented_config(
+            RunnableConfig(configurable={"thread_id": "1"}))
 
-    message = HumanMessage(
-        content="Que dia é hoje e quando será o próximo domingo?")
-    state = MessagesState(messages=[message])
-    config = RunnableConfig(configurable={"thread_id": "1"})
+        if stream:
+            await stream_graph_turn(react_graph, state, config)
+        else:
+            result = await react_graph.ainvoke(state, config=config)
 
-    result = await react_graph.ainvoke(state, config=config)
+            for m in result["messages"]:
+                m.pretty_print()
 
-    for m in result["messages"]:
-        m.pretty_print()
+        await drain_background_renders()
+        export_metrics()
 
 
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(
+        render=False if "--no-render-graph" in sys.argv else None,
+        stream="--stream" in sys.argv,
+    ))
@@ -2,23 +2,31 @@
 
 import asyncio
 import sys
-from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from typing import Literal, cast
 
-from langchain.tools import tool
 from langchain_core.messages import (AnyMessage, HumanMessage, RemoveMessage,
-                                     SystemMessage, ToolMessage)
+                                     ToolMessage)
+from langchain_core.runnables import Runnable
 from langchain_core.runnables.config import RunnableConfig
-from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
-from langgraph.graph import END, START, MessagesState, StateGraph
-from langgraph.prebuilt import ToolNode, tools_condition
-from pydantic import BaseModel
-
-from src.helpers import get_chat_kargs, render_graph
+from langchain_core.tools import tool
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import START, MessagesState, StateGraph
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.prebuilt import tools_condition
+
+from src.envvar import get_settings
+from src.helpers import (BackgroundSummarizer, CheckpointerConfig,
+                         CheckpointRetention, LongTermMemory,
+                         LongTermMemoryConfig, SummarizationPolicy,
+                         SummaryResult, assemble_prompt, create_chat_model,
+                         create_long_term_memory, create_tool_node,
+                         drain_background_renders, instrument_checkpointer,
+                         instrumented_config, open_checkpointer,
+                         schedule_render_graph, stream_graph_turn)
+from src.httpclient import get_http_client_pool
+from src.metrics import export_metrics
 
 
 class CustomState(MessagesState):
@@ -27,8 +35,16 @@ class CustomState(MessagesState):
 
     Attributes:
         summary (str): A textual summary of the current state.
+        summary_watermark (str): Id of the last message already covered by
+            ``summary``; only later messages are sent to be summarized.
+        memories (list[str]): Long-term memories retrieved for the turn.
+        memory_watermark (str): Id of the last message already stored in
+            the long-term memory.
     """
     summary: str | None
+    summary_watermark: str | None
+    memories: list[str]
+    memory_watermark: str | None
 
 
 @tool("now")
@@ -37,194 +53,337 @@ async def now_tool() -> datetime:
     return datetime.now()
 
 
-async def main() -> None:
-    """Entry point of the program. Obtains an OAuth token and runs a sample chat."""
-
-    db_path = "db/example.db"
-    db_file = Path(db_path)
-    db_file.parent.mkdir(parents=True, exist_ok=True)
-
-    # !mkdir -p db && [ ! -f db/example.db ] && wget -P db https://github.com/langchain-ai/langchain-academy/raw/main/module-2/state_db/example.db
-
-    # tools = []
-    tools = [now_tool]
-    memory = MemorySaver()
-
-    async with AsyncSqliteSaver.from_conn_string(str(db_file)) as memory2:
-        chat_kwargs = await get_chat_kargs()
-        chat = ChatOpenAI(**chat_kwargs).bind_tools(tools)
-
-        node_prepare_name = "prepare"
-        node_chat_name = "chat"
-        node_tool_name = "tools"
-        node_summarize_name = "summarize_conversation"
-
-        async def prepare(state: CustomState) -> CustomState:
-            """Prepare the state before processing."""
-            # Here you can add any preparation logic if needed
-            return state
-
-        # def assistant(state: MessagesState):
-        #     return {"messages": [chat.invoke(state["messages"])]}
+SummaryMode = Literal["inline", "background"]
 
-        # prompt = SystemMessage(
-        #     content=(
-        #         "Você é um assistente que responde apenas 'sim' ou 'não', "
-        #         "mas sempre explica utilizando o contexto fornecido."
-        #     )
-        # )
+# Keep this text byte-stable (no dates or ids): it is the start of every
+# prompt and therefore the prefix reused by the backend KV cache.
+SYSTEM_PROMPT = (
+    "Você é um assistente de conversação prestativo. Responda no idioma do "
+    "usuário e use a ferramenta 'now' quando precisar da data ou hora atuais."
+)
 
-        async def invoke_chat(state: CustomState) -> CustomState:
-            summary = state.get("summary", "")
+CHAT_TURNS = (
+    "Quem é o presidente?",
+    "Eu sou Cleverson",
+    "Quero saber quem é o presidente do Brasil",
+    "Quantos anos ele tem?",
+    "Que dia é hoje?",
+    "Qual o sobrenome dele?",
+    "Qual o nome real dele?",
+)
 
-            # If there is summary, then we add it
-            if summary:
-                # Add summary to system message
-                system_message = f"Summary of conversation earlier: {summary}"
 
-                # Append summary to any newer messages
-                messages = [SystemMessage(
-                    content=system_message)] + state["messages"]
+def summary_mode_from_env() -> SummaryMode:
+    """Return the summarization mode configured in ``SUMMARY_MODE``."""
+    return cast(SummaryMode, get_settings().summary.mode or "inline")
 
-            else:
-                messages = state["messages"]
 
-            response = cast(AnyMessage, await chat.ainvoke(messages))
-            return CustomState(messages=[response], summary="")
+def index_after(messages: list[AnyMessage], watermark: str | None) -> int:
+    """Return the index of the first message after the ``watermark`` id.
 
-        async def summarize_conversation(state: CustomState) -> CustomState:
-            # return state
-
-            summary = state.get("summary", "")
-
-            # Create our summarization prompt
-            if summary:
+    The search walks backwards from the newest message, so it only visits
+    the messages added since the watermark was set. When the watermark is
+    not in the list (never set, or the watermark message was removed
+    together with the older ones) every message is new.
+    """
+    if watermark is not None:
+        for index in range(len(messages) - 1, -1, -1):
+            if messages[index].id == watermark:
+                return index + 1
+    return 0
+
+
+async def summarize_messages(
+    chat: Runnable,
+    messages: list[AnyMessage],
+    summary: str | None,
+) -> str:
+    """Create or extend the conversation summary with ``messages``.
+
+    ``messages`` must hold only what ``summary`` does not cover yet, so the
+    prompt size depends on the new messages instead of the whole history.
+    """
 
-                # A summary already exists
-                summary_message = (
-                    f"This is summary of the conversation to date: {summary}\n\n"
-                    "Extend the summary by taking into account the new messages above:"
+    # Filtra, em uma única passada, as ToolMessage e as mensagens sem content
+    messages = [m for m in messages
+                if m.content and not isinstance(m, ToolMessage)]
+    if not messages:
+        return summary or ""
+
+    # Create our summarization prompt
+    if summary:
+
+        # A summary already exists
+        summary_message = (
+            f"This is summary of the conversation to date: {summary}\n\n"
+            "Extend the summary by taking into account the new messages above:"
+        )
+
+    else:
+        summary_message = "Create a summary of the conversation above:"
+
+    # Add prompt to our history
+    messages.append(HumanMessage(content=summary_message))
+
+    response = await chat.ainvoke(messages)
+    return str(response.content)
+
+
+def build_chatbot_graph(
+    chat: Runnable,
+    tools: list,
+    *,
+    checkpointer: BaseCheckpointSaver | None = None,
+    summarization_policy: SummarizationPolicy | None = None,
+    summary_mode: SummaryMode = "inline",
+    background_summarizer: BackgroundSummarizer | None = None,
+    long_term_memory: LongTermMemory | None = None,
+) -> CompiledStateGraph:
+    """Build and compile the chatbot graph.
+
+    Args:
+        chat: Chat model (already bound to ``tools``).
+        tools: Tools executed by the ``tools`` node.
+        checkpointer: Checkpointer used to persist the threads.
+        summarization_policy: Token budget that triggers summarization.
+        summary_mode: ``inline`` runs the ``summarize_conversation`` node
+            before answering; ``background`` answers immediately and merges
+            the summary produced in background on the next turn.
+        background_summarizer: Registry of background summarizations (only
+            used in ``background`` mode).
+        long_term_memory: Vector memory; when given, a ``recall`` node
+            stores the new messages and retrieves the memories relevant to
+            the latest question at the start of every turn. Memories are
+            kept per ``user_id`` (``configurable``), defaulting to the
+            ``thread_id``.
+    """
+    policy = summarization_policy or SummarizationPolicy()
+    summarizer = background_summarizer or BackgroundSummarizer()
+
+    node_recall_name = "recall"
+    node_prepare_name = "prepare"
+    node_chat_name = "chat"
+    node_tool_name = "tools"
+    node_summarize_name = "summarize_conversation"
+
+    async def prepare(state: CustomState) -> CustomState:
+        """Prepare the state before processing."""
+        # Here you can add any preparation logic if needed
+        return state
+
+    async def prepare_with_background_summary(
+        state: CustomState, config: RunnableConfig
+    ) -> CustomState:
+        """Merge a finished background summary and start a new one if needed."""
+        thread_id = str(config["configurable"]["thread_id"])
+        messages = state["messages"]
+        summary = state.get("summary")
+        watermark = state.get("summary_watermark")
+        update = CustomState(messages=[])
+
+        # Apply the summary produced in background since the last turn
+        result = summarizer.pop_result(thread_id)
+        if result is not None:
+            removed = set(result.removed_ids)
+            update["messages"] = [RemoveMessage(id=i) for i in result.removed_ids]
+            update["summary"] = summary = result.summary
+            if result.watermark is not None:
+                update["summary_watermark"] = watermark = result.watermark
+            messages = [m for m in messages if m.id not in removed]
+
+        # Summarize older messages off the critical path
+        if policy.should_summarize(messages, summary):
+            split = policy.split_index(messages)
+            start = index_after(messages, watermark)
+            old_messages = messages[:split]
+            new_messages = messages[min(start, split):split]
+
+            async def summarize() -> SummaryResult:
+                return SummaryResult(
+                    summary=await summarize_messages(chat, new_messages, summary),
+                    removed_ids=tuple(
+                        str(m.id) for m in old_messages if m.id is not None),
+                    watermark=new_messages[-1].id if new_messages else None,
                 )
 
-            else:
-                summary_message = "Create a summary of the conversation above:"
-
-            # Filtra as mensagens retirando as que são do tipo ToolMessage
-            messages = [m for m in state["messages"]
-                        if not isinstance(m, ToolMessage)]
-
-            # Filtra as mensagens retirando as que não possuem content
-            messages = [m for m in messages if m.content]
-
-            # Add prompt to our history
-            messages = messages + \
-                [HumanMessage(content=summary_message)]
-
-            response = await chat.ainvoke(messages)
-
-            # Remove todas menos as duas últimas mensagens
-            remove_messages = [
-                RemoveMessage(id=str(m.id))
-                for m in state["messages"][:-4]
-                if getattr(m, "id", None) is not None
-            ]
-
-            return CustomState(messages=cast(
-                list[AnyMessage],
-                remove_messages),
-                summary=str(response.content))
-
-        # Determine whether to end or summarize the conversation
-        async def summarize_condition(state: CustomState) -> Literal["summarize_conversation", "chat"]:
-            """Return the next node to execute."""
-
-            messages = state["messages"]
-
-            # If there are more than three messages, then we summarize the conversation
-            if len(messages) > 6:
-                return node_summarize_name
-
-            # Otherwise we can just end
-            return node_chat_name
-
-        graph = StateGraph(CustomState)
+            summarizer.submit(thread_id, summarize)
+
+        return update
+
+    async def recall(state: CustomState, config: RunnableConfig) -> CustomState:
+        """Store the new messages in long-term memory and retrieve the relevant ones."""
+        memory = cast(LongTermMemory, long_term_memory)
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        user_id = str(configurable.get("user_id") or thread_id)
+        messages = state["messages"]
+
+        start = index_after(messages, state.get("memory_watermark"))
+        await memory.aadd(user_id, messages[start:], thread_id=thread_id)
+
+        # Messages still in the state are already part of the prompt
+        query = next(
+            (m.text() for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        hits = await memory.asearch(
+            user_id, query, exclude_ids={str(m.id) for m in messages if m.id})
+
+        return CustomState(
+            messages=[],
+            memories=[f"{hit.role}: {hit.text}" for hit in hits],
+            memory_watermark=messages[-1].id if messages else None)
+
+    # def assistant(state: MessagesState):
+    #     return {"messages": [chat.invoke(state["messages"])]}
+
+    # prompt = SystemMessage(
+    #     content=(
+    #         "Você é um assistente que responde apenas 'sim' ou 'não', "
+    #         "mas sempre explica utilizando o contexto fornecido."
+    #     )
+    # )
+
+    async def invoke_chat(state: CustomState) -> CustomState:
+        # The fixed system prompt comes first and the summary after it, so
+        # extending the summary does not invalidate the backend prefix cache
+        messages = assemble_prompt(
+            state["messages"],
+            system_prompt=SYSTEM_PROMPT,
+            summary=state.get("summary"),
+            memories=state.get("memories") or (),
+        )
+
+        response = cast(AnyMessage, await chat.ainvoke(messages))
+
+        # The summary is kept in the state so later turns can extend it
+        return CustomState(messages=[response])
+
+    async def summarize_conversation(state: CustomState) -> CustomState:
+        messages = state["messages"]
+
+        # Only the messages after the watermark are not in the summary yet
+        start = index_after(messages, state.get("summary_watermark"))
+        summary = await summarize_messages(
+            chat, messages[start:], state.get("summary"))
+
+        # Remove as mensagens antigas, mantendo as recentes que cabem na
+        # marca baixa do orçamento de tokens
+        split = policy.split_index(messages)
+        remove_messages = [
+            RemoveMessage(id=str(m.id))
+            for m in messages[:split]
+            if getattr(m, "id", None) is not None
+        ]
+
+        return CustomState(messages=cast(
+            list[AnyMessage],
+            remove_messages),
+            summary=summary,
+            summary_watermark=messages[-1].id if messages else None)
+
+    # Determine whether to end or summarize the conversation
+    async def summarize_condition(state: CustomState) -> Literal["summarize_conversation", "chat"]:
+        """Return the next node to execute."""
+
+        # Summarize only when the estimated prompt crosses the high watermark
+        if policy.should_summarize(state["messages"], state.get("summary")):
+            return node_summarize_name
+
+        # Otherwise we can just end
+        return node_chat_name
+
+    graph = StateGraph(CustomState)
+
+    graph.add_node(node_chat_name, invoke_chat)
+    graph.add_node(node_tool_name, create_tool_node(tools))
+    if long_term_memory is not None:
+        graph.add_node(node_recall_name, recall)
+        graph.add_edge(START, node_recall_name)
+        graph.add_edge(node_recall_name, node_prepare_name)
+    else:
+        graph.add_edge(START, node_prepare_name)
 
+    if summary_mode == "background":
+        graph.add_node(node_prepare_name, prepare_with_background_summary)
+        graph.add_edge(node_prepare_name, node_chat_name)
+    else:
         graph.add_node(node_prepare_name, prepare)
-        graph.add_node(node_chat_name, invoke_chat)
-        graph.add_node(node_tool_name, ToolNode(tools))
         graph.add_node(node_summarize_name, summarize_conversation)
-
-        graph.add_edge(START, node_prepare_name)
-
         graph.add_conditional_edges(node_prepare_name, summarize_condition)
-        graph.add_conditional_edges(node_chat_name, tools_condition)
-
-        graph.add_edge(node_tool_name, node_prepare_name)
         graph.add_edge(node_summarize_name, node_chat_name)
-        # graph.add_edge(node_chat_name, END)
-
-        react_graph = graph.compile(checkpointer=memory)
-        compiled_graph = react_graph.get_graph(xray=True)
-        await render_graph(compiled_graph)
-
-        # state = CustomState(messages=[message], summary="")
-        config = RunnableConfig(configurable={"thread_id": "1"})
 
-        print("\n\n---\n")
+    graph.add_conditional_edges(node_chat_name, tools_condition)
+    graph.add_edge(node_tool_name, node_prepare_name)
+    # graph.add_edge(node_chat_name, END)
 
-        input_message = HumanMessage(content="Quem é o presidente?")
-        output = await react_graph.ainvoke(CustomState(messages=[input_message], summary=None), config=config)
-        for m in output['messages']:
-            m.pretty_print()
+    return graph.compile(checkpointer=checkpointer)
 
-        print("\n\n---\n")
 
-        message = HumanMessage(content="Eu sou Cleverson")
-        output = await react_graph.ainvoke(CustomState(messages=[message], summary=None), config=config)
-        for m in output['messages']:
-            m.pretty_print()
+async def main(*, render: bool | None = None, stream: bool = False) -> None:
+    """Entry point of the program. Obtains an OAuth token and runs a sample chat.
 
-        print("\n\n---\n")
-
-        message = HumanMessage(
-            content="Quero saber quem é o presidente do Brasil")
-        output = await react_graph.ainvoke(CustomState(messages=[message], summary=None), config=config)
-        for m in output['messages']:
-            m.pretty_print()
-
-        print("\n\n---\n")
+    Args:
+        render: Habilita/desabilita a renderização do grafo em segundo
+            plano; por padrão segue a variável ``GRAPH_RENDER``.
+        stream: Exibe os tokens e as chamadas de ferramenta à medida que
+            são produzidos, com o tempo até o primeiro token.
+    """
 
-        message = HumanMessage(content="Quantos anos ele tem?")
-        output = await react_graph.ainvoke(CustomState(messages=[message], summary=None), config=config)
-        for m in output['messages']:
-            m.pretty_print()
+    # !mkdir -p db && [ ! -f db/example.db ] && wget -P db https://github.com/langchain-ai/langchain-academy/raw/main/module-2/state_db/example.db
 
-        print("\n\n---\n")
+    # tools = []
+    tools = [now_tool]
+    summarizer = BackgroundSummarizer()
+    long_term_memory = create_long_term_memory(
+        LongTermMemoryConfig.from_env(default_backend="disk"))
+
+    async with (
+        get_http_client_pool(),
+        open_checkpointer(
+            CheckpointerConfig.from_env(default_kind="sqlite")) as memory,
+        CheckpointRetention(memory) as retention,
+    ):
+        chat = create_chat_model().bind_tools(tools)
+
+        react_graph = build_chatbot_graph(
+            chat,
+            tools,
+            checkpointer=instrument_checkpointer(memory),
+            summarization_policy=SummarizationPolicy.from_env(),
+            summary_mode=summary_mode_from_env(),
+            background_summarizer=summarizer,
+            long_term_memory=long_term_memory,
+        )
+        compiled_graph = react_graph.get_graph(xray=True)
+        schedule_render_graph(compiled_graph, enabled=render)
 
-        message = HumanMessage(content="Que dia é hoje?")
-        output = await react_graph.ainvoke(CustomState(messages=[message], summary=None), config=config)
-        for m in output['messages']:
-            m.pretty_print()
+        # state = CustomState(messages=[message], summary="")
+        config = instrumented_config(
+            RunnableConfig(configurable={"thread_id": "1"}))
 
-        print("\n\n---\n")
+        for content in CHAT_TURNS:
+            print("\n\n---\n")
 
-        message = HumanMessage(content="Qual o sobrenome dele?")
-        output = await react_graph.ainvoke(CustomState(messages=[message], summary=None), config=config)
-        # for m in output['messages'][-1:]:
-        for m in output['messages']:
-            m.pretty_print()
+            turn_input = CustomState(messages=[HumanMessage(content=content)])
+            if stream:
+                await stream_graph_turn(
+                    react_graph, turn_input, config, token_nodes={"chat"})
+                continue
 
-        print("\n\n---\n")
+            output = await react_graph.ainvoke(turn_input, config=config)
+            for m in output['messages']:
+                m.pretty_print()
 
-        message = HumanMessage(content="Qual o nome real dele?")
-        output = await react_graph.ainvoke(CustomState(messages=[message], summary=None), config=config)
-        # for m in output['messages'][-1:]:
-        for m in output['messages']:
-            m.pretty_print()
+        await summarizer.drain(timeout=5.0)
+        await drain_background_renders()
+        await retention.prune(config["configurable"]["thread_id"])
+        export_metrics()
 
 
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(
+        render=False if "--no-render-graph" in sys.argv else None,
+        stream="--stream" in sys.argv,
+    ))
@@ -0,0 +1,45 @@
+"""Resumable batch inference entry point (``python -m src.main batch``).
+
+Kept apart from ``main_1_basis`` so the single-request scenario does not
+import the batch stack.
+"""
+
+import sys
+from pathlib import Path
+
+from src.helpers import create_chat_model
+from src.helpers.batch_inference import (DEFAULT_CONCURRENCY, BatchStats,
+                                         read_requests, run_batch)
+from src.httpclient import get_http_client_pool
+
+
+def print_batch_progress(stats: BatchStats) -> None:
+    """Print the batch counters and sustained rates on a single line."""
+    print(
+        f"{stats.completed} done ({stats.failed} failed, {stats.skipped} skipped)"
+        f"  {stats.requests_per_sec:.2f} req/s"
+        f"  {stats.tokens_per_sec:.1f} tok/s"
+        f"  {stats.seconds:.0f}s",
+        file=sys.stderr,
+    )
+
+
+async def main_batch(
+    input_path: Path,
+    output_path: Path,
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> BatchStats:
+    """Run every prompt of ``input_path`` and append the results to ``output_path``.
+
+    Uses the same chat model as ``main_1_basis``; rerunning with the same
+    output resumes the batch, skipping the ids already completed.
+    """
+    async with get_http_client_pool():
+        return await run_batch(
+            create_chat_model(),
+            read_requests(input_path),
+            output_path,
+            concurrency=concurrency,
+            progress=print_batch_progress,
+        )
@@ -0,0 +1,5 @@
+"""Barrel exports for the in-process metrics registry."""
+
+from .registry import (LATENCY_BUCKETS, TOKEN_BUCKETS, Histogram,
+                       MetricsRegistry, export_metrics, get_metrics_registry,
+                       metrics_enabled)
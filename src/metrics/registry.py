@@ -0,0 +1,258 @@
+"""Registro de histogramas em processo, exportável em Prometheus ou JSON.
+
+Os histogramas usam baldes cumulativos fixos (como no Prometheus) e
+rótulos livres. O registro padrão do processo só coleta quando habilitado
+(``METRICS=on``); desabilitado, cada ponto de instrumentação custa apenas
+a leitura de ``registry.enabled``.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Sequence
+
+from src.envvar import get_settings
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+TOKEN_BUCKETS = (
+    16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768,
+)
+
+DEFAULT_METRICS_EXPORT = "artifacts/metrics.prom"
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+class _Series:
+    """Contagens por balde, soma e total de uma combinação de rótulos."""
+
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self, size: int) -> None:
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Histograma com rótulos.
+
+    Args:
+        name: Nome da métrica (convenção Prometheus, com unidade no sufixo).
+        description: Texto de ajuda exportado em ``# HELP``.
+        buckets: Limites superiores dos baldes, em ordem crescente.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        if list(buckets) != sorted(buckets):
+            msg = f"Buckets of '{name}' must be sorted."
+            raise ValueError(msg)
+
+        self.name = name
+        self.description = description
+        self.buckets = tuple(float(b) for b in buckets)
+        self._series: dict[LabelKey, _Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Registra uma observação."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets) + 1)
+            series.buckets[index] += 1
+            series.sum += value
+            series.count += 1
+
+    def total(self, **labels: str) -> tuple[int, float]:
+        """Retorna ``(count, sum)`` das séries que contêm os ``labels``."""
+        wanted = {(k, str(v)) for k, v in labels.items()}
+        count, total = 0, 0.0
+        with self._lock:
+            for key, series in self._series.items():
+                if wanted <= set(key):
+                    count += series.count
+                    total += series.sum
+        return count, total
+
+    def quantile(self, fraction: float, **labels: str) -> float:
+        """Estima um quantil pela interpolação linear dentro do balde."""
+        wanted = {(k, str(v)) for k, v in labels.items()}
+        counts = [0] * (len(self.buckets) + 1)
+        with self._lock:
+            for key, series in self._series.items():
+                if wanted <= set(key):
+                    counts = [a + b for a, b in zip(counts, series.buckets)]
+
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = fraction * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index == len(self.buckets):
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        """Retorna as séries como dicionários serializáveis."""
+        with self._lock:
+            items = [
+                (key, list(s.buckets), s.sum, s.count)
+                for key, s in self._series.items()
+            ]
+
+        result = []
+        for key, buckets, total, count in sorted(items):
+            cumulative, running = {}, 0
+            for bound, bucket in zip((*self.buckets, math.inf), buckets):
+                running += bucket
+                cumulative["+Inf" if bound == math.inf else _format(bound)] = running
+            result.append({
+                "labels": dict(key),
+                "count": count,
+                "sum": total,
+                "buckets": cumulative,
+            })
+        return result
+
+    def reset(self) -> None:
+        """Descarta todas as observações."""
+        with self._lock:
+            self._series.clear()
+
+
+def _format(value: float) -> str:
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(labels: dict[str, str], **extra: str) -> str:
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items.items()) + "}"
+
+
+class MetricsRegistry:
+    """Conjunto de histogramas nomeados.
+
+    Args:
+        enabled: Se ``False``, os pontos de instrumentação não registram nada.
+    """
+
+    def __init__(self, *, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._histograms: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(
+        self,
+        name: str,
+        description: str = "",
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Retorna o histograma ``name``, criando-o na primeira chamada."""
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    histogram = Histogram(name, description, buckets)
+                    self._histograms[name] = histogram
+        return histogram
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Registra ``value`` em ``name``, se o registro estiver habilitado."""
+        if self.enabled:
+            self.histogram(name).observe(value, **labels)
+
+    def to_prometheus(self) -> str:
+        """Exporta no formato de texto do Prometheus (versão 0.0.4)."""
+        lines: list[str] = []
+        for name, histogram in sorted(self._histograms.items()):
+            if histogram.description:
+                lines.append(f"# HELP {name} {histogram.description}")
+            lines.append(f"# TYPE {name} histogram")
+            for series in histogram.snapshot():
+                labels = series["labels"]
+                for bound, count in series["buckets"].items():
+                    lines.append(
+                        f"{name}_bucket{_labels_text(labels, le=bound)} {count}")
+                lines.append(f"{name}_sum{_labels_text(labels)} {series['sum']!r}")
+                lines.append(f"{name}_count{_labels_text(labels)} {series['count']}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def to_json(self) -> dict[str, Any]:
+        """Exporta como dicionário serializável em JSON."""
+        return {
+            name: {
+                "description": histogram.description,
+                "series": histogram.snapshot(),
+            }
+            for name, histogram in sorted(self._histograms.items())
+        }
+
+    def export(self, path: str | Path) -> Path:
+        """Grava o registro em ``path`` (JSON se terminar em ``.json``)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == ".json":
+            path.write_text(json.dumps(self.to_json(), indent=2), encoding="utf-8")
+        else:
+            path.write_text(self.to_prometheus(), encoding="utf-8")
+        return path
+
+    def reset(self) -> None:
+        """Descarta as observações de todos os histogramas."""
+        for histogram in list(self._histograms.values()):
+            histogram.reset()
+
+
+def metrics_enabled() -> bool:
+    """Indica se a coleta de métricas está habilitada (``METRICS``, padrão off)."""
+    return bool(get_settings().metrics.enabled)
+
+
+_DEFAULT_REGISTRY: MetricsRegistry | None = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Retorna o registro padrão do processo (habilitado por ``METRICS``)."""
+    global _DEFAULT_REGISTRY  # instância compartilhada por todo o processo
+    if _DEFAULT_REGISTRY is None:
+        _DEFAULT_REGISTRY = MetricsRegistry(enabled=metrics_enabled())
+    return _DEFAULT_REGISTRY
+
+
+def export_metrics(registry: MetricsRegistry | None = None) -> Path | None:
+    """Grava o registro no caminho de ``METRICS_EXPORT``, se habilitado.
+
+    O formato segue a extensão (``.json`` ou texto do Prometheus).
+    """
+    registry = registry or get_metrics_registry()
+    if not registry.enabled:
+        return None
+    return registry.export(get_settings().metrics.export_path or DEFAULT_METRICS_EXPORT)
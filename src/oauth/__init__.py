@@ -2,3 +2,8 @@
 
 from .oauth2_client_config import OAuth2ClientConfig
 from .oauth2_client_helper import get_oauth2_http_client, get_oauth2_token
+from .token_cache import (CachedToken, FileTokenCache, InMemoryTokenCache,
+                          SqliteTokenCache, TokenCache, TokenCipher,
+                          token_cache_from_env)
+from .token_manager import (OAuth2TokenManager, TokenManagerStats,
+                            get_token_manager)
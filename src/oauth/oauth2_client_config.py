@@ -8,7 +8,8 @@ tempo limite para requisições.
 import os
 from dataclasses import dataclass
 
-from src.envvar import get_env
+from src.envvar import (SettingsError, configured, ensure_env_loaded,
+                        get_settings, load_settings)
 
 DEFAULT_AUTH_TIMEOUT = 300
 
@@ -24,12 +25,16 @@ class OAuth2ClientConfig:  # pylint: disable=too-few-public-methods
         client_id (str): Identificador do cliente fornecido pelo provedor OAuth2.
         client_secret (str): Segredo do cliente fornecido pelo provedor OAuth2.
     auth_timeout (int, opcional): Tempo limite em segundos para obtenção do token OAuth2. Padrão é 300.
+        verify (bool | None): Valida o certificado TLS do provedor; ``None``
+            segue ``HTTP_VERIFY``. ``False`` usa um transporte só do
+            cliente OAuth2, sem afetar as demais conexões.
     """
     base_url: str | None = None
     auth_url: str
     client_id: str
     client_secret: str
     auth_timeout: int = DEFAULT_AUTH_TIMEOUT
+    verify: bool | None = None
 
     @staticmethod
     def from_env(
@@ -39,25 +44,43 @@ class OAuth2ClientConfig:  # pylint: disable=too-few-public-methods
         client_secret_var: str = "OAUTH2_CLIENT_SECRET",
         auth_timeout_var: str = "OAUTH2_AUTH_TIMEOUT",
     ) -> "OAuth2ClientConfig":
-        """Cria uma instância usando variáveis de ambiente obrigatórias."""
+        """Cria uma instância a partir das configurações validadas do processo.
 
-        base_url_value = None
-        if base_url_var:
-            base_url_value = os.getenv(base_url_var, "").strip() or None
-
-        # Busca o timeout da envvar, se existir, senão usa o padrão da dataclass
-        env_timeout = os.getenv(auth_timeout_var)
-
-        try:
-            auth_timeout_value = int(
-                env_timeout) if env_timeout is not None else DEFAULT_AUTH_TIMEOUT
-        except ValueError:
-            auth_timeout_value = DEFAULT_AUTH_TIMEOUT
+        Com os nomes padrão, os valores vêm de ``get_settings``. Outros
+        nomes de variável são lidos no lugar dos padrão e validados da mesma
+        forma (``load_settings``); ``base_url_var=None`` ignora a URL base.
 
+        Raises:
+            SettingsError: Se uma credencial faltar ou for inválida.
+        """
+        names = {
+            "SERVICE_BASE_URL": base_url_var,
+            "OAUTH2_TOKEN_URL": auth_url_var,
+            "OAUTH2_CLIENT_ID": client_id_var,
+            "OAUTH2_CLIENT_SECRET": client_secret_var,
+            "OAUTH2_AUTH_TIMEOUT": auth_timeout_var,
+        }
+        if all(name == var for name, var in names.items()):
+            oauth = get_settings().oauth.require()
+        else:
+            ensure_env_loaded()
+            environ = dict(os.environ)
+            for name, var in names.items():
+                environ[name] = os.environ.get(var, "") if var else ""
+            try:
+                oauth = load_settings(environ).oauth.require()
+            except SettingsError as exc:
+                # Os erros citam a variável efetivamente lida.
+                renamed = {f"{name} ": f"{var} " for name, var in names.items() if var}
+                raise SettingsError(
+                    next((error.replace(name, var, 1) for name, var in renamed.items()
+                          if error.startswith(name)), error)
+                    for error in exc.errors) from None
         return OAuth2ClientConfig(
-            base_url=base_url_value,
-            auth_url=get_env(auth_url_var),
-            client_id=get_env(client_id_var),
-            client_secret=get_env(client_secret_var),
-            auth_timeout=auth_timeout_value,
+            base_url=oauth.base_url,
+            auth_url=oauth.token_url,
+            client_id=oauth.client_id,
+            client_secret=oauth.client_secret,
+            verify=oauth.verify,
+            **configured(auth_timeout=oauth.auth_timeout),
         )
@@ -1,17 +1,18 @@
 """Utilitários para cliente OAuth2 assíncrono.
 
-Fornece um gerenciador de contexto para criar e fechar um
-``AsyncOAuth2Client`` e uma camada simples de cache/renovação de
-tokens baseada em expiração.
+Fornece um gerenciador de contexto que entrega o ``AsyncOAuth2Client``
+compartilhado do pool HTTP e funções de acesso ao token, delegando o cache e
+a renovação ao ``OAuth2TokenManager`` do processo.
 """
 
-import time
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator, Callable
 
 from authlib.integrations.httpx_client import AsyncOAuth2Client
 
 from .oauth2_client_config import OAuth2ClientConfig
+from .token_manager import (OAuth2TokenManager, get_pooled_oauth2_client,
+                            get_token_manager)
 
 
 @asynccontextmanager
@@ -19,11 +20,12 @@ async def get_oauth2_http_client(
     config: OAuth2ClientConfig,
     on_new_token: Callable[[], None] | None = None,
 ) -> AsyncGenerator[AsyncOAuth2Client, None]:
-    """Cria e gerencia um ``AsyncOAuth2Client`` autenticado.
+    """Entrega o ``AsyncOAuth2Client`` autenticado do pool do processo.
 
     Obtém e configura automaticamente um token OAuth2 (com cache e
-    renovação) antes de entregar o cliente ao chamador e garante o
-    fechamento do cliente ao final do contexto.
+    renovação) antes de entregar o cliente ao chamador. O cliente é de
+    longa duração e compartilha o pool de conexões HTTP; seu fechamento
+    acontece junto com o ciclo de vida do pool, não ao final do contexto.
 
     Args:
         config: Configurações do cliente OAuth2 (URLs e credenciais).
@@ -33,49 +35,30 @@ async def get_oauth2_http_client(
     Yields:
         AsyncOAuth2Client: Cliente HTTP autenticado via OAuth2.
     """
-    client: AsyncOAuth2Client | None = None
-
-    try:
-        client_kwargs = {
-            "client_id": config.client_id,
-            "client_secret": config.client_secret,
-            "verify": False,
-            "timeout": config.auth_timeout,
-        }
-        if config.base_url:
-            client_kwargs["base_url"] = config.base_url
-
-        client = AsyncOAuth2Client(**client_kwargs)
-
-        await _ensure_token(client, config, on_new_token)
-        yield client
-
-    finally:
-        if client is not None:
-            await client.aclose()
-
-
-_TOKENS: dict[str, dict] = {}
-_TOKEN_EXPS: dict[str, float] = {}
+    client = get_pooled_oauth2_client(config)
+    await _ensure_token(client, config, on_new_token)
+    yield client
 
 
 async def get_oauth2_token(
     config: OAuth2ClientConfig,
     on_new_token: Callable[[], None] | None = None,
+    manager: OAuth2TokenManager | None = None,
 ) -> str:
-    """Obtém e retorna um token OAuth2 válido para a configuração fornecida."""
-    async with get_oauth2_http_client(config, on_new_token) as client:
-        token_data: dict[str, str] | None = getattr(client, "token", None)
-        if not token_data:
-            msg = "OAuth2 client did not return a token payload."
-            raise RuntimeError(msg)
+    """Obtém e retorna um token OAuth2 válido para a configuração fornecida.
 
-        access_token = token_data.get("access_token")
-        if not access_token:
-            msg = "Token payload is missing the 'access_token' field."
-            raise RuntimeError(msg)
+    Com o token em cache, nenhum cliente HTTP é criado e nenhuma
+    requisição é feita.
+    """
+    manager = manager or get_token_manager()
+    token_data = await manager.get_token(config, on_new_token)
+
+    access_token = token_data.get("access_token")
+    if not access_token:
+        msg = "Token payload is missing the 'access_token' field."
+        raise RuntimeError(msg)
 
-        return access_token
+    return access_token
 
 
 async def _ensure_token(
@@ -84,18 +67,5 @@ async def _ensure_token(
     on_new_token: Callable[[], None] | None = None,
 ) -> None:
     """Garante que o cliente possua um token OAuth2 válido e em cache."""
-    key = f"{config.auth_url}:{config.client_id}"
-    token = _TOKENS.get(key)
-    exp = _TOKEN_EXPS.get(key, 0)
-
-    if token is None or time.time() >= exp:
-        token_response = await client.fetch_token(config.auth_url)
-        _TOKENS[key] = token_response
-        _TOKEN_EXPS[key] = time.time() + token_response["expires_in"] - 60
-
-        client.token_auth.set_token(token_response)
-
-        if on_new_token is not None:
-            on_new_token()
-    else:
-        client.token_auth.set_token(token)
+    token = await get_token_manager().get_token(config, on_new_token)
+    client.token_auth.set_token(token)
@@ -0,0 +1,315 @@
+"""Backends de cache de tokens OAuth2.
+
+O ``OAuth2TokenManager`` mantém sempre os tokens em um dicionário em
+memória para o caminho quente; o backend configurado aqui é consultado
+antes de cada requisição ao provedor (no início do processo e a cada
+renovação) e é atualizado com cada token novo. Com um backend em disco,
+todos os processos de uma máquina compartilham o mesmo token: só o
+primeiro a renová-lo vai ao provedor de identidade, os demais adotam o
+token gravado.
+
+Backends disponíveis:
+
+- ``InMemoryTokenCache``: padrão, restrito ao processo.
+- ``FileTokenCache``: arquivo JSON protegido por lock de arquivo.
+- ``SqliteTokenCache``: tabela SQLite (por padrão ao lado de ``db/``).
+
+Os backends em disco aceitam um ``TokenCipher`` opcional para cifrar o
+payload em repouso. Suas operações bloqueiam (lock de arquivo, SQLite) e
+são marcadas com ``blocking``; o gerenciador as executa em uma thread.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+from src.envvar import get_settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+DEFAULT_TOKEN_CACHE_FILE = "db/oauth_tokens.json"
+DEFAULT_TOKEN_CACHE_DB = "db/oauth_tokens.db"
+
+
+@dataclass(frozen=True, kw_only=True)
+class CachedToken:  # pylint: disable=too-few-public-methods
+    """
+    Token armazenado em um backend de cache.
+
+    Atributos:
+        token (dict): Payload retornado pelo provedor OAuth2.
+        expires_at (float): Instante (epoch) a partir do qual o token não
+            deve mais ser usado, já descontada a margem de segurança.
+    """
+    token: dict[str, Any]
+    expires_at: float
+
+
+class TokenCipher:
+    """Cifra simétrica (Fernet) para tokens armazenados em disco.
+
+    Args:
+        key: Chave Fernet codificada em base64 url-safe (32 bytes).
+    """
+
+    def __init__(self, key: str | bytes) -> None:
+        try:
+            # pylint: disable-next=import-outside-toplevel
+            from cryptography.fernet import Fernet
+        except ImportError as exc:
+            msg = "Encrypted token cache requires the 'cryptography' package."
+            raise RuntimeError(msg) from exc
+
+        self._fernet = Fernet(key)
+
+    @staticmethod
+    def generate_key() -> str:
+        """Gera uma nova chave Fernet."""
+        return base64.urlsafe_b64encode(os.urandom(32)).decode("ascii")
+
+    def encrypt(self, data: bytes) -> bytes:
+        """Cifra ``data``."""
+        return self._fernet.encrypt(data)
+
+    def decrypt(self, data: bytes) -> bytes:
+        """Decifra ``data``."""
+        return self._fernet.decrypt(data)
+
+
+class TokenCache(ABC):
+    """Interface dos backends de cache de tokens."""
+
+    #: As operações fazem I/O bloqueante e devem rodar fora do event loop.
+    blocking = True
+
+    @abstractmethod
+    def get(self, key: str) -> CachedToken | None:
+        """Retorna o token armazenado para ``key`` ou ``None``."""
+
+    @abstractmethod
+    def set(self, key: str, entry: CachedToken) -> None:
+        """Armazena o token de ``key``."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove o token de ``key``, se existir."""
+
+
+class InMemoryTokenCache(TokenCache):
+    """Cache restrito ao processo, baseado em dicionário."""
+
+    blocking = False
+
+    def __init__(self) -> None:
+        self._entries: dict[str, CachedToken] = {}
+
+    def get(self, key: str) -> CachedToken | None:
+        return self._entries.get(key)
+
+    def set(self, key: str, entry: CachedToken) -> None:
+        self._entries[key] = entry
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+def _encode_payload(entry: CachedToken, cipher: TokenCipher | None) -> bytes:
+    data = json.dumps(entry.token, separators=(",", ":")).encode("utf-8")
+    return cipher.encrypt(data) if cipher is not None else data
+
+
+def _decode_payload(data: bytes, cipher: TokenCipher | None) -> dict[str, Any]:
+    if cipher is not None:
+        data = cipher.decrypt(data)
+    return json.loads(data)
+
+
+class FileTokenCache(TokenCache):
+    """Cache em arquivo JSON compartilhado entre processos da máquina.
+
+    Leituras e escritas são serializadas por um lock exclusivo em um
+    arquivo ``.lock`` ao lado do cache, e a escrita é atômica (arquivo
+    temporário seguido de ``os.replace``).
+
+    Args:
+        path: Caminho do arquivo JSON.
+        cipher: Cifra opcional para o payload do token.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_TOKEN_CACHE_FILE,
+        *,
+        cipher: TokenCipher | None = None,
+    ) -> None:
+        self._path = Path(path)
+        self._lock_path = self._path.with_name(self._path.name + ".lock")
+        self._cipher = cipher
+        self._thread_lock = threading.Lock()
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._thread_lock, open(self._lock_path, "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        try:
+            return json.loads(self._path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write(self, data: dict[str, dict[str, Any]]) -> None:
+        tmp_path = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+        # Criado já com 0600: o token nunca fica legível por outros usuários.
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            # Sobra de uma escrita interrompida deste mesmo pid.
+            tmp_path.unlink()
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+                tmp_file.write(json.dumps(data))
+            os.replace(tmp_path, self._path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def get(self, key: str) -> CachedToken | None:
+        with self._locked():
+            raw = self._read().get(key)
+        if raw is None:
+            return None
+
+        payload = base64.b64decode(raw["payload"])
+        return CachedToken(
+            token=_decode_payload(payload, self._cipher),
+            expires_at=float(raw["expires_at"]),
+        )
+
+    def set(self, key: str, entry: CachedToken) -> None:
+        payload = _encode_payload(entry, self._cipher)
+        with self._locked():
+            data = self._read()
+            data[key] = {
+                "payload": base64.b64encode(payload).decode("ascii"),
+                "expires_at": entry.expires_at,
+            }
+            self._write(data)
+
+    def delete(self, key: str) -> None:
+        with self._locked():
+            data = self._read()
+            if data.pop(key, None) is not None:
+                self._write(data)
+
+
+class SqliteTokenCache(TokenCache):
+    """Cache em uma pequena tabela SQLite compartilhada entre processos.
+
+    Args:
+        path: Caminho do banco SQLite.
+        cipher: Cifra opcional para o payload do token.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_TOKEN_CACHE_DB,
+        *,
+        cipher: TokenCipher | None = None,
+    ) -> None:
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._cipher = cipher
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Aberta no primeiro uso (já na thread de I/O), não no construtor.
+        if self._conn is None:
+            conn = sqlite3.connect(
+                str(self._path), timeout=10, check_same_thread=False,
+                isolation_level=None,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS oauth_tokens ("
+                " key TEXT PRIMARY KEY,"
+                " payload BLOB NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> CachedToken | None:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT payload, expires_at FROM oauth_tokens WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        return CachedToken(
+            token=_decode_payload(bytes(row[0]), self._cipher),
+            expires_at=float(row[1]),
+        )
+
+    def set(self, key: str, entry: CachedToken) -> None:
+        payload = _encode_payload(entry, self._cipher)
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO oauth_tokens (key, payload, expires_at)"
+                " VALUES (?, ?, ?)",
+                (key, payload, entry.expires_at),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM oauth_tokens WHERE key = ?", (key,))
+
+    def close(self) -> None:
+        """Fecha a conexão com o banco."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def token_cache_from_env() -> TokenCache:
+    """Cria o backend de cache indicado pelas configurações do processo.
+
+    ``OAUTH2_TOKEN_CACHE`` aceita ``memory`` (padrão), ``file`` ou
+    ``sqlite``. ``OAUTH2_TOKEN_CACHE_KEY``, quando definida, habilita a
+    cifra do payload em repouso.
+    """
+    oauth = get_settings().oauth
+    backend = (oauth.token_cache or "memory").lower()
+    path = oauth.token_cache_path
+    cipher = TokenCipher(oauth.token_cache_key) if oauth.token_cache_key else None
+
+    if backend == "file":
+        return FileTokenCache(path or DEFAULT_TOKEN_CACHE_FILE, cipher=cipher)
+    if backend == "sqlite":
+        return SqliteTokenCache(path or DEFAULT_TOKEN_CACHE_DB, cipher=cipher)
+    return InMemoryTokenCache()
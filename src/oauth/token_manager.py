@@ -0,0 +1,407 @@
+"""Gerenciador de tokens OAuth2 com requisição única e renovação antecipada.
+
+Centraliza o cache de tokens por ``(auth_url, client_id)`` e garante que,
+mesmo sob uma rajada de corrotinas concorrentes com o token expirado,
+apenas uma requisição ao provedor de identidade fique em andamento por
+chave. Os demais chamadores aguardam o mesmo resultado.
+
+No caminho quente (token válido em cache) nenhum ``await`` é executado:
+o token é devolvido diretamente do dicionário em memória. Quando o token
+se aproxima da expiração, uma renovação é disparada em segundo plano,
+com um atraso aleatório (jitter) para espalhar as renovações entre
+processos. Se essa renovação falhar, a próxima tentativa antecipada só
+acontece após um intervalo (exponencial e com jitter), em vez de uma nova
+requisição ao provedor a cada chamada até o token expirar.
+
+Opcionalmente, um ``TokenCache`` em disco (ver ``token_cache``) permite
+que vários processos da mesma máquina reaproveitem o token: antes de cada
+requisição ao provedor (na partida e em toda renovação) o cache
+compartilhado é relido, e um token mais novo gravado por outro processo
+é adotado no lugar de uma nova requisição. As operações dos backends em
+disco (locks de arquivo, SQLite) rodam em uma thread, fora do event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable
+
+import httpx
+from authlib.integrations.httpx_client import AsyncOAuth2Client
+
+from src.httpclient import (ResilientTransport, RetryPolicy,
+                            get_http_client_pool)
+from src.metrics import get_metrics_registry
+
+from .oauth2_client_config import OAuth2ClientConfig
+from .token_cache import (CachedToken, InMemoryTokenCache, TokenCache,
+                          token_cache_from_env)
+
+logger = logging.getLogger(__name__)
+
+# Margem de segurança subtraída de ``expires_in`` ao calcular a expiração.
+TOKEN_EXPIRY_SKEW = 60
+# Janela (em segundos) antes da expiração em que a renovação antecipada
+# pode ser disparada.
+DEFAULT_REFRESH_AHEAD = 120.0
+# Fração da janela de renovação usada como jitter.
+DEFAULT_REFRESH_JITTER = 0.5
+# Intervalo (em segundos) antes de repetir uma renovação antecipada que
+# falhou; dobra a cada falha seguida, até ``MAX_REFRESH_RETRY_DELAY``.
+DEFAULT_REFRESH_RETRY_DELAY = 5.0
+MAX_REFRESH_RETRY_DELAY = 60.0
+# Histograma (``src.metrics``) com a duração das requisições de token.
+OAUTH_REFRESH_SECONDS = "oauth_token_refresh_seconds"
+
+TokenFetcher = Callable[[OAuth2ClientConfig], Awaitable[dict[str, Any]]]
+
+
+@dataclass(kw_only=True)
+class TokenManagerStats:  # pylint: disable=too-few-public-methods
+    """
+    Contadores de uso do gerenciador de tokens.
+
+    Atributos:
+        hits (int): Chamadas atendidas pelo cache sem qualquer ``await``.
+        misses (int): Chamadas que precisaram aguardar um token novo.
+        cache_loads (int): Tokens válidos carregados do backend de cache
+            (na partida ou gravados por outro processo) em vez de uma
+            requisição ao provedor.
+        refreshes (int): Requisições efetivamente enviadas ao provedor.
+        background_refreshes (int): Renovações antecipadas em segundo plano.
+        coalesced_waiters (int): Chamadores que aguardaram uma requisição já
+            em andamento em vez de abrir outra.
+        failures (int): Requisições ao provedor que falharam.
+    """
+    hits: int = 0
+    misses: int = 0
+    cache_loads: int = 0
+    refreshes: int = 0
+    background_refreshes: int = 0
+    coalesced_waiters: int = 0
+    failures: int = 0
+
+
+@dataclass(frozen=True, kw_only=True)
+class _TokenEntry:
+    token: dict[str, Any]
+    expires_at: float
+    refresh_at: float
+
+
+def get_pooled_oauth2_client(config: OAuth2ClientConfig) -> AsyncOAuth2Client:
+    """Retorna o ``AsyncOAuth2Client`` de longa duração da configuração.
+
+    O cliente é criado sobre o pool HTTP do processo e reutilizado entre
+    chamadas, evitando um novo handshake TCP+TLS a cada renovação.
+    """
+    def factory(transport: httpx.AsyncBaseTransport) -> AsyncOAuth2Client:
+        # ``auth_timeout`` limita a leitura; a conexão usa o timeout curto da
+        # política, e falhas transitórias são repetidas com backoff.
+        policy = RetryPolicy.from_env()
+        client_kwargs: dict[str, Any] = {
+            "client_id": config.client_id,
+            "client_secret": config.client_secret,
+            "timeout": policy.timeout(read=config.auth_timeout),
+            "transport": ResilientTransport(transport, policy),
+        }
+        if config.base_url:
+            client_kwargs["base_url"] = config.base_url
+        return AsyncOAuth2Client(**client_kwargs)
+
+    return get_http_client_pool().get_or_create(
+        f"oauth2:{token_cache_key(config)}", factory, verify=config.verify)
+
+
+async def fetch_token_via_authlib(config: OAuth2ClientConfig) -> dict[str, Any]:
+    """Busca um token novo no provedor usando o cliente OAuth2 do pool."""
+    client = get_pooled_oauth2_client(config)
+    return dict(await client.fetch_token(config.auth_url))
+
+
+def token_cache_key(config: OAuth2ClientConfig) -> str:
+    """Retorna a chave de cache usada para a configuração fornecida."""
+    return f"{config.auth_url}:{config.client_id}"
+
+
+def _observe_refresh(started: float, outcome: str) -> None:
+    registry = get_metrics_registry()
+    if registry.enabled:
+        registry.histogram(
+            OAUTH_REFRESH_SECONDS, "Duração das requisições de token OAuth2."
+        ).observe(time.perf_counter() - started, outcome=outcome)
+
+
+class OAuth2TokenManager:
+    """Cache de tokens OAuth2 com requisição única por chave.
+
+    Args:
+        fetcher: Corrotina que obtém um novo payload de token para a
+            configuração. Por padrão usa ``AsyncOAuth2Client.fetch_token``.
+        refresh_ahead: Janela, em segundos antes da expiração, em que a
+            renovação em segundo plano pode começar.
+        refresh_jitter: Fração da janela sorteada aleatoriamente para que
+            processos diferentes não renovem todos no mesmo instante.
+        refresh_retry_delay: Espera, em segundos, antes de repetir uma
+            renovação que falhou (dobrada a cada falha seguida, com jitter).
+        cache: Backend onde os tokens são persistidos e consultados quando
+            ausentes da memória. Por padrão, apenas em memória.
+        clock: Função de relógio (útil para testes).
+    """
+
+    def __init__(
+        self,
+        *,
+        fetcher: TokenFetcher | None = None,
+        refresh_ahead: float = DEFAULT_REFRESH_AHEAD,
+        refresh_jitter: float = DEFAULT_REFRESH_JITTER,
+        refresh_retry_delay: float = DEFAULT_REFRESH_RETRY_DELAY,
+        cache: TokenCache | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._fetcher: TokenFetcher = fetcher or fetch_token_via_authlib
+        self._refresh_ahead = refresh_ahead
+        self._refresh_jitter = refresh_jitter
+        self._refresh_retry_delay = refresh_retry_delay
+        self._cache = cache or InMemoryTokenCache()
+        self._clock = clock
+        self._entries: dict[str, _TokenEntry] = {}
+        self._inflight: dict[str, asyncio.Future[dict[str, Any]]] = {}
+        # Falhas seguidas de renovação por chave (zeradas no sucesso).
+        self._failures: dict[str, int] = {}
+        self._stats = TokenManagerStats()
+
+    @property
+    def stats(self) -> TokenManagerStats:
+        """Retorna uma cópia dos contadores atuais."""
+        return replace(self._stats)
+
+    def peek(self, config: OAuth2ClientConfig) -> dict[str, Any] | None:
+        """Retorna o payload em cache se ainda for válido, sem rede."""
+        entry = self._entries.get(token_cache_key(config))
+        if entry is None or self._clock() >= entry.expires_at:
+            return None
+        return entry.token
+
+    async def get_token(
+        self,
+        config: OAuth2ClientConfig,
+        on_new_token: Callable[[], None] | None = None,
+    ) -> dict[str, Any]:
+        """Retorna um payload de token válido para a configuração.
+
+        Se o token em cache ainda for válido, retorna imediatamente, sem
+        suspender a corrotina. Caso contrário, aguarda a obtenção em
+        andamento para a mesma chave ou inicia uma nova (que consulta o
+        backend de cache antes do provedor).
+        """
+        key = token_cache_key(config)
+        entry = self._entries.get(key)
+        now = self._clock()
+
+        if entry is not None and now < entry.expires_at:
+            self._stats.hits += 1
+            if now >= entry.refresh_at and key not in self._inflight:
+                self._stats.background_refreshes += 1
+                self._start_refresh(key, config)
+            return entry.token
+
+        self._stats.misses += 1
+        token = await self._await_refresh(key, config)
+        if on_new_token is not None:
+            on_new_token()
+        return token
+
+    async def refresh(self, config: OAuth2ClientConfig) -> dict[str, Any]:
+        """Força a obtenção de um novo token, coalescendo chamadas simultâneas.
+
+        Um token mais novo que o atual já gravado no backend de cache (por
+        outro processo que também recebeu 401) é adotado sem requisição.
+        """
+        key = token_cache_key(config)
+        return await self._await_refresh(key, config)
+
+    def invalidate(self, config: OAuth2ClientConfig | None = None) -> None:
+        """Descarta o token em cache de uma configuração (ou de todas).
+
+        Com um backend em disco, a remoção bloqueia; dentro do event loop
+        use ``ainvalidate``.
+        """
+        for key in self._keys(config):
+            self._entries.pop(key, None)
+            self._cache.delete(key)
+
+    async def ainvalidate(
+        self,
+        config: OAuth2ClientConfig | None = None,
+        *,
+        access_token: str | None = None,
+    ) -> None:
+        """Descarta o token em cache, com o backend em disco fora do event loop.
+
+        Args:
+            config: Configuração cujo token é descartado; todas se omitida.
+            access_token: Só descarta se o token em cache ainda for este
+                (o recusado com 401), preservando um token novo já gravado
+                por outra corrotina ou outro processo.
+        """
+        for key in self._keys(config):
+            entry = self._entries.get(key)
+            if access_token is None or (
+                    entry is not None
+                    and entry.token.get("access_token") == access_token):
+                self._entries.pop(key, None)
+            try:
+                if self._cache.blocking:
+                    await asyncio.to_thread(
+                        self._delete_cached, key, access_token)
+                else:
+                    self._delete_cached(key, access_token)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Falha ao remover token OAuth2 em cache para %s", key)
+
+    def _keys(self, config: OAuth2ClientConfig | None) -> list[str]:
+        return list(self._entries) if config is None else [token_cache_key(config)]
+
+    def _delete_cached(self, key: str, access_token: str | None) -> None:
+        if access_token is not None:
+            cached = self._cache.get(key)
+            if cached is None or cached.token.get("access_token") != access_token:
+                return
+        self._cache.delete(key)
+
+    async def _await_refresh(
+        self, key: str, config: OAuth2ClientConfig
+    ) -> dict[str, Any]:
+        future = self._inflight.get(key)
+        if future is not None:
+            self._stats.coalesced_waiters += 1
+        else:
+            future = self._start_refresh(key, config)
+        # ``shield`` impede que o cancelamento de um chamador cancele a
+        # requisição compartilhada pelos demais.
+        return await asyncio.shield(future)
+
+    def _start_refresh(
+        self, key: str, config: OAuth2ClientConfig
+    ) -> asyncio.Future[dict[str, Any]]:
+        task = asyncio.ensure_future(self._fetch_and_store(key, config))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._on_refresh_done(key, t))
+        return task
+
+    def _on_refresh_done(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        if task.exception() is None:
+            self._failures.pop(key, None)
+            return
+        # Renovações em segundo plano não têm quem as aguarde; o token
+        # atual continua sendo servido até expirar.
+        logger.warning(
+            "Falha ao renovar token OAuth2 para %s: %s", key, task.exception()
+        )
+        self._back_off(key)
+
+    def _back_off(self, key: str) -> None:
+        """Adia a próxima renovação antecipada de ``key`` após uma falha."""
+        failures = self._failures.get(key, 0) + 1
+        self._failures[key] = failures
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        delay = min(self._refresh_retry_delay * 2 ** (failures - 1),
+                    MAX_REFRESH_RETRY_DELAY)
+        delay = random.uniform(delay / 2, delay)
+        self._entries[key] = replace(entry, refresh_at=self._clock() + delay)
+
+    async def _fetch_and_store(
+        self, key: str, config: OAuth2ClientConfig
+    ) -> dict[str, Any]:
+        # Outro processo pode já ter renovado o token no cache compartilhado.
+        entry = await self._load_newer_from_cache(key)
+        if entry is not None:
+            self._stats.cache_loads += 1
+            return entry.token
+
+        self._stats.refreshes += 1
+        started = time.perf_counter()
+        try:
+            token = await self._fetcher(config)
+        except Exception:
+            self._stats.failures += 1
+            _observe_refresh(started, "error")
+            raise
+        _observe_refresh(started, "ok")
+
+        if not token.get("access_token"):
+            self._stats.failures += 1
+            msg = "Token payload is missing the 'access_token' field."
+            raise RuntimeError(msg)
+
+        await self._store(key, token)
+        return token
+
+    async def _store(self, key: str, token: dict[str, Any]) -> _TokenEntry:
+        expires_at = (
+            self._clock() + float(token.get("expires_in", 0)) - TOKEN_EXPIRY_SKEW
+        )
+        cached = CachedToken(token=token, expires_at=expires_at)
+        # Em memória antes de gravar: chamadores não esperam pelo disco.
+        entry = self._remember(key, cached)
+        try:
+            if self._cache.blocking:
+                await asyncio.to_thread(self._cache.set, key, cached)
+            else:
+                self._cache.set(key, cached)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Falha ao persistir token OAuth2 para %s", key)
+        return entry
+
+    async def _load_newer_from_cache(self, key: str) -> _TokenEntry | None:
+        """Adota o token do backend se for válido e mais novo que o atual."""
+        try:
+            if self._cache.blocking:
+                cached = await asyncio.to_thread(self._cache.get, key)
+            else:
+                cached = self._cache.get(key)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Falha ao ler token OAuth2 em cache para %s", key)
+            return None
+
+        current = self._entries.get(key)
+        if cached is None or self._clock() >= cached.expires_at:
+            return None
+        # O token atual (em renovação ou recusado com 401) não serve.
+        if current is not None and cached.expires_at <= current.expires_at:
+            return None
+        return self._remember(key, cached)
+
+    def _remember(self, key: str, cached: CachedToken) -> _TokenEntry:
+        window = min(
+            self._refresh_ahead, max(cached.expires_at - self._clock(), 0.0))
+        jitter = random.uniform(0.0, window * self._refresh_jitter)
+        entry = _TokenEntry(
+            token=cached.token,
+            expires_at=cached.expires_at,
+            refresh_at=cached.expires_at - window + jitter,
+        )
+        self._entries[key] = entry
+        return entry
+
+
+_DEFAULT_MANAGER: OAuth2TokenManager | None = None
+
+
+def get_token_manager() -> OAuth2TokenManager:
+    """Retorna o gerenciador de tokens padrão do processo (criado sob demanda)."""
+    global _DEFAULT_MANAGER  # instância compartilhada por todo o processo
+    if _DEFAULT_MANAGER is None:
+        _DEFAULT_MANAGER = OAuth2TokenManager(cache=token_cache_from_env())
+    return _DEFAULT_MANAGER